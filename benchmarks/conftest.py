@@ -0,0 +1,8 @@
+import pytest
+
+from .synthetic import SyntheticRepo, create_repository
+
+
+@pytest.fixture(scope="session")
+def synthetic_repo(tmp_path_factory) -> SyntheticRepo:
+    return create_repository(tmp_path_factory.mktemp("synthetic") / "repo")
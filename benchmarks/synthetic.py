@@ -0,0 +1,191 @@
+import os
+import pathlib
+import subprocess
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Optional, Tuple
+
+
+def write_changelog(
+    path: pathlib.Path, entries: int, unreleased: bool = True, lines_per_entry: int = 6
+) -> pathlib.Path:
+    """Write a keep-a-changelog style file with `entries` releases.
+
+    Releases are numbered 0.0.1 up to 0.<entries // 1000>.<entries % 1000>,
+    newest first.
+    """
+    with path.open("w", encoding="utf-8") as f:
+        f.write("# Changelog\n\nAll notable changes to this project.\n\n")
+        if unreleased:
+            f.write("## Unreleased\n\n### Added\n\n- Something new\n\n")
+        for number in range(entries, 0, -1):
+            version = f"0.{number // 1000}.{number % 1000}"
+            f.write(f"## [{version}] - 2023-01-01\n\n### Fixed\n\n")
+            for line in range(lines_per_entry):
+                f.write(f"- Fixed bug {number}-{line} in some module\n")
+            f.write("\n")
+    return path
+
+
+# size of the synthetic repository at RECITE_BENCH_SCALE=1
+FULL_SCALE = {"commits": 100_000, "tags": 10_000, "files": 50_000}
+
+
+def scale() -> float:
+    """Factor for the size of synthetic repositories, e.g. 0.01 for a quick run."""
+    return float(os.getenv("RECITE_BENCH_SCALE", "1"))
+
+
+def tag_version(number: int) -> str:
+    # same numbering as write_changelog
+    return f"0.{number // 1000}.{number % 1000}"
+
+
+@dataclass
+class SyntheticRepo:
+    path: pathlib.Path
+    remote: pathlib.Path
+    commits: int
+    tags: int
+    files: int
+    version: str
+    head: str
+
+    def git(self, *args: str) -> str:
+        return _git(self.path, *args)
+
+    def reset(self):
+        """Undo everything a release did, locally and on the remote."""
+        self.git("reset", "--quiet", "--hard", self.head)
+        new_tags = set(self.git("tag", "--contains", self.head).split()) - {
+            f"v{self.version}"
+        }
+        for tag in new_tags:
+            self.git("tag", "-d", tag)
+            self.git("push", "--quiet", "origin", f":refs/tags/{tag}")
+        self.git("push", "--quiet", "--force", "origin", f"{self.head}:main")
+        self.git("fetch", "--quiet", "origin")
+
+
+def _git(path: pathlib.Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=path, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def _data(out: BinaryIO, content: str):
+    encoded = content.encode()
+    out.write(b"data %d\n" % len(encoded))
+    out.write(encoded)
+    out.write(b"\n")
+
+
+def _commit(
+    out: BinaryIO, number: int, files: Dict[str, str], parent: Optional[int]
+) -> int:
+    timestamp = 1_600_000_000 + number * 60
+    out.write(b"commit refs/heads/main\nmark :%d\n" % number)
+    for role in (b"author", b"committer"):
+        out.write(b"%s Bench <bench@example.com> %d +0000\n" % (role, timestamp))
+    _data(out, f"Commit {number}")
+    if parent is not None:
+        out.write(b"from :%d\n" % parent)
+    for path, content in files.items():
+        out.write(f"M 100644 inline {path}\n".encode())
+        _data(out, content)
+    return number
+
+
+def _module(number: int, revision: int = 0) -> Tuple[str, str]:
+    path = f"src/bench/pkg{number % 100}/module_{number}.py"
+    return path, f"VALUE = {revision}\n\n\ndef f{number}():\n    return VALUE\n"
+
+
+def create_repository(
+    path: pathlib.Path,
+    commits: Optional[int] = None,
+    tags: Optional[int] = None,
+    files: Optional[int] = None,
+) -> SyntheticRepo:
+    """Create a repository with a long history, many tags and a big worktree.
+
+    History is streamed into `git fast-import`, so even the full scale only
+    takes seconds to create. Sizes default to :data:`FULL_SCALE` times
+    :func:`scale`. A bare repository next to it serves as remote "origin".
+
+    The last tag is the version of `pyproject.toml`, and the commit after it
+    adds an "Unreleased" entry to a multi-megabyte changelog, so all checks
+    pass on the created repository.
+    """
+    commits = commits or max(3, int(FULL_SCALE["commits"] * scale()))
+    tags = tags or max(1, int(FULL_SCALE["tags"] * scale()))
+    files = files or max(1, int(FULL_SCALE["files"] * scale()))
+    path.mkdir(parents=True)
+    _git(path, "init", "--quiet", "--initial-branch", "main")
+    _git(path, "config", "user.name", "Bench")
+    _git(path, "config", "user.email", "bench@example.com")
+    version = tag_version(tags)
+    changelog = path.parent / f"{path.name}-CHANGELOG.md"
+    write_changelog(changelog, entries=tags, unreleased=False)
+    released_changelog = changelog.read_text(encoding="utf-8")
+    write_changelog(changelog, entries=tags, unreleased=True)
+    unreleased_changelog = changelog.read_text(encoding="utf-8")
+    changelog.unlink()
+    tag_every = max(1, (commits - 1) // tags)
+    importer = subprocess.Popen(
+        ["git", "fast-import", "--quiet"], cwd=path, stdin=subprocess.PIPE
+    )
+    assert importer.stdin is not None  # for mypy
+    with importer.stdin as out:
+        initial = dict(_module(number) for number in range(files))
+        initial["pyproject.toml"] = PYPROJECT.format(version=version)
+        initial["noxfile.py"] = NOXFILE
+        initial["CHANGELOG.md"] = released_changelog
+        initial[".gitignore"] = ".recite/\n"
+        parent = _commit(out, 1, initial, None)
+        tagged = 0
+        for number in range(2, commits):
+            parent = _commit(
+                out, number, dict([_module(number % files, number)]), parent
+            )
+            # the current version is tagged on the commit before the last one
+            if number == commits - 1:
+                name = f"v{version}"
+            elif tagged < tags - 1 and (number - 1) % tag_every == 0:
+                tagged += 1
+                name = f"v{tag_version(tagged)}"
+            else:
+                continue
+            out.write(f"reset refs/tags/{name}\nfrom :{number}\n\n".encode())
+        _commit(out, commits, {"CHANGELOG.md": unreleased_changelog}, parent)
+    assert importer.wait() == 0
+    _git(path, "reset", "--quiet", "--hard", "main")
+    remote = path.parent / f"{path.name}-remote.git"
+    _git(path.parent, "clone", "--quiet", "--bare", str(path), str(remote))
+    _git(path, "remote", "add", "origin", str(remote))
+    _git(path, "fetch", "--quiet", "origin")
+    _git(path, "branch", "--quiet", "--set-upstream-to", "origin/main")
+    return SyntheticRepo(
+        path=path,
+        remote=remote,
+        commits=commits,
+        tags=tags,
+        files=files,
+        version=version,
+        head=_git(path, "rev-parse", "HEAD"),
+    )
+
+
+PYPROJECT = """[tool.poetry]
+name = "bench"
+version = "{version}"
+description = "Synthetic repository for benchmarks"
+authors = ["Bench <bench@example.com>"]
+"""
+
+NOXFILE = """import nox
+
+
+@nox.session(python=False)
+def tests(session):
+    session.run("python", "-c", "pass")
+"""
@@ -0,0 +1,57 @@
+import tracemalloc
+
+import pytest
+
+from recite.changelog import find_release_section
+
+from .synthetic import write_changelog
+
+pytest.importorskip("pytest_benchmark")
+
+ENTRIES = [10_000, 100_000]
+
+
+def _find(path, version):
+    with path.open(encoding="utf-8") as f:
+        return find_release_section(f, version)
+
+
+@pytest.fixture(scope="module", params=ENTRIES)
+def changelog(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp("changelog") / "CHANGELOG.md"
+    return write_changelog(path, entries=request.param)
+
+
+@pytest.fixture(scope="module", params=ENTRIES)
+def released_changelog(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp("changelog") / "CHANGELOG.md"
+    newest = f"0.{request.param // 1000}.{request.param % 1000}"
+    return write_changelog(path, entries=request.param, unreleased=False), newest
+
+
+def test_unreleased_entry(benchmark, changelog):
+    section = benchmark(_find, changelog, "100.0.0")
+    assert section is not None and section.title == "Unreleased"
+
+
+def test_version_entry(benchmark, released_changelog):
+    path, newest = released_changelog
+    section = benchmark(_find, path, newest)
+    assert section is not None and newest in section.title
+
+
+def test_missing_entry(benchmark, released_changelog):
+    path, _ = released_changelog
+    assert benchmark(_find, path, "200.0.0") is None
+
+
+def test_constant_memory(changelog):
+    tracemalloc.start()
+    try:
+        _find(changelog, "100.0.0")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # independent of the size of the changelog, which is several megabytes
+    assert changelog.stat().st_size > 1_000_000
+    assert peak < 256 * 1024
@@ -0,0 +1,43 @@
+import shutil
+
+import pytest
+
+from recite.session import RepoSession
+from recite.step import (
+    CheckChangelogEntryStep,
+    CheckChangelogStep,
+    CheckCleanGitStep,
+    CheckOnMainStep,
+    CheckPyProjectStep,
+    RunTestsStep,
+)
+
+pytest.importorskip("pytest_benchmark")
+
+CHECKS = {
+    "check_pyproject": CheckPyProjectStep,
+    "check_on_main": CheckOnMainStep,
+    "check_clean_git": CheckCleanGitStep,
+    "check_clean_git_ls_remote": lambda **kwargs: CheckCleanGitStep(
+        ls_remote=True, **kwargs
+    ),
+    "run_tests": RunTestsStep,
+    "check_changelog": CheckChangelogStep,
+    "check_changelog_entry": lambda **kwargs: CheckChangelogEntryStep(
+        bump_rule="patch", **kwargs
+    ),
+}
+
+
+@pytest.mark.parametrize("name", CHECKS)
+def test_check(benchmark, synthetic_repo, name):
+    if name == "run_tests" and shutil.which("nox") is None:
+        pytest.skip("nox is not installed")
+
+    def fresh_step():
+        # every round starts without cached repository facts
+        RepoSession.close_all()
+        return (CHECKS[name](project_dir=str(synthetic_repo.path)),), {}
+
+    result = benchmark.pedantic(lambda step: step.run(), setup=fresh_step, rounds=5)
+    assert result.success, result.messages
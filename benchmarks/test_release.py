@@ -0,0 +1,51 @@
+import shutil
+from dataclasses import dataclass
+
+import pytest
+import typer
+from typer.testing import CliRunner
+
+from recite.main import app
+from recite.session import RepoSession
+from recite.step import Result, Step
+
+pytest.importorskip("pytest_benchmark")
+
+
+@dataclass(kw_only=True)
+class NoopStep(Step):
+    description: str = "Not benchmarked"
+
+    def run(self) -> Result:
+        return Result(success=True)
+
+
+def _noop(short_name: str):
+    def create(depends_on=(), **kwargs):
+        return NoopStep(short_name=short_name, depends_on=depends_on)
+
+    return create
+
+
+def test_release(benchmark, synthetic_repo, monkeypatch):
+    # building and publishing measure poetry and the network, not recite
+    monkeypatch.setattr("recite.main.BuildStep", _noop("build"))
+    monkeypatch.setattr("recite.main.PublishStep", _noop("publish"))
+    monkeypatch.setattr(
+        "recite.main.GithubReleaseReminderStep", _noop("githubreleasreminder")
+    )
+    monkeypatch.setattr(typer, "confirm", lambda *args, **kwargs: True)
+    monkeypatch.chdir(synthetic_repo.path)
+    args = ["release", "patch", "--no-cache"]
+    if shutil.which("nox") is None:
+        args.extend(["--skip-checks", "run_tests"])
+
+    def reset():
+        synthetic_repo.reset()
+        RepoSession.close_all()
+
+    result = benchmark.pedantic(
+        CliRunner().invoke, args=(app, args), setup=reset, rounds=3
+    )
+    assert result.exit_code == 0, result.stdout
+    assert synthetic_repo.git("describe", "--tags", "--exact-match").startswith("v")
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+from typing import Dict
+
+# milliseconds recite may add on top of typer when starting up
+STARTUP_BUDGET_MS = float(os.getenv("RECITE_STARTUP_BUDGET_MS", "150"))
+SAMPLES = 5
+
+
+def _cumulative_import_times(statement: str) -> Dict[str, int]:
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative_us)
+    return times
+
+
+def test_startup_time():
+    # typer is imported first, so only the cost of recite itself is measured
+    samples = [
+        _cumulative_import_times("import typer; import recite.main")["recite.main"]
+        for _ in range(SAMPLES)
+    ]
+    fastest_ms = min(samples) / 1000
+    assert fastest_ms < STARTUP_BUDGET_MS, (
+        f"Importing recite.main took {fastest_ms:.1f}ms,"
+        f" the budget is {STARTUP_BUDGET_MS:.1f}ms"
+    )
@@ -1,5 +1,20 @@
+import json
+import os
+import platform
+
+import nox
 from nox_poetry import Session, session
 
+# benchmarks are slow and machine-dependent, so they have to be selected explicitly
+nox.options.sessions = [
+    "tests",
+    "lint",
+    "style_checking",
+    "pyroma",
+    "type_checking",
+    "build_docs",
+]
+
 
 @session()
 def tests(session: Session) -> None:
@@ -56,7 +71,7 @@ def type_checking(session: Session) -> None:
         "--install-types",
         "--non-interactive",
         "--ignore-missing-imports",
-        *args
+        *args,
     )
 
 
@@ -66,3 +81,61 @@ def build_docs(session: Session) -> None:
     session.install("mkdocs")
     session.install("mkdocs-material")
     session.run("mkdocs", "build", external=True)
+
+
+# committed, so a slowdown is caught even if it happens over several runs
+BENCHMARK_BASELINE = "benchmarks/baseline.json"
+
+
+def _benchmark_setup() -> dict:
+    # timings are only comparable on the same machine at the same size
+    return {
+        "scale": float(os.getenv("RECITE_BENCH_SCALE", "1")),
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+@session()
+def benchmarks(session: Session) -> None:
+    # the size of the synthetic repositories can be reduced via RECITE_BENCH_SCALE
+    args = session.posargs or ["benchmarks"]
+    session.install(".")
+    session.install("pytest")
+    session.install("pytest-benchmark")
+    session.install("nox")
+    setup = _benchmark_setup()
+    if os.getenv("RECITE_BENCH_SAVE_BASELINE"):
+        # only when asked, otherwise a regressed run would become the reference
+        session.run("pytest", f"--benchmark-json={BENCHMARK_BASELINE}", *args)
+        with open(BENCHMARK_BASELINE, encoding="utf-8") as f:
+            baseline = json.load(f)
+        # the timings of single rounds are not compared and take up megabytes
+        for benchmark in baseline["benchmarks"]:
+            benchmark["stats"].pop("data", None)
+        baseline["recite_setup"] = setup
+        with open(BENCHMARK_BASELINE, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=4)
+        return
+    if not os.path.isfile(BENCHMARK_BASELINE):
+        session.error(
+            f"No baseline in {BENCHMARK_BASELINE}, save one with RECITE_BENCH_SAVE_BASELINE=1"
+        )
+    with open(BENCHMARK_BASELINE, encoding="utf-8") as f:
+        recorded = json.load(f).get("recite_setup")
+    if recorded != setup:
+        session.warn(
+            f"Not comparing with {BENCHMARK_BASELINE}, it was recorded with {recorded}"
+            f" instead of {setup}, save a baseline of this setup with"
+            " RECITE_BENCH_SAVE_BASELINE=1"
+        )
+        session.run("pytest", *args)
+        return
+    session.run(
+        "pytest",
+        f"--benchmark-compare={BENCHMARK_BASELINE}",
+        "--benchmark-compare-fail=mean:25%",
+        *args,
+    )
@@ -1,3 +1,7 @@
-from importlib.metadata import version  # pragma: no cover
+def __getattr__(name: str):
+    # importlib.metadata is slow to import, so only do it when needed
+    if name == "__version__":
+        from importlib.metadata import version
 
-__version__ = version(__package__)
+        return version(__package__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .context import ensure_recite_dir, file_digest
+
+MANIFEST = "manifest.json"
+
+
+@dataclass
+class ArtifactStore:
+    """Keeps built distributions, so they are only built once per state.
+
+    Entries are keyed by the git tree the artifacts were built from and live
+    in `.recite/artifacts/<key>`. Only the `max_entries` most recently used
+    entries are kept.
+    """
+
+    project_dir: str
+    max_entries: int = 8
+
+    @property
+    def store_dir(self) -> str:
+        return os.path.join(self.project_dir, ".recite", "artifacts")
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.store_dir, key)
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """Artifacts stored for `key`.
+
+        :param key: Tree hash the artifacts were built from
+        :return: Paths of the artifacts or None if there is no intact entry
+        """
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, MANIFEST), encoding="utf-8") as f:
+                digests = json.load(f)["files"]
+        except (OSError, ValueError, KeyError):
+            return None
+        paths = []
+        for name, digest in sorted(digests.items()):
+            path = os.path.join(entry_dir, name)
+            if not os.path.isfile(path) or file_digest(path) != digest:
+                return None
+            paths.append(path)
+        # mark as recently used
+        os.utime(entry_dir)
+        return paths
+
+    def put(self, key: str, paths: List[str]) -> List[str]:
+        """Copy artifacts into the store.
+
+        :param key: Tree hash the artifacts were built from
+        :param paths: Paths of the built artifacts
+        :return: Paths of the stored artifacts
+        """
+        ensure_recite_dir(self.project_dir, "artifacts")
+        entry_dir = self._entry_dir(key)
+        # fill a temporary directory first, so entries are never incomplete
+        tmp_dir = f"{entry_dir}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        digests = {}
+        for path in paths:
+            name = os.path.basename(path)
+            shutil.copy2(path, os.path.join(tmp_dir, name))
+            digests[name] = file_digest(path)
+        with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump({"files": digests, "built_at": time.time()}, f)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.rename(tmp_dir, entry_dir)
+        self._evict()
+        return [os.path.join(entry_dir, name) for name in sorted(digests)]
+
+    def restore(self, paths: List[str], dist_dir: str) -> List[str]:
+        """Copy stored artifacts to `dist_dir`, unless they are already there.
+
+        :param paths: Paths of stored artifacts
+        :param dist_dir: Directory the artifacts are needed in
+        :return: Paths of the artifacts in `dist_dir`
+        """
+        os.makedirs(dist_dir, exist_ok=True)
+        restored = []
+        for path in paths:
+            target = os.path.join(dist_dir, os.path.basename(path))
+            if not os.path.isfile(target) or file_digest(target) != file_digest(path):
+                shutil.copy2(path, target)
+            restored.append(target)
+        return restored
+
+    def _evict(self):
+        entries = [
+            os.path.join(self.store_dir, name)
+            for name in os.listdir(self.store_dir)
+            if os.path.isdir(os.path.join(self.store_dir, name)) and ".tmp" not in name
+        ]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_entries :]:
+            shutil.rmtree(path, ignore_errors=True)
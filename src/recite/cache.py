@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Any, Dict, Optional
+
+from .context import ensure_recite_dir, file_digest
+from .step import Step
+
+# files that influence the outcome of checks without being part of their params
+CACHE_INPUTS = ("noxfile.py", "pyproject.toml", "poetry.lock")
+# fields that do not change what a step checks
+IGNORED_FIELDS = (
+    "skip",
+    "description",
+    "depends_on",
+    "workers",
+    "context",
+    "echo",
+    "timeout",
+)
+
+
+def step_params(step: Step) -> Dict[str, Any]:
+    """Parameters that determine what a step does, as plain JSON values.
+
+    :param step: Step, usually a dataclass
+    :return: Parameters by field name, without :data:`IGNORED_FIELDS`
+    """
+    if not is_dataclass(step):
+        return {}
+    params = {
+        f.name: getattr(step, f.name)
+        for f in fields(step)
+        if f.name not in IGNORED_FIELDS
+    }
+    return json.loads(json.dumps(params, sort_keys=True, default=str))
+
+
+@dataclass
+class ResultCache:
+    """Remembers which checks passed for a given state of the project.
+
+    Entries are keyed by the tree of HEAD, the content of :data:`CACHE_INPUTS`
+    and the parameters of the step. Only the `max_entries` most recently used
+    entries are kept.
+    """
+
+    project_dir: str
+    max_entries: int = 64
+
+    @property
+    def cache_dir(self) -> str:
+        return os.path.join(self.project_dir, ".recite", "cache")
+
+    def key(self, step: Step) -> Optional[str]:
+        from git.exc import GitCommandError, InvalidGitRepositoryError, NoSuchPathError
+
+        # in a workspace the step's package may be below the cache's project_dir
+        project_dir = step.project_context.project_dir
+        session = step.project_context.git
+        try:
+            # uncommitted changes are not part of the tree hash
+            if session.repo.is_dirty(untracked_files=True):
+                return None
+            tree_hash = session.tree_hash
+        except (
+            GitCommandError,
+            InvalidGitRepositoryError,
+            NoSuchPathError,
+            ValueError,
+        ):
+            return None
+        digest = hashlib.sha256(tree_hash.encode())
+        for name in CACHE_INPUTS:
+            path = os.path.join(project_dir, name)
+            if os.path.isfile(path):
+                digest.update(f"{name}:{file_digest(path)}".encode())
+        digest.update(type(step).__name__.encode())
+        digest.update(json.dumps(step_params(step), sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def contains(self, key: str) -> bool:
+        path = self._entry_path(key)
+        if not os.path.isfile(path):
+            return False
+        # mark as recently used
+        os.utime(path)
+        return True
+
+    def store(self, key: str, step: Step):
+        ensure_recite_dir(self.project_dir, "cache")
+        with open(self._entry_path(key), "w", encoding="utf-8") as f:
+            json.dump({"step": step.short_name, "passed_at": time.time()}, f)
+        self._evict()
+
+    def _evict(self):
+        entries = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith(".json")
+        ]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_entries :]:
+            os.remove(path)
@@ -0,0 +1,114 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .version import Version
+
+_ATX_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+# underlines of reStructuredText and setext markdown headings
+_UNDERLINE = re.compile(r"^([=\-~^*+#\"'`:.])\1{2,}\s*$")
+_VERSION_TOKEN = re.compile(
+    r"(?<![\w.])v?(\d+(?:\.\d+)*(?:[-_.]?(?:a|b|rc|alpha|beta|pre|post|dev)\d*)*)",
+    re.IGNORECASE,
+)
+UNRELEASED = "unreleased"
+
+
+@dataclass
+class ChangelogSection:
+    title: str
+    line_number: int
+    level: int
+    body: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.body).strip("\n")
+
+
+def _heading_version(title: str) -> Optional[str]:
+    match = _VERSION_TOKEN.search(title)
+    if match is None:
+        return None
+    try:
+        return str(Version.parse(match.group(1)))
+    except ValueError:
+        return None
+
+
+def iter_lines_with_headings(
+    lines: Iterable[str],
+) -> Iterator[Tuple[int, str, Optional[Tuple[int, str]]]]:
+    """Annotate lines with the heading they start, if any.
+
+    Markdown (ATX and setext) and reStructuredText headings are recognized.
+    Underlined headings need one line of lookahead, so only the previous line
+    is kept in memory. They are yielded together with their underline.
+
+    :param lines: Lines of a changelog
+    :yield: Line number, line and (level, title) if the line is a heading
+    """
+    underline_levels: Dict[str, int] = {}
+    previous: Optional[Tuple[int, str]] = None
+    for number, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        underline = _UNDERLINE.match(line)
+        if (
+            underline is not None
+            and previous is not None
+            and previous[1].strip()
+            and len(line.strip()) >= len(previous[1].strip())
+        ):
+            char = underline.group(1)
+            level = underline_levels.setdefault(char, len(underline_levels) + 1)
+            yield previous[0], f"{previous[1]}\n{line}", (level, previous[1].strip())
+            previous = None
+            continue
+        if previous is not None:
+            yield previous[0], previous[1], None
+        atx = _ATX_HEADING.match(line)
+        if atx is not None:
+            yield number, line, (len(atx.group(1)), atx.group(2))
+            previous = None
+        else:
+            previous = (number, line)
+    if previous is not None:
+        yield previous[0], previous[1], None
+
+
+def find_release_section(
+    lines: Iterable[str], version: str
+) -> Optional[ChangelogSection]:
+    """Find the changelog entry of a release, without reading the whole file.
+
+    The first section whose heading is either the given version or
+    "Unreleased" and which is not empty is returned. Reading stops at the end
+    of this section or at the first heading of an older release.
+
+    :param lines: Lines of a changelog, e.g. an open file
+    :param version: Version the entry is searched for
+    :return: The found section or None
+    """
+    wanted = str(Version.parse(version))
+    section: Optional[ChangelogSection] = None
+    for number, line, heading in iter_lines_with_headings(lines):
+        if section is not None:
+            if heading is None or heading[0] > section.level:
+                section.body.append(line)
+                continue
+            if section.text.strip():
+                return section
+            # an empty "Unreleased" section does not count
+            section = None
+        if heading is None:
+            continue
+        level, title = heading
+        heading_version = _heading_version(title)
+        if heading_version == wanted or UNRELEASED in title.lower():
+            section = ChangelogSection(title=title, line_number=number, level=level)
+        elif heading_version is not None:
+            # entries are sorted, so everything below is older
+            return None
+    if section is not None and section.text.strip():
+        return section
+    return None
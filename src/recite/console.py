@@ -1,8 +1,9 @@
-from dataclasses import dataclass
-from typing import Any, Iterable, Optional
-
-from rich import print as rprint
-from rich.table import Table
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from .step import Step
 
@@ -15,8 +16,51 @@ class ReciteConsole:
     good_color: str = "green"
     bad_glyph: str = "✘ "
     good_glyph: str = "✓ "
+    # how often the live status of running steps is redrawn
+    refresh_per_second: float = 8
+    # None detects whether output goes to a terminal
+    force_terminal: Optional[bool] = None
+    _console: Any = field(default=None, init=False, repr=False)
+    _live: Any = field(default=None, init=False, repr=False)
+    _pending: List[str] = field(default_factory=list, init=False, repr=False)
+    _running: Dict[int, Tuple[str, float, Any]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _lock: threading.RLock = field(
+        default_factory=threading.RLock, init=False, repr=False
+    )
 
-    def print_message(
+    @property
+    def output(self):
+        # one console for all output, created on first use
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console(force_terminal=self.force_terminal)
+        return self._console
+
+    @property
+    def is_interactive(self) -> bool:
+        return self.output.is_terminal
+
+    def _write(self, lines: List[str]):
+        if not self.is_interactive:
+            # plain and unbuffered, e.g. for CI logs
+            from rich.text import Text
+
+            with self._lock:
+                for line in lines:
+                    sys.stdout.write(Text.from_markup(line).plain + "\n")
+                sys.stdout.flush()
+            return
+        with self._lock:
+            if self._live is not None:
+                # written with the next refresh of the live status
+                self._pending.extend(lines)
+            else:
+                self.output.print("\n".join(lines))
+
+    def _format(
         self,
         message: str,
         color: str = "white",
@@ -25,7 +69,7 @@ class ReciteConsole:
         indent_count: int = 0,
         indent_char: str = "*",
         indent_whitespace: str = "\t",
-    ):
+    ) -> str:
         if color.lower() == "bad":
             color = self.bad_color
         elif color.lower() == "good":
@@ -34,10 +78,34 @@ class ReciteConsole:
         if indent_count > 0:
             indent_str = indent_whitespace * indent_count
             indent_str += indent_char + " "
-        rprint(
+        return (
             f"{self.prefix} {number_str}[{color}]{indent_str}{glyph}{message}[/{color}]"
         )
 
+    def print_message(
+        self,
+        message: str,
+        color: str = "white",
+        glyph: str = "",
+        number_str: str = "",
+        indent_count: int = 0,
+        indent_char: str = "*",
+        indent_whitespace: str = "\t",
+    ):
+        self._write(
+            [
+                self._format(
+                    message=message,
+                    color=color,
+                    glyph=glyph,
+                    number_str=number_str,
+                    indent_count=indent_count,
+                    indent_char=indent_char,
+                    indent_whitespace=indent_whitespace,
+                )
+            ]
+        )
+
     def print_multiple_messages(
         self,
         messages: Iterable[str],
@@ -45,15 +113,25 @@ class ReciteConsole:
         indent_count: int = 0,
         indent_char: str = "*",
     ):
+        lines = []
         for msg_n, msg in enumerate(messages):
             if msg_n > 0:
                 indent_char = " "
-            self.print_message(
-                message=msg,
-                indent_count=indent_count,
-                indent_char=indent_char,
-                color=color,
+            lines.append(
+                self._format(
+                    message=msg,
+                    indent_count=indent_count,
+                    indent_char=indent_char,
+                    color=color,
+                )
             )
+        if lines:
+            self._write(lines)
+
+    def print_output(self, label: str, line: str):
+        from rich.markup import escape
+
+        self._write([f"{self.prefix} [dim]{escape(label)} | {escape(line)}[/dim]"])
 
     def print_success(self, message: str, number: Optional[int] = None):
         number_str = ""
@@ -83,9 +161,81 @@ class ReciteConsole:
         )
 
     def print_checks_table(self, checks: Iterable[Step]):
+        from rich.table import Table
+
         table = Table(title="Available Checks")
         table.add_column("Shortname", style="cyan", no_wrap=True)
         table.add_column("Description", style="green", no_wrap=True)
         for check in checks:
             table.add_row(check.short_name, check.description)
-        rprint(table)
+        self.output.print(table)
+
+    def step_started(self, step: Step):
+        spinner = None
+        if self.is_interactive:
+            from rich.spinner import Spinner
+
+            spinner = Spinner("dots", style=self.good_color)
+        with self._lock:
+            self._running[id(step)] = (step.description, time.monotonic(), spinner)
+
+    def step_finished(self, step: Step):
+        with self._lock:
+            self._running.pop(id(step), None)
+
+    def _status_table(self):
+        from rich.table import Table
+
+        table = Table.grid(padding=(0, 1))
+        now = time.monotonic()
+        with self._lock:
+            for description, started, spinner in self._running.values():
+                table.add_row(spinner, description, f"{now - started:.1f}s")
+        return table
+
+    def _refresh(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                # one print for everything since the last refresh
+                self._live.console.print("\n".join(pending))
+            self._live.refresh()
+
+    @contextmanager
+    def live_status(self) -> Iterator[None]:
+        """Show running steps with their elapsed time below the messages.
+
+        Messages and the status are redrawn together at
+        `refresh_per_second`. Without a terminal nothing is shown.
+
+        :yield: Nothing, the status is shown until the context is left
+        """
+        if not self.is_interactive:
+            yield
+            return
+        from rich.live import Live
+
+        stop = threading.Event()
+
+        def refresh_regularly():
+            while not stop.wait(1 / self.refresh_per_second):
+                self._refresh()
+
+        with Live(
+            get_renderable=self._status_table,
+            console=self.output,
+            auto_refresh=False,
+            transient=True,
+        ) as live:
+            with self._lock:
+                self._live = live
+            refresher = threading.Thread(target=refresh_regularly, daemon=True)
+            refresher.start()
+            try:
+                yield
+            finally:
+                stop.set()
+                refresher.join()
+                self._refresh()
+                with self._lock:
+                    self._live = None
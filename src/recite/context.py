@@ -0,0 +1,153 @@
+import hashlib
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from .session import RepoSession
+
+if TYPE_CHECKING:  # pragma: no cover
+    from concurrent.futures import Future
+
+CHANGELOG_PATHS = ("CHANGELOG", "CHANGELOG.md", "CHANGELOG.rst")
+
+
+def ensure_recite_dir(project_dir: str, *parts: str) -> str:
+    """Create a directory below `.recite`, which git is told to ignore.
+
+    :param project_dir: Directory containing the `.recite` directory
+    :param parts: Path components below `.recite`
+    :return: Path of the created directory
+    """
+    recite_dir = os.path.join(project_dir, ".recite")
+    path = os.path.join(recite_dir, *parts)
+    os.makedirs(path, exist_ok=True)
+    gitignore = os.path.join(recite_dir, ".gitignore")
+    if not os.path.exists(gitignore):
+        with open(gitignore, "w", encoding="utf-8") as f:
+            f.write("# created by recite\n*\n")
+    return path
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProjectContext:
+    """Facts about the project, that are shared by all steps of one run.
+
+    Everything is computed lazily on first access and cached until a step
+    reports that it mutated the project, which calls :meth:`invalidate`.
+    """
+
+    def __init__(self, project_dir: Optional[str] = None):
+        self.project_dir = os.path.abspath(project_dir or os.getcwd())
+        self._facts: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        # found by the changelog checks, survives invalidation
+        self.release_notes: Optional[str] = None
+        # built by the build step, survives invalidation
+        self.artifacts: List[str] = []
+        # network operations started in the background, see prefetch
+        self._prefetched: Dict[str, "Future"] = {}
+
+    def _fact(self, name: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if name not in self._facts:
+                self._facts[name] = compute()
+            return self._facts[name]
+
+    @property
+    def pyproject_path(self) -> str:
+        return os.path.join(self.project_dir, "pyproject.toml")
+
+    def _load_pyproject(self) -> Dict[str, Any]:
+        try:
+            import tomllib
+        except ModuleNotFoundError:  # pragma: no cover
+            import toml
+
+            return toml.load(self.pyproject_path)
+        with open(self.pyproject_path, "rb") as f:
+            return tomllib.load(f)
+
+    @property
+    def pyproject(self) -> Dict[str, Any]:
+        return self._fact("pyproject", self._load_pyproject)
+
+    def _find_changelog(self) -> Optional[str]:
+        for name in CHANGELOG_PATHS:
+            path = os.path.join(self.project_dir, name)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    @property
+    def changelog_path(self) -> Optional[str]:
+        return self._fact("changelog_path", self._find_changelog)
+
+    def _read_version(self) -> str:
+        pyproject = self.pyproject
+        version = pyproject.get("tool", {}).get("poetry", {}).get("version")
+        if version is None:
+            version = pyproject.get("project", {}).get("version")
+        if version is None:
+            raise ValueError(f"Could not find a version in {self.pyproject_path}")
+        return version
+
+    @property
+    def current_version(self) -> str:
+        return self._fact("current_version", self._read_version)
+
+    @property
+    def git(self) -> RepoSession:
+        return RepoSession.for_dir(self.project_dir)
+
+    def prefetch(self, name: str, compute: Callable[[], Any]):
+        """Start `compute` in the background, unless it was started already.
+
+        The thread does not keep recite alive, e.g. if a check failed before
+        the result was needed.
+
+        :param name: Name the result is awaited by, see :meth:`prefetched`
+        :param compute: Usually waits on the network
+        """
+        from concurrent.futures import Future
+
+        with self._lock:
+            if name in self._prefetched:
+                return
+            future: Future = Future()
+            self._prefetched[name] = future
+
+        def run():
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name=f"prefetch {name}", daemon=True).start()
+
+    def prefetched(self, name: str, compute: Callable[[], Any]) -> Any:
+        """Await the result of a prefetch, which is only used once.
+
+        Whatever the prefetch raised is raised here again.
+
+        :param name: Name the prefetch was started with
+        :param compute: Computes the result now, if it was not prefetched
+        :return: Result of the prefetch
+        """
+        with self._lock:
+            future = self._prefetched.pop(name, None)
+        if future is None:
+            return compute()
+        return future.result()
+
+    def invalidate(self):
+        """Forget everything, because a step changed the project."""
+        with self._lock:
+            self._facts.clear()
+        self.git.invalidate()
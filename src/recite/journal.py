@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from .cache import step_params
+from .context import ensure_recite_dir
+from .session import RepoSession
+from .step import BumpVersionStep, Result, Step
+
+
+class ReleaseJournal:
+    """Records the release steps that finished, so a failed release can be resumed.
+
+    The journal lives in `.recite/journal` and is written after every step.
+    Besides the parameters of finished steps it keeps the commit HEAD pointed
+    to when it was last written, the bumped versions and what the checks
+    found out about the project (release notes and artifacts), because the
+    checks are not repeated when resuming.
+    """
+
+    def __init__(self, project_dir: str):
+        self.project_dir = project_dir
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.head: Optional[str] = None
+        # release notes and artifacts by project directory
+        self.contexts: Dict[str, Dict[str, Any]] = {}
+        self.resuming = False
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.project_dir, ".recite", "journal", "release.json")
+
+    def _current_head(self) -> Optional[str]:
+        from git.exc import InvalidGitRepositoryError, NoSuchPathError
+
+        session = RepoSession.for_dir(self.project_dir)
+        # facts may be stale, e.g. after a commit of a failed step
+        session.invalidate()
+        try:
+            return session.head_sha
+        except (InvalidGitRepositoryError, NoSuchPathError, ValueError):
+            return None
+
+    def _snapshot(self, steps: Iterable[Step]):
+        for step in steps:
+            context = getattr(step, "context", None)
+            if context is not None:
+                self.contexts[context.project_dir] = {
+                    "release_notes": context.release_notes,
+                    "artifacts": context.artifacts,
+                }
+
+    def _write(self):
+        ensure_recite_dir(self.project_dir, "journal")
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"head": self.head, "contexts": self.contexts, "steps": self.records},
+                f,
+                indent=1,
+            )
+        # a crash while writing must not destroy the previous journal
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> bool:
+        """Read the journal of an unfinished release.
+
+        :return: Whether there is a release to resume
+        """
+        if not os.path.isfile(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            journal = json.load(f)
+        self.head = journal["head"]
+        self.contexts = journal["contexts"]
+        self.records = journal["steps"]
+        self.resuming = True
+        return True
+
+    def start(self, steps: Iterable[Step]):
+        """Start a new journal, replacing the one of an earlier release.
+
+        :param steps: Steps of the release, their projects were checked
+        """
+        with self._lock:
+            self.records = {}
+            self.contexts = {}
+            self.head = self._current_head()
+            self._snapshot(steps)
+            self._write()
+
+    def record(self, step: Step, result: Result):
+        """Remember a step, if it succeeded or changed the project.
+
+        :param step: Step that just finished
+        :param result: Result of the step
+        """
+        if not result.success and not result.mutated_project:
+            return
+        with self._lock:
+            if result.success:
+                record: Dict[str, Any] = {
+                    "params": step_params(step),
+                    "finished_at": time.time(),
+                }
+                if isinstance(step, BumpVersionStep):
+                    record["version"] = step.project_context.current_version
+                self.records[step.short_name] = record
+            self.head = self._current_head()
+            self._snapshot([step])
+            self._write()
+
+    def completed(self, step: Step) -> bool:
+        return step.short_name in self.records
+
+    def version(self, step: Step) -> Optional[str]:
+        """Version a finished :class:`BumpVersionStep` bumped to."""
+        return self.records.get(step.short_name, {}).get("version")
+
+    def verify(self, steps: Iterable[Step]) -> List[str]:
+        """Check that the project is still in the state the journal recorded.
+
+        :param steps: Steps of the release to resume
+        :return: Problems, that prevent resuming
+        """
+        problems = []
+        steps = list(steps)
+        known = {step.short_name for step in steps}
+        for name in self.records:
+            if name not in known:
+                problems.append(f"Step {name} is not part of this release")
+        for step in steps:
+            if not self.completed(step):
+                continue
+            if self.records[step.short_name]["params"] != step_params(step):
+                problems.append(
+                    f"Options of {step.short_name} changed since the release was started"
+                )
+            version = self.version(step)
+            if version is not None and version != step.project_context.current_version:
+                problems.append(
+                    f"Expected version {version} in {step.project_context.pyproject_path}"
+                )
+        head = self._current_head()
+        if head != self.head:
+            problems.append(
+                f"HEAD moved from {str(self.head)[:12]} to {str(head)[:12]} since the release failed"
+            )
+        return problems
+
+    def restore(self, steps: Iterable[Step]):
+        """Restore what the checks found out about the projects of `steps`."""
+        for step in steps:
+            context = getattr(step, "context", None)
+            if context is None or context.project_dir not in self.contexts:
+                continue
+            facts = self.contexts[context.project_dir]
+            if context.release_notes is None:
+                context.release_notes = facts["release_notes"]
+            if not context.artifacts:
+                context.artifacts = facts["artifacts"]
+
+    def finish(self):
+        """Remove the journal of a finished release."""
+        with self._lock:
+            self.records = {}
+            self.resuming = False
+            if os.path.isfile(self.path):
+                os.remove(self.path)
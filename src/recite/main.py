@@ -1,32 +1,53 @@
 import os
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 import typer
 
+from .cache import ResultCache
 from .console import ReciteConsole
+from .context import ProjectContext
+from .journal import ReleaseJournal
 from .runner import CheckStepRunner, PerformReleaseRunner
+from .session import RepoSession
 from .step import (
+    BuildStep,
     BumpVersionStep,
+    CheckChangelogEntryStep,
     CheckChangelogStep,
     CheckCleanGitStep,
     CheckOnMainStep,
     CheckPyProjectStep,
+    CheckTagAvailableStep,
     CommitVersionBumpStep,
     GithubReleaseReminderStep,
     GitTagStep,
     PoetryPublishStep,
+    PublishStep,
     PushTagStep,
     RunTestsStep,
+    Step,
 )
+from .workspace import Package, discover_packages, release_waves
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .profiling import StepProfiler
 
 console = ReciteConsole()
 app = typer.Typer()
+# poetry can only publish to the repository configured in poetry
+PUBLISHERS = ("recite", "poetry")
 
 
 def _setup(
     git_tag_prefix: str = "",
     allow_untracked_files: bool = False,
     skip_checks: Optional[str] = None,
+    concurrent_checks: bool = False,
+    use_cache: bool = True,
+    test_workers: int = 1,
+    release_type: Optional[str] = None,
+    remote: str = "origin",
+    ls_remote: bool = False,
 ):
     project_dir = os.getcwd()
     console = ReciteConsole()
@@ -35,13 +56,26 @@ def _setup(
             CheckPyProjectStep(),
             CheckOnMainStep(project_dir=project_dir),
             CheckCleanGitStep(
-                project_dir=project_dir, allow_untracked_files=allow_untracked_files
+                project_dir=project_dir,
+                allow_untracked_files=allow_untracked_files,
+                remote=remote,
+                ls_remote=ls_remote,
             ),
-            RunTestsStep(),
+            RunTestsStep(workers=test_workers),
             CheckChangelogStep(project_dir=project_dir, prefix=git_tag_prefix),
+            CheckChangelogEntryStep(project_dir=project_dir, bump_rule=release_type),
+            CheckTagAvailableStep(
+                project_dir=project_dir,
+                prefix=git_tag_prefix,
+                remote=remote,
+                bump_rule=release_type,
+            ),
         ],
         console=console,
         skip_steps=skip_checks,
+        concurrent=concurrent_checks,
+        cache=ResultCache(project_dir=project_dir) if use_cache else None,
+        context=ProjectContext(project_dir=project_dir),
     )
     return project_dir, console, checks
 
@@ -52,6 +86,60 @@ def list_checks():
     console.print_checks_table(checks.steps)
 
 
+def _validate_repositories(specs: List[str]) -> List[str]:
+    from .publish import parse_repository
+
+    for spec in specs:
+        try:
+            parse_repository(spec)
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
+    return specs
+
+
+def _validate_publisher(publisher: str) -> str:
+    if publisher not in PUBLISHERS:
+        raise typer.BadParameter(f"Expected one of {list(PUBLISHERS)}")
+    return publisher
+
+
+def _parse_timeouts(specs: List[str]) -> Dict[str, float]:
+    timeouts = {}
+    for spec in specs:
+        name, _, seconds = spec.partition("=")
+        try:
+            timeouts[name.strip()] = float(seconds)
+        except ValueError:
+            raise typer.BadParameter(f"Expected 'name=seconds', got '{spec}'")
+        if not name.strip() or timeouts[name.strip()] <= 0:
+            raise typer.BadParameter(f"Expected 'name=seconds', got '{spec}'")
+    return timeouts
+
+
+def _validate_timeouts(specs: List[str]) -> List[str]:
+    _parse_timeouts(specs)
+    return specs
+
+
+def _check_timeout_names(
+    console: ReciteConsole, timeouts: Dict[str, float], steps: List[Step]
+):
+    # in a workspace "core:publish" is matched by "publish" as well
+    known = {step.short_name for step in steps}
+    known |= {name.rsplit(":", 1)[-1] for name in known}
+    unknown = [name for name in timeouts if name not in known]
+    if unknown:
+        console.print_multiple_messages(
+            messages=[
+                f"Unknown step(s) to set a timeout for: {unknown}",
+                "You can get the list of available checks via [italic]`recite list-checks`[/italic]",
+            ],
+            indent_count=1,
+            color="red",
+        )
+        raise typer.Exit(code=1)
+
+
 @app.command()
 def release(
     release_type: str = typer.Argument(
@@ -61,6 +149,10 @@ def release(
         False, help="Allow files not tracked by git"
     ),
     remote: str = typer.Option("origin", help="Where should the tag be pushed?"),
+    ls_remote: bool = typer.Option(
+        False,
+        help="Compare your branch with the remote via 'git ls-remote' instead of fetching it, which downloads nothing",
+    ),
     commit_message: str = typer.Option(
         "Bumped version", help="Commit message for version bump"
     ),
@@ -71,41 +163,314 @@ def release(
         None,
         help="Comma-seperated list of checks referenced by their shortnames. You can print a list of checks with 'recite list-checks'",
     ),
+    concurrent_checks: bool = typer.Option(
+        False, help="Run all checks at the same time instead of one after another"
+    ),
+    concurrent_release: bool = typer.Option(
+        False,
+        help="Run release steps that do not depend on each other at the same time",
+    ),
+    cache: bool = typer.Option(
+        True, help="Skip checks that already passed on the exact same project state"
+    ),
+    test_workers: int = typer.Option(
+        1, help="Number of nox sessions of the test-suite to run in parallel"
+    ),
+    repository: List[str] = typer.Option(
+        ["pypi"],
+        help="Where to publish, as 'name=url' or 'pypi'/'testpypi'. Can be given multiple times, credentials are read from NAME_TOKEN",
+        callback=_validate_repositories,
+    ),
+    profile: bool = typer.Option(
+        False,
+        help="Print how long each step took and write a trace to .recite/profiles, which can be opened with Perfetto",
+    ),
+    workspace: bool = typer.Option(
+        False,
+        help="Release all poetry packages below the current directory, checks are run concurrently",
+    ),
+    timeout: List[str] = typer.Option(
+        [],
+        help="Timeout of a step as 'shortname=seconds', e.g. 'run_tests=900'. Can be given multiple times",
+        callback=_validate_timeouts,
+    ),
+    atomic_push: bool = typer.Option(
+        False,
+        help="Push the version bump together with the tag in one atomic push, so either both or none are published",
+    ),
+    resume: bool = typer.Option(
+        False,
+        help="Continue a failed release with the first step that did not finish, without repeating the checks",
+    ),
+    skip_existing: bool = typer.Option(
+        False,
+        help="Treat files that already exist on an index as published instead of failing",
+    ),
+    publisher: str = typer.Option(
+        "recite",
+        help="Upload with 'recite' itself or with 'poetry', which publishes to PyPI via 'poetry publish'",
+        callback=_validate_publisher,
+    ),
 ):
     if git_tag_prefix == "None":
         git_tag_prefix = ""
-    project_dir, console, checks = _setup(
-        allow_untracked_files=allow_untracked_files,
-        skip_checks=skip_checks,
-        git_tag_prefix=git_tag_prefix,
+    if publisher == "poetry" and (tuple(repository) != ("pypi",) or skip_existing):
+        raise typer.BadParameter(
+            "--repository and --skip-existing are not supported by poetry",
+            param_hint="'--publisher'",
+        )
+    if workspace:
+        console, checks, packages, contexts = _setup_workspace(
+            allow_untracked_files=allow_untracked_files,
+            skip_checks=skip_checks,
+            git_tag_prefix=git_tag_prefix,
+            use_cache=cache,
+            test_workers=test_workers,
+            release_type=release_type,
+            remote=remote,
+            ls_remote=ls_remote,
+        )
+        try:
+            steps = _workspace_release_steps(
+                packages=packages,
+                contexts=contexts,
+                release_type=release_type,
+                remote=remote,
+                commit_message=commit_message,
+                git_tag_prefix=git_tag_prefix,
+                repositories=tuple(repository),
+                atomic_push=atomic_push,
+                skip_existing=skip_existing,
+                publisher=publisher,
+            )
+        except ValueError as e:
+            # e.g. cyclic path dependencies
+            console.print_failure(str(e))
+            raise typer.Exit(code=1)
+    else:
+        _, console, checks = _setup(
+            allow_untracked_files=allow_untracked_files,
+            skip_checks=skip_checks,
+            git_tag_prefix=git_tag_prefix,
+            concurrent_checks=concurrent_checks,
+            use_cache=cache,
+            test_workers=test_workers,
+            release_type=release_type,
+            remote=remote,
+            ls_remote=ls_remote,
+        )
+        steps = _release_steps(
+            release_type=release_type,
+            remote=remote,
+            commit_message=commit_message,
+            git_tag_prefix=git_tag_prefix,
+            repositories=tuple(repository),
+            atomic_push=atomic_push,
+            skip_existing=skip_existing,
+            publisher=publisher,
+        )
+    journal = ReleaseJournal(project_dir=os.getcwd())
+    if resume and not journal.load():
+        console.print_failure("There is no failed release to resume")
+        raise typer.Exit(code=1)
+    release_runner = PerformReleaseRunner(
+        steps=steps,
+        console=console,
+        is_initial=release_type == "initial",
+        concurrent=concurrent_release,
+        context=checks.context,
+        timeouts=_parse_timeouts(timeout),
+        journal=journal,
+    )
+    checks.timeouts = release_runner.timeouts
+    _check_timeout_names(console, release_runner.timeouts, [*checks.steps, *steps])
+    profiler = None
+    if profile:
+        from .profiling import StepProfiler
+
+        profiler = StepProfiler(project_dir=os.getcwd())
+        checks.hooks.append(profiler)
+        release_runner.hooks.append(profiler)
+    try:
+        # the checks passed before the release was started
+        if not resume and not checks.run_steps():
+            raise typer.Exit(code=1)
+        if not release_runner.run_steps():
+            console.print_message(
+                message="Fix the problem and run the same command with [italic]`--resume`[/italic] to continue"
+            )
+            raise typer.Exit(code=1)
+    finally:
+        RepoSession.close_all()
+        if profiler is not None:
+            _print_profile(console, profiler)
+
+
+def _print_profile(console: ReciteConsole, profiler: "StepProfiler"):
+    console.print_message(message="Time spent per step:")
+    console.print_multiple_messages(messages=profiler.summary(), indent_count=1)
+    console.print_message(message=f"Trace written to {profiler.write_trace()}")
+
+
+def _release_steps(
+    release_type: str,
+    remote: str,
+    commit_message: str,
+    git_tag_prefix: str,
+    repositories: Tuple[str, ...] = ("pypi",),
+    atomic_push: bool = False,
+    skip_existing: bool = False,
+    publisher: str = "recite",
+) -> List[Step]:
+    # the upload can not be undone, so the tag has to be pushed before
+    publish: Step = PublishStep(
+        repositories=repositories,
+        skip_existing=skip_existing,
+        depends_on=("build", "pushtag"),
     )
-    successful = checks.run_steps()
-    if not successful:
+    if publisher == "poetry":
+        publish = PoetryPublishStep(depends_on=("build", "pushtag"))
+    if release_type == "initial":
+        return [
+            GitTagStep(prefix=git_tag_prefix),
+            PushTagStep(remote=remote, prefix=git_tag_prefix, depends_on=("gittag",)),
+            BuildStep(),
+            publish,
+            GithubReleaseReminderStep(depends_on=("pushtag", "publish")),
+        ]
+    return [
+        BumpVersionStep(bump_rule=release_type),
+        CommitVersionBumpStep(
+            commit_message=commit_message,
+            remote=remote,
+            push=not atomic_push,
+            depends_on=("bumpversion",),
+        ),
+        GitTagStep(prefix=git_tag_prefix, depends_on=("commitbump",)),
+        PushTagStep(
+            remote=remote,
+            prefix=git_tag_prefix,
+            atomic=atomic_push,
+            depends_on=("gittag",),
+        ),
+        # building does not need the tag, so it can overlap with tagging
+        BuildStep(depends_on=("commitbump",)),
+        publish,
+        GithubReleaseReminderStep(depends_on=("pushtag", "publish")),
+    ]
+
+
+def _scope_to_package(
+    steps: List[Step], package: Package, context: ProjectContext, prefix_names: bool
+):
+    for step in steps:
+        step.project_dir = package.project_dir
+        step.context = context
+        step.description = f"{package.name}: {step.description}"
+        if prefix_names:
+            # short names have to be unique for the dependencies between steps
+            step.short_name = f"{package.name}:{step.short_name}"
+            step.depends_on = tuple(f"{package.name}:{d}" for d in step.depends_on)
+
+
+def _setup_workspace(
+    git_tag_prefix: str = "",
+    allow_untracked_files: bool = False,
+    skip_checks: Optional[str] = None,
+    use_cache: bool = True,
+    test_workers: int = 1,
+    release_type: Optional[str] = None,
+    remote: str = "origin",
+    ls_remote: bool = False,
+) -> Tuple[ReciteConsole, CheckStepRunner, List[Package], Dict[str, ProjectContext]]:
+    root = os.getcwd()
+    console = ReciteConsole()
+    packages = discover_packages(root)
+    if len(packages) == 0:
+        console.print_failure(f"Could not find any poetry packages below {root}")
         raise typer.Exit(code=1)
-    else:
-        is_initial = False
-        if release_type == "initial":
-            steps = [
-                GitTagStep(prefix=git_tag_prefix),
-                PushTagStep(remote=remote, prefix=git_tag_prefix),
-                PoetryPublishStep(),
-                GithubReleaseReminderStep(),
-            ]
-            is_initial = True
-        else:
-            steps = [
-                BumpVersionStep(bump_rule=release_type),
-                CommitVersionBumpStep(commit_message=commit_message),
-                GitTagStep(prefix=git_tag_prefix),
-                PushTagStep(remote=remote, prefix=git_tag_prefix),
-                PoetryPublishStep(),
-                GithubReleaseReminderStep(),
-            ]
-        PerformReleaseRunner(
-            steps=steps,
-            console=console,
-            is_initial=is_initial,
-        ).run_steps()
+    # repository-wide checks are only done once
+    steps: List[Step] = [
+        CheckOnMainStep(project_dir=root),
+        CheckCleanGitStep(
+            project_dir=root,
+            allow_untracked_files=allow_untracked_files,
+            remote=remote,
+            ls_remote=ls_remote,
+        ),
+    ]
+    contexts = {}
+    for package in packages:
+        contexts[package.name] = ProjectContext(project_dir=package.project_dir)
+        package_steps: List[Step] = [
+            CheckPyProjectStep(),
+            RunTestsStep(workers=test_workers),
+            CheckChangelogStep(prefix=f"{package.name}-{git_tag_prefix}"),
+            CheckChangelogEntryStep(bump_rule=release_type),
+            CheckTagAvailableStep(
+                prefix=f"{package.name}-{git_tag_prefix}",
+                remote=remote,
+                bump_rule=release_type,
+            ),
+        ]
+        _scope_to_package(
+            package_steps, package, contexts[package.name], prefix_names=False
+        )
+        steps.extend(package_steps)
+    checks = CheckStepRunner(
+        steps=steps,
+        console=console,
+        skip_steps=skip_checks,
+        concurrent=True,
+        cache=ResultCache(project_dir=root) if use_cache else None,
+        context=ProjectContext(project_dir=root),
+    )
+    return console, checks, packages, contexts
+
+
+def _workspace_release_steps(
+    packages: List[Package],
+    contexts: Dict[str, ProjectContext],
+    release_type: str,
+    remote: str,
+    commit_message: str,
+    git_tag_prefix: str,
+    repositories: Tuple[str, ...] = ("pypi",),
+    atomic_push: bool = False,
+    skip_existing: bool = False,
+    publisher: str = "recite",
+) -> List[Step]:
+    steps: List[Step] = []
+    previous_tag = None
+    for wave in release_waves(packages):
+        for package in wave:
+            package_steps = _release_steps(
+                release_type=release_type,
+                remote=remote,
+                commit_message=f"{commit_message} of {package.name}",
+                git_tag_prefix=f"{package.name}-{git_tag_prefix}",
+                repositories=repositories,
+                atomic_push=atomic_push,
+                skip_existing=skip_existing,
+                publisher=publisher,
+            )
+            _scope_to_package(
+                package_steps, package, contexts[package.name], prefix_names=True
+            )
+            # a package is only released after the packages it depends on
+            package_steps[0].depends_on += tuple(
+                f"{dep}:publish" for dep in package.path_dependencies
+            )
+            for step in package_steps:
+                if step.short_name == f"{package.name}:commitbump":
+                    # commits to the same repository can not happen concurrently
+                    # and the tag of the package before has to be on its own
+                    # bump commit, not on this one
+                    if previous_tag is not None:
+                        step.depends_on += (previous_tag,)
+                    previous_tag = f"{package.name}:gittag"
+            steps.extend(package_steps)
+    return steps
 
 
 if __name__ == "__main__":
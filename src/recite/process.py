@@ -0,0 +1,233 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import partial
+from typing import IO, Callable, List, Optional, Sequence, Set
+
+# longer lines are split, so a single line can not exhaust memory either
+MAX_LINE_BYTES = 64 * 1024
+# seconds a terminated process gets to clean up before it is killed
+TERMINATE_GRACE = 3.0
+
+# processes started by run_process, that did not finish yet
+_running: Set[subprocess.Popen] = set()
+_running_lock = threading.Lock()
+# set on fail fast, commands that did not start yet are not started anymore
+_cancelled = threading.Event()
+# running processes, that were terminated by cancel_all
+_cancelled_processes: Set[subprocess.Popen] = set()
+
+
+class ProcessCancelled(Exception):
+    """Raised instead of a result, if a command was terminated by :func:`cancel_all`."""
+
+
+@dataclass
+class ProcessResult:
+    command: Sequence[str]
+    returncode: int
+    # only the last lines of the combined stdout and stderr
+    tail: List[str]
+    seconds: float
+    log_path: Optional[str] = None
+    timed_out: bool = False
+    # terminated or not even started because of cancel_all
+    cancelled: bool = False
+
+    @property
+    def output(self) -> str:
+        return "\n".join(self.tail)
+
+
+def _signal_group(process: subprocess.Popen, sig: int):
+    try:
+        if os.name == "posix":
+            # the process leads its own group, which contains all its children
+            os.killpg(process.pid, sig)
+        elif sig == signal.SIGTERM:  # pragma: no cover
+            process.terminate()
+        else:  # pragma: no cover
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        # already gone
+        pass
+
+
+def _terminate(processes: List[subprocess.Popen], grace: float):
+    for process in processes:
+        _signal_group(process, signal.SIGTERM)
+    deadline = time.monotonic() + grace
+    for process in processes:
+        try:
+            process.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            _signal_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+
+def terminate_all(grace: float = TERMINATE_GRACE) -> int:
+    """Terminate all commands started by :func:`run_process`, with their children.
+
+    :param grace: Seconds to wait for processes to exit, before they are killed
+    :return: Number of terminated processes
+    """
+    with _running_lock:
+        processes = list(_running)
+    _terminate(processes, grace)
+    return len(processes)
+
+
+def _not_started(
+    command: Sequence[str],
+    returncode: int,
+    message: str,
+    log: Optional[IO[bytes]],
+    log_path: Optional[str],
+    start: float,
+    cancelled: bool = False,
+) -> ProcessResult:
+    if log is not None:
+        log.write(f"{message}\n".encode())
+    return ProcessResult(
+        command=command,
+        returncode=returncode,
+        tail=[message],
+        seconds=time.perf_counter() - start,
+        log_path=log_path,
+        cancelled=cancelled,
+    )
+
+
+def cancel_all(grace: float = TERMINATE_GRACE) -> int:
+    """Terminate all running commands and refuse to start new ones.
+
+    Commands are started again after :func:`reset_cancel`.
+
+    :param grace: Seconds to wait for processes to exit, before they are killed
+    :return: Number of terminated processes
+    """
+    with _running_lock:
+        _cancelled.set()
+        processes = list(_running)
+        _cancelled_processes.update(processes)
+    _terminate(processes, grace)
+    return len(processes)
+
+
+def cancelled() -> bool:
+    """Whether :func:`cancel_all` was called since the last :func:`reset_cancel`."""
+    return _cancelled.is_set()
+
+
+def reset_cancel():
+    _cancelled.clear()
+
+
+def run_process(
+    command: Sequence[str],
+    cwd: Optional[str] = None,
+    log_path: Optional[str] = None,
+    echo: Optional[Callable[[str], None]] = None,
+    tail_lines: int = 50,
+    timeout: Optional[float] = None,
+) -> ProcessResult:
+    """Run a command, streaming its output line by line.
+
+    Stdout and stderr are combined. Every line is appended to `log_path` and
+    passed to `echo`, but only the last `tail_lines` lines are kept in
+    memory, so memory stays flat no matter how much the command prints.
+
+    The command runs in its own process group, so on timeout or
+    :func:`terminate_all` its children are terminated as well. After
+    :func:`cancel_all` the command is not started at all.
+
+    :param command: Command and its arguments
+    :param cwd: Working directory of the command
+    :param log_path: File the complete output is appended to
+    :param echo: Called with every line of output
+    :param tail_lines: Number of lines to keep
+    :param timeout: Seconds after which the command is terminated
+    :return: Result with the exit code and the last lines of output
+    """
+    start = time.perf_counter()
+    tail: deque = deque(maxlen=tail_lines)
+    log = open(log_path, "ab") if log_path is not None else None
+    timer = None
+    process = None
+    timed_out = threading.Event()
+    try:
+        if _cancelled.is_set():
+            # the same as if it was terminated right away
+            return _not_started(
+                command,
+                -signal.SIGTERM,
+                "Cancelled",
+                log,
+                log_path,
+                start,
+                cancelled=True,
+            )
+        try:
+            process = subprocess.Popen(
+                command,
+                cwd=cwd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                start_new_session=os.name == "posix",
+            )
+        except FileNotFoundError:
+            # the same as in a shell
+            return _not_started(
+                command, 127, f"Command not found: {command[0]}", log, log_path, start
+            )
+        with _running_lock:
+            _running.add(process)
+            # cancel_all only sees processes that were added before
+            if _cancelled.is_set():
+                _cancelled_processes.add(process)
+                _signal_group(process, signal.SIGTERM)
+        if timeout is not None:
+
+            def expire():
+                timed_out.set()
+                _terminate([process], TERMINATE_GRACE)
+
+            timer = threading.Timer(timeout, expire)
+            timer.daemon = True
+            timer.start()
+        assert process.stdout is not None  # for mypy
+        with process.stdout as stdout:
+            for raw in iter(partial(stdout.readline, MAX_LINE_BYTES), b""):
+                if log is not None:
+                    log.write(raw)
+                line = raw.decode(errors="replace").rstrip("\r\n")
+                tail.append(line)
+                if echo is not None:
+                    echo(line)
+        returncode = process.wait()
+    finally:
+        was_cancelled = False
+        if process is not None:
+            with _running_lock:
+                _running.discard(process)
+                was_cancelled = process in _cancelled_processes
+                _cancelled_processes.discard(process)
+        if timer is not None:
+            timer.cancel()
+        if log is not None:
+            log.close()
+    if timed_out.is_set():
+        tail.append(f"Terminated after {timeout:g}s")
+    return ProcessResult(
+        command=command,
+        returncode=returncode,
+        tail=list(tail),
+        seconds=time.perf_counter() - start,
+        log_path=log_path,
+        timed_out=timed_out.is_set(),
+        cancelled=was_cancelled,
+    )
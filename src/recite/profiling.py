@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .context import ensure_recite_dir
+from .runner import StepHook
+from .step import Result, Step
+
+
+def _children_usage() -> Tuple[float, Optional[int]]:
+    # CPU time and peak RSS (in KiB) of all terminated and waited for children
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        # not available on windows
+        return 0.0, None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+
+
+@dataclass
+class StepProfile:
+    short_name: str
+    description: str
+    thread_id: int
+    thread_name: str
+    # seconds since the profiler was created
+    start: float
+    wall: float
+    cpu: float
+    children_cpu: float
+    # only known if the step spawned a process bigger than all before
+    children_max_rss_kib: Optional[int]
+    success: bool
+
+
+@dataclass
+class StepProfiler(StepHook):
+    """Measures time and resources of every step.
+
+    CPU time is the time of the thread running the step. Resources of
+    subprocesses are only reported by the OS once they terminated and are
+    summed up for the whole process, so for steps running at the same time
+    the children CPU time of overlapping steps is mixed.
+    """
+
+    project_dir: str
+    profiles: List[StepProfile] = field(default_factory=list)
+    _origin: float = field(default_factory=time.perf_counter, init=False, repr=False)
+    _running: Dict[int, Tuple] = field(default_factory=dict, init=False, repr=False)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def before_step(self, step: Step):
+        children_cpu, children_max_rss = _children_usage()
+        with self._lock:
+            self._running[id(step)] = (
+                time.perf_counter(),
+                time.thread_time(),
+                children_cpu,
+                children_max_rss,
+            )
+
+    def after_step(self, step: Step, result: Result):
+        end, cpu_end = time.perf_counter(), time.thread_time()
+        children_cpu, children_max_rss = _children_usage()
+        with self._lock:
+            start, cpu_start, children_cpu_start, max_rss_start = self._running.pop(
+                id(step)
+            )
+            thread = threading.current_thread()
+            self.profiles.append(
+                StepProfile(
+                    short_name=step.short_name,
+                    description=step.description,
+                    thread_id=thread.ident or 0,
+                    thread_name=thread.name,
+                    start=start - self._origin,
+                    wall=end - start,
+                    cpu=cpu_end - cpu_start,
+                    children_cpu=children_cpu - children_cpu_start,
+                    children_max_rss_kib=children_max_rss
+                    if children_max_rss != max_rss_start
+                    else None,
+                    success=result.success,
+                )
+            )
+
+    def summary(self) -> List[str]:
+        """Steps ranked by wall time.
+
+        :return: One line per step
+        """
+        lines = []
+        for profile in sorted(self.profiles, key=lambda p: p.wall, reverse=True):
+            rss = (
+                f"{profile.children_max_rss_kib / 1024:.0f} MiB"
+                if profile.children_max_rss_kib is not None
+                else "-"
+            )
+            lines.append(
+                f"{profile.wall:8.2f}s {profile.short_name:<24} "
+                f"cpu {profile.cpu:.2f}s, subprocesses {profile.children_cpu:.2f}s, "
+                f"peak rss {rss}"
+            )
+        return lines
+
+    def trace_events(self) -> Dict:
+        """Profiles in the Chrome trace event format, e.g. for Perfetto.
+
+        :return: JSON serializable trace
+        """
+        pid = os.getpid()
+        events: List[Dict] = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": thread_id,
+                "args": {"name": thread_name},
+            }
+            for thread_id, thread_name in sorted(
+                {(p.thread_id, p.thread_name) for p in self.profiles}
+            )
+        ]
+        for profile in self.profiles:
+            events.append(
+                {
+                    "name": profile.short_name,
+                    "cat": "step",
+                    "ph": "X",
+                    "ts": round(profile.start * 1e6),
+                    "dur": round(profile.wall * 1e6),
+                    "pid": pid,
+                    "tid": profile.thread_id,
+                    "args": {
+                        "description": profile.description,
+                        "cpu_s": profile.cpu,
+                        "children_cpu_s": profile.children_cpu,
+                        "children_max_rss_kib": profile.children_max_rss_kib,
+                        "success": profile.success,
+                    },
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self) -> str:
+        """Write the trace to `.recite/profiles`.
+
+        :return: Path of the written file
+        """
+        profile_dir = ensure_recite_dir(self.project_dir, "profiles")
+        path = os.path.join(
+            profile_dir, f"trace-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json"
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.trace_events(), f, indent=1)
+        return path
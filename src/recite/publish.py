@@ -0,0 +1,423 @@
+import base64
+import hashlib
+import os
+import queue
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import defaultdict, namedtuple
+from dataclasses import dataclass, field
+from email.parser import HeaderParser
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# well known indexes, that can be referenced by name only
+KNOWN_REPOSITORIES = {
+    "pypi": "https://upload.pypi.org/legacy/",
+    "testpypi": "https://test.pypi.org/legacy/",
+}
+# metadata fields, that may occur multiple times, with their upload field name
+MULTI_FIELDS = {
+    "Classifier": "classifiers",
+    "Requires-Dist": "requires_dist",
+    "Provides-Extra": "provides_extra",
+    "Project-URL": "project_urls",
+    "Platform": "platform",
+    "Supported-Platform": "supported_platform",
+    "Dynamic": "dynamic",
+}
+# status codes worth another try
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+UploadResult = namedtuple(
+    "UploadResult",
+    [
+        "repository",
+        "path",
+        "success",
+        "attempts",
+        "size",
+        "started",
+        "seconds",
+        "message",
+    ],
+)
+
+
+@dataclass
+class Repository:
+    name: str
+    url: str
+    username: str = "__token__"
+    password: str = field(default="", repr=False)
+
+
+def parse_repository(spec: str) -> Repository:
+    """Parse a repository given as `name=url` or as the name of a known index.
+
+    :param spec: Specification of the repository
+    :return: Repository without credentials
+    :raises ValueError: If the specification can not be parsed
+    """
+    name, _, url = spec.partition("=")
+    name = name.strip()
+    url = url.strip() or KNOWN_REPOSITORIES.get(name, "")
+    if not name or not url:
+        raise ValueError(f"Expected 'name=url' or one of {list(KNOWN_REPOSITORIES)}")
+    if urlsplit(url).scheme not in ("http", "https"):
+        raise ValueError(f"Unsupported url for repository {name}: {url}")
+    return Repository(name=name, url=url)
+
+
+def _read_metadata(path: str) -> str:
+    """Read the core metadata file of a wheel or sdist.
+
+    :param path: Path of a wheel or sdist
+    :return: Content of `METADATA` or `PKG-INFO`
+    :raises ValueError: If the distribution does not contain it
+    """
+    if path.endswith(".whl"):
+        with zipfile.ZipFile(path) as whl:
+            for name in whl.namelist():
+                if name.count("/") == 1 and name.endswith(".dist-info/METADATA"):
+                    return whl.read(name).decode("utf-8")
+    elif path.endswith(".tar.gz"):
+        with tarfile.open(path) as sdist:
+            for member in sdist:
+                if member.name.count("/") == 1 and member.name.endswith("/PKG-INFO"):
+                    extracted = sdist.extractfile(member)
+                    assert extracted is not None  # for mypy
+                    return extracted.read().decode("utf-8")
+    raise ValueError(f"Could not find metadata in {path}")
+
+
+def upload_fields(path: str) -> List[Tuple[str, str]]:
+    """Form fields of the legacy upload API for one distribution.
+
+    :param path: Path of a wheel or sdist
+    :return: Pairs of field name and value, names may repeat
+    """
+    metadata = HeaderParser().parsestr(_read_metadata(path))
+    filename = os.path.basename(path)
+    if filename.endswith(".whl"):
+        filetype, pyversion = "bdist_wheel", filename[:-4].split("-")[-3]
+    else:
+        filetype, pyversion = "sdist", "source"
+    with open(path, "rb") as f:
+        content = f.read()
+    fields = [
+        (":action", "file_upload"),
+        ("protocol_version", "1"),
+        ("filetype", filetype),
+        ("pyversion", pyversion),
+        ("md5_digest", hashlib.md5(content).hexdigest()),
+        ("sha256_digest", hashlib.sha256(content).hexdigest()),
+    ]
+    for key, value in metadata.items():
+        if key in MULTI_FIELDS:
+            fields.append((MULTI_FIELDS[key], value))
+        else:
+            fields.append((key.lower().replace("-", "_"), value))
+    description = metadata.get_payload()
+    if isinstance(description, str) and description.strip():
+        # since metadata 2.1 the description may be the body
+        fields.append(("description", description))
+    return fields
+
+
+def encode_multipart(fields: List[Tuple[str, str]], path: str) -> Tuple[bytes, str]:
+    """Encode the upload of a distribution as multipart/form-data.
+
+    :param fields: Form fields, see :func:`upload_fields`
+    :param path: Path of the distribution
+    :return: Body and content type
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode()
+            + value.encode("utf-8")
+            + b"\r\n"
+        )
+    with open(path, "rb") as f:
+        content = f.read()
+    filename = os.path.basename(path)
+    parts.append(
+        (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="content"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        + content
+        + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class ConnectionPool:
+    """Keep-alive connections to one host, reused across uploads."""
+
+    def __init__(self, url: str, size: int, timeout: float = 60):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname or ""
+        self.port = parts.port
+        self.path = parts.path or "/"
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue" = queue.LifoQueue(maxsize=size)
+        # connections that were acquired, but not released yet
+        self._active: set = set()
+        self.created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        import http.client
+
+        with self._lock:
+            self.created += 1
+        if self.scheme == "https":
+            import ssl
+
+            return http.client.HTTPSConnection(
+                self.host,
+                self.port,
+                timeout=self.timeout,
+                context=ssl.create_default_context(),
+            )
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        with self._lock:
+            self._active.add(connection)
+        return connection
+
+    def release(self, connection):
+        with self._lock:
+            self._active.discard(connection)
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def discard(self, connection):
+        with self._lock:
+            self._active.discard(connection)
+        connection.close()
+
+    def abort(self):
+        """Interrupt all requests that are in progress, e.g. on a timeout."""
+        import socket
+
+        with self._lock:
+            active = list(self._active)
+        for connection in active:
+            try:
+                if connection.sock is not None:
+                    connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                # already closed
+                pass
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+@dataclass
+class Publisher:
+    """Upload distributions to several repositories at the same time.
+
+    Every repository gets its own pool of keep-alive connections. Failed
+    uploads are retried with exponential backoff on connection errors and on
+    responses indicating a temporary problem.
+
+    Re-uploading an identical file succeeds on PyPI, so a file that already
+    exists has different content and fails the upload, unless
+    `skip_existing` is set.
+    """
+
+    repositories: List[Repository]
+    max_workers: int = 4
+    retries: int = 3
+    backoff: float = 1.0
+    # seconds until a connection without any progress is given up
+    timeout: float = 60
+    # seconds for all uploads together, None for no limit
+    deadline: Optional[float] = None
+    # treat files that already exist on an index as uploaded, like twine does
+    skip_existing: bool = False
+
+    def _post(self, pool: ConnectionPool, repository: Repository, body, content_type):
+        credentials = f"{repository.username}:{repository.password}".encode()
+        headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(body)),
+            "Authorization": f"Basic {base64.b64encode(credentials).decode()}",
+            "Connection": "keep-alive",
+        }
+        connection = pool.acquire()
+        try:
+            connection.request("POST", pool.path, body=body, headers=headers)
+            response = connection.getresponse()
+            text = response.read().decode(errors="replace")
+        except Exception:
+            # the connection is in an unknown state
+            pool.discard(connection)
+            raise
+        if response.will_close:
+            pool.discard(connection)
+        else:
+            pool.release(connection)
+        return response.status, response.reason, text
+
+    def _upload(
+        self,
+        pool: ConnectionPool,
+        repository: Repository,
+        path: str,
+        body: bytes,
+        content_type: str,
+        expires: Optional[float] = None,
+    ) -> UploadResult:
+        import http.client
+
+        started = time.perf_counter()
+        success = False
+        for attempt in range(1, self.retries + 2):
+            if expires is not None and time.monotonic() >= expires:
+                message = f"Timed out after {self.deadline:g}s"
+                break
+            try:
+                status, reason, text = self._post(pool, repository, body, content_type)
+            except (OSError, http.client.HTTPException) as e:
+                message = f"{type(e).__name__}: {e}"
+            else:
+                if 200 <= status < 300:
+                    success, message = True, "uploaded"
+                    break
+                if status == 409 or "already exists" in f"{reason} {text}".lower():
+                    if self.skip_existing:
+                        success, message = True, "skipped, already exists"
+                    else:
+                        message = f"{status} {reason}, a different file with this name already exists"
+                    break
+                message = f"{status} {reason}"
+                if status not in RETRY_STATUS:
+                    break
+            if attempt <= self.retries:
+                pause = self.backoff * 2 ** (attempt - 1)
+                if expires is not None:
+                    pause = max(0.0, min(pause, expires - time.monotonic()))
+                time.sleep(pause)
+        return UploadResult(
+            repository=repository.name,
+            path=path,
+            success=success,
+            attempts=attempt,
+            size=len(body),
+            started=started,
+            seconds=time.perf_counter() - started,
+            message=message,
+        )
+
+    def _jobs(
+        self, paths: List[str], pools: Dict[str, ConnectionPool]
+    ) -> Iterator[Tuple[ConnectionPool, Repository, str, bytes, str]]:
+        for path in paths:
+            # the body is the same for every repository
+            body, content_type = encode_multipart(upload_fields(path), path)
+            for repository in self.repositories:
+                yield pools[repository.name], repository, path, body, content_type
+
+    def publish(self, paths: List[str]) -> List[UploadResult]:
+        """Upload all `paths` to all repositories.
+
+        :param paths: Paths of wheels and sdists
+        :return: One result per repository and file
+        """
+        from concurrent.futures import ThreadPoolExecutor, wait
+
+        expires = None
+        if self.deadline is not None:
+            expires = time.monotonic() + self.deadline
+        pools = {
+            repository.name: ConnectionPool(
+                repository.url, size=self.max_workers, timeout=self.timeout
+            )
+            for repository in self.repositories
+        }
+        jobs = list(self._jobs(paths, pools))
+        workers = max(1, min(len(jobs), self.max_workers * len(self.repositories)))
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(partial(self._upload, *job, expires=expires))
+                    for job in jobs
+                ]
+                timeout = None if expires is None else expires - time.monotonic()
+                _, pending = wait(futures, timeout=timeout)
+                if pending:
+                    # uploads that did not start are not started anymore and
+                    # running ones give up, the socket timeout may be longer
+                    for future in pending:
+                        future.cancel()
+                    for pool in pools.values():
+                        pool.abort()
+            return [
+                self._timed_out(*job) if future.cancelled() else future.result()
+                for job, future in zip(jobs, futures)
+            ]
+        finally:
+            for pool in pools.values():
+                pool.close()
+
+    def _timed_out(self, pool, repository: Repository, path: str, body: bytes, _):
+        return UploadResult(
+            repository=repository.name,
+            path=path,
+            success=False,
+            attempts=0,
+            size=len(body),
+            started=time.perf_counter(),
+            seconds=0.0,
+            message=f"Timed out after {self.deadline:g}s",
+        )
+
+
+def summarize(results: List[UploadResult]) -> List[str]:
+    """Per repository summary of uploaded files and throughput.
+
+    :param results: Results of :meth:`Publisher.publish`
+    :return: One line per repository
+    """
+    by_repository: Dict[str, List[UploadResult]] = defaultdict(list)
+    for result in results:
+        by_repository[result.repository].append(result)
+    lines = []
+    for name, repository_results in by_repository.items():
+        succeeded = [result for result in repository_results if result.success]
+        size = sum(result.size for result in succeeded)
+        # uploads to one repository overlap, so use the wall time
+        seconds = max(r.started + r.seconds for r in repository_results) - min(
+            r.started for r in repository_results
+        )
+        throughput = size / seconds / 1e6 if seconds > 0 else 0.0
+        retried = sum(max(0, r.attempts - 1) for r in repository_results)
+        lines.append(
+            f"{name}: {len(succeeded)}/{len(repository_results)} files, "
+            f"{size / 1e6:.2f} MB in {seconds:.1f}s ({throughput:.2f} MB/s), "
+            f"{retried} retries"
+        )
+    return lines
@@ -1,10 +1,134 @@
-from dataclasses import dataclass
-from typing import Iterable, Optional
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    ClassVar,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 import typer
 
+from recite.cache import ResultCache
 from recite.console import ReciteConsole
-from recite.step import BumpVersionStep, DynamicVersionDescriptionGitStep, Step
+from recite.context import ProjectContext
+from recite.process import ProcessCancelled, cancel_all, reset_cancel
+from recite.step import (
+    BumpVersionStep,
+    DynamicVersionDescriptionGitStep,
+    Result,
+    Step,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from concurrent.futures import Future
+
+    from recite.journal import ReleaseJournal
+
+# seconds between looking for steps, that started after waiting for a worker
+START_POLL_INTERVAL = 0.1
+# seconds steps before a failed one get to finish, before and after cancelling
+SETTLE_SECONDS = 1.0
+
+
+def topological_waves(steps: Sequence[Step]) -> List[List[int]]:
+    """Group the indices of steps into waves.
+
+    Every step only depends on steps of earlier waves, so the steps of one
+    wave can run at the same time. Dependencies on steps, that are not part
+    of `steps` are treated as already fulfilled.
+
+    :param steps: Steps, that possibly declare dependencies via `depends_on`
+    :return: List of waves, each wave is a sorted list of indices into `steps`
+    :raises ValueError: If there is a cycle
+    """
+    by_name: Dict[str, List[int]] = {}
+    for index, step in enumerate(steps):
+        by_name.setdefault(step.short_name, []).append(index)
+    dependencies: Dict[int, List[int]] = {}
+    for index, step in enumerate(steps):
+        dependencies[index] = []
+        for name in step.depends_on:
+            dependencies[index].extend(by_name.get(name, []))
+    waves: List[List[int]] = []
+    done: set = set()
+    remaining = list(range(len(steps)))
+    while remaining:
+        wave = [i for i in remaining if all(d in done for d in dependencies[i])]
+        if not wave:
+            cycle = [steps[i].short_name for i in remaining]
+            raise ValueError(f"Cyclic dependencies between steps: {cycle}")
+        waves.append(wave)
+        done.update(wave)
+        remaining = [i for i in remaining if i not in done]
+    return waves
+
+
+def validate_order(steps: Sequence[Step]):
+    """Make sure steps only depend on steps before them.
+
+    Dependencies on steps, that are not part of `steps` are treated as
+    already fulfilled.
+
+    :param steps: Steps, that possibly declare dependencies via `depends_on`
+    :raises ValueError: If a step depends on a later one
+    """
+    names = {step.short_name for step in steps}
+    seen: set = set()
+    for step in steps:
+        later = [name for name in step.depends_on if name in names - seen]
+        if later:
+            raise ValueError(f"{step.short_name} depends on later steps: {later}")
+        seen.add(step.short_name)
+
+
+def critical_path(
+    steps: Sequence[Step], durations: Dict[int, float]
+) -> Tuple[List[int], float]:
+    """Find the chain of dependent steps that took the longest in total.
+
+    :param steps: Steps, that possibly declare dependencies via `depends_on`
+    :param durations: Seconds each step took, keyed by index into `steps`
+    :return: Indices of the steps on the critical path and its total duration
+    """
+    finished: Dict[int, float] = {}
+    predecessor: Dict[int, Optional[int]] = {}
+    for wave in topological_waves(steps):
+        for index in wave:
+            dependencies = [
+                i
+                for i, other in enumerate(steps)
+                if other.short_name in steps[index].depends_on
+            ]
+            before = max(dependencies, key=finished.__getitem__, default=None)
+            start = 0.0 if before is None else finished[before]
+            finished[index] = start + durations.get(index, 0.0)
+            predecessor[index] = before
+    if not finished:
+        return [], 0.0
+    last: Optional[int] = max(finished, key=finished.__getitem__)
+    total = finished[last] if last is not None else 0.0
+    path = []
+    while last is not None:
+        path.append(last)
+        last = predecessor[last]
+    return path[::-1], total
+
+
+class StepHook:
+    """Gets called around every step a runner executes, including cached ones."""
+
+    def before_step(self, step: Step):
+        pass  # pragma: no cover
+
+    def after_step(self, step: Step, result: Result):
+        pass  # pragma: no cover
 
 
 @dataclass(kw_only=True)
@@ -13,15 +137,26 @@ class StepRunner:
     console: ReciteConsole
     steps: Iterable[Step]
     skip_steps: Optional[str] = None
+    concurrent: bool = False
+    max_workers: Optional[int] = None
+    cache: Optional[ResultCache] = None
+    context: Optional[ProjectContext] = None
+    hooks: List[StepHook] = field(default_factory=list)
+    # timeouts in seconds by short name, overriding those of the steps
+    timeouts: Dict[str, float] = field(default_factory=dict)
+    # steps that ask for input can not run below a live display
+    live_status: ClassVar[bool] = False
 
     def _validate_skipped(self):
         if self.skip_steps is None:
             return True
         skip_list = self.skip_steps.split(",")
+        # in a workspace there are several steps with the same short name
         for step in self.steps:
             if step.short_name in skip_list:
                 step.skip = True
-                skip_list.remove(step.short_name)
+        known = {step.short_name for step in self.steps}
+        skip_list = [name for name in skip_list if name not in known]
         if len(skip_list) > 0:
             self.console.print_multiple_messages(
                 messages=[
@@ -40,35 +175,251 @@ class StepRunner:
     def post_run(self):
         pass  # pragma: no cover
 
+    def _print_skipped(self, step: Step):
+        self.console.print_message(
+            message=f"Skipping {step.short_name} ~",
+            color="italic",
+            indent_count=1,
+            indent_whitespace=" ",
+            indent_char="~",
+        )
+
+    def _report(self, number: int, step: Step, result: Result) -> bool:
+        if result.success:
+            self.console.print_success(message=step.description, number=number)
+        else:
+            self.console.print_failure(message=step.description, number=number)
+            if result.messages is not None:
+                self.console.print_multiple_messages(
+                    messages=result.messages, indent_count=1, color="bad"
+                )
+            return False
+        if result.messages is not None:
+            self.console.print_multiple_messages(
+                messages=result.messages, indent_count=1, color="good"
+            )
+        return True
+
+    def _run_step(self, step: Step) -> Result:
+        result = step.run()
+        if result.mutated_project:
+            step.project_context.invalidate()
+        return result
+
+    def _execute(self, step: Step) -> Result:
+        self.console.step_started(step)
+        try:
+            for hook in self.hooks:
+                hook.before_step(step)
+            result = self._execute_cached(step)
+            for hook in self.hooks:
+                hook.after_step(step, result)
+        finally:
+            self.console.step_finished(step)
+        return result
+
+    def _execute_cached(self, step: Step) -> Result:
+        if self.cache is None or not step.cacheable:
+            return self._run_step(step)
+        key = self.cache.key(step)
+        if key is not None and self.cache.contains(key):
+            return Result(
+                success=True,
+                messages=["Skipped, passed before on identical inputs (cached)"],
+            )
+        result = self._run_step(step)
+        if key is not None and result.success:
+            self.cache.store(key, step)
+        return result
+
+    def _run_serially(self) -> bool:
+        steps = list(self.steps)
+        # the numbered order is kept, it only has to respect the dependencies
+        validate_order(steps)
+        for number, step in enumerate(steps, start=1):
+            if step.skip:
+                self._print_skipped(step)
+                continue
+            if not self._report(number, step, self._execute(step)):
+                return False
+        return True
+
+    def _timed_run(
+        self, step: Step, index: int, starts: Dict[int, float]
+    ) -> Tuple[Result, float]:
+        # the timeout of a step counts from here, not while it waits for a worker
+        starts[index] = time.monotonic()
+        start = time.perf_counter()
+        try:
+            result = self._execute(step)
+        except ProcessCancelled:
+            result = Result(success=False, messages=["Cancelled"], cancelled=True)
+        return result, time.perf_counter() - start
+
+    def _print_critical_path(self, steps: List[Step], durations: Dict[int, float]):
+        path, total = critical_path(steps, durations)
+        if not path:
+            return
+        chain = " → ".join(steps[index].short_name for index in path)
+        self.console.print_message(
+            message=f"Critical path: {chain} ({total:.1f}s)",
+            color="italic",
+            indent_count=1,
+        )
+
+    def _await_wave(
+        self,
+        steps: List[Step],
+        futures: Dict[int, "Future"],
+        starts: Dict[int, float],
+    ) -> Dict[int, Tuple[Result, float]]:
+        # collects results as they come in and stops at the first failure or
+        # timeout, so the other steps of the wave can be abandoned right away
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        results: Dict[int, Tuple[Result, float]] = {}
+        pending = {future: index for index, future in futures.items()}
+        while pending:
+            now = time.monotonic()
+            deadlines = []
+            for index in pending.values():
+                timeout = getattr(steps[index], "timeout", None)
+                if timeout is None:
+                    continue
+                start = starts.get(index)
+                # a step waiting for a worker gets its deadline once it started
+                deadlines.append(
+                    START_POLL_INTERVAL if start is None else start + timeout - now
+                )
+            done, _ = wait(
+                pending,
+                timeout=max(0.0, min(deadlines)) if deadlines else None,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                results[pending.pop(future)] = future.result()
+            now = time.monotonic()
+            for future, index in list(pending.items()):
+                timeout = getattr(steps[index], "timeout", None)
+                start = starts.get(index)
+                if timeout is None or start is None or now - start < timeout:
+                    continue
+                del pending[future]
+                results[index] = (
+                    Result(success=False, messages=[f"Timed out after {timeout:g}s"]),
+                    now - start,
+                )
+            if any(not result.success for result, _ in results.values()):
+                break
+        return results
+
+    def _fail_fast(
+        self, futures: Dict[int, "Future"], results: Dict[int, Tuple[Result, float]]
+    ):
+        # like serially the first failure in numbered order is reported, so
+        # the steps before it get a moment to finish before they are cancelled
+        from concurrent.futures import wait
+
+        first = min(
+            index for index, (result, _) in results.items() if not result.success
+        )
+        pending = {
+            future: index
+            for index, future in futures.items()
+            if index < first and index not in results
+        }
+        done, _ = wait(pending, timeout=SETTLE_SECONDS)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+        # commands of the other steps are doomed anyway
+        cancel_all()
+        done, _ = wait(pending, timeout=SETTLE_SECONDS)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+
+    def _print_unfinished(self, step: Step, state: str):
+        self.console.print_message(
+            message=f"{state} {step.short_name} ~",
+            color="italic",
+            indent_count=1,
+            indent_whitespace=" ",
+            indent_char="~",
+        )
+
+    def _run_concurrently(self) -> bool:
+        # steps of a wave are started at once, but results are reported in
+        # numbered order and reporting stops at the first failure, just like
+        # serially
+        from concurrent.futures import Future, ThreadPoolExecutor
+
+        steps = list(self.steps)
+        durations: Dict[int, float] = {}
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            for wave in topological_waves(steps):
+                starts: Dict[int, float] = {}
+                futures: Dict[int, Future] = {
+                    index: executor.submit(
+                        partial(self._timed_run, steps[index], index, starts)
+                    )
+                    for index in wave
+                    if not steps[index].skip
+                }
+                results = self._await_wave(steps, futures, starts)
+                if len(results) < len(futures):
+                    self._fail_fast(futures, results)
+                for index in wave:
+                    step = steps[index]
+                    if step.skip:
+                        self._print_skipped(step)
+                        continue
+                    if index not in results:
+                        # still running, but not waited for anymore
+                        self._print_unfinished(step, "Abandoned")
+                        continue
+                    result, durations[index] = results[index]
+                    if result.cancelled:
+                        # its processes were terminated, it did not fail itself
+                        self._print_unfinished(step, "Cancelled")
+                        continue
+                    if not self._report(index + 1, step, result):
+                        return False
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._print_critical_path(steps, durations)
+        return True
+
     def run_steps(self) -> bool:
         if not self._validate_skipped():
             return False
+        if self.context is not None:
+            for step in self.steps:
+                # steps of workspace packages bring their own context
+                if getattr(step, "context", None) is None:
+                    step.context = self.context
+        for step in self.steps:
+            # in a workspace "core:publish" is matched by "publish" as well
+            for name in (step.short_name, step.short_name.rsplit(":", 1)[-1]):
+                if name in self.timeouts:
+                    step.timeout = self.timeouts[name]
+                    break
+            if isinstance(step, Step) and step.echo is None:
+                step.echo = partial(self.console.print_output, step.short_name)
+        # commands were cancelled by an earlier run failing fast
+        reset_cancel()
+        for step in self.steps:
+            # waiting on the network overlaps with the steps before
+            if isinstance(step, Step) and not step.skip:
+                step.prefetch()
         self.pre_run()
         self.console.print_message(message=self.beginning_message)
-        for number, step in enumerate(self.steps, start=1):
-            if step.skip:
-                self.console.print_message(
-                    message=f"Skipping {step.short_name} ~",
-                    color="italic",
-                    indent_count=1,
-                    indent_whitespace=" ",
-                    indent_char="~",
-                )
-                continue
-            result = step.run()
-            if result.success:
-                self.console.print_success(message=step.description, number=number)
+        with self.console.live_status() if self.live_status else nullcontext():
+            if self.concurrent:
+                successful = self._run_concurrently()
             else:
-                self.console.print_failure(message=step.description, number=number)
-                if result.messages is not None:
-                    self.console.print_multiple_messages(
-                        messages=result.messages, indent_count=1, color="bad"
-                    )
-                return False
-            if result.messages is not None:
-                self.console.print_multiple_messages(
-                    messages=result.messages, indent_count=1, color="good"
-                )
+                successful = self._run_serially()
+        if not successful:
+            return False
         self.post_run()
         return True
 
@@ -78,6 +429,7 @@ class CheckStepRunner(StepRunner):
     beginning_message: str = (
         ":eyes: Checking everything to make sure you are ready to release :eyes:"
     )
+    live_status: ClassVar[bool] = True
 
     def post_run(self):
         self.console.print_message(
@@ -89,13 +441,36 @@ class CheckStepRunner(StepRunner):
 class PerformReleaseRunner(StepRunner):
     beginning_message: str = ":sparkles: Performing release :sparkles:"
     is_initial: bool = False
+    # records finished steps, a loaded journal resumes a failed release
+    journal: Optional["ReleaseJournal"] = None
+
+    def _done_before(self, step: Step) -> bool:
+        return (
+            self.journal is not None
+            and self.journal.resuming
+            and self.journal.completed(step)
+        )
 
     def pre_run(self):
+        if self.journal is not None and self.journal.resuming:
+            problems = self.journal.verify(self.steps)
+            if problems:
+                self.console.print_failure("Can not resume the release")
+                self.console.print_multiple_messages(
+                    messages=problems, indent_count=1, color="bad"
+                )
+                raise typer.Exit(code=1)
+            self.journal.restore(self.steps)
         self.console.print_message("I will perform the following steps:")
         new_version = "0.1.0" if self.is_initial else ""
         for step in self.steps:
             msg = step.description
-            if isinstance(step, BumpVersionStep):
+            done = self._done_before(step)
+            if isinstance(step, BumpVersionStep) and done:
+                assert self.journal is not None  # for mypy
+                new_version = self.journal.version(step) or ""
+                msg = f"Bump version to [blue]{new_version}[/blue]"
+            elif isinstance(step, BumpVersionStep):
                 result = step.run(dry_run=True)
                 msg = result.messages[0]
                 new_version = result.return_value.new_version
@@ -103,12 +478,26 @@ class PerformReleaseRunner(StepRunner):
                 step.new_version = new_version
                 # update msg with updated description
                 msg = step.description
+            if done:
+                msg += " [italic](done)[/italic]"
             self.console.print_message(message=msg, indent_count=1)
         proceed = typer.confirm("Do you want to proceed?")
         if not proceed:
             raise typer.Abort()
+        if self.journal is not None and not self.journal.resuming:
+            self.journal.start(self.steps)
+
+    def _execute_cached(self, step: Step) -> Result:
+        if self._done_before(step):
+            return Result(success=True, messages=["Done before, resumed from journal"])
+        result = super()._execute_cached(step)
+        if self.journal is not None:
+            self.journal.record(step, result)
+        return result
 
     def post_run(self):
+        if self.journal is not None:
+            self.journal.finish()
         self.console.print_message(
             message=":rocket: Congrats to your release! :rocket:"
         )
@@ -0,0 +1,204 @@
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set
+
+if TYPE_CHECKING:  # pragma: no cover
+    from git import Repo
+
+    from .tags import TagIndex
+
+
+def find_worktree_root(path: str) -> str:
+    """Find the closest directory containing `.git`, starting at `path`.
+
+    :param path: Directory inside a git worktree
+    :return: Root of the worktree or `path` itself if there is none
+    """
+    current = os.path.abspath(path)
+    while True:
+        if os.path.exists(os.path.join(current, ".git")):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return os.path.abspath(path)
+        current = parent
+
+
+class RepoSession:
+    """Git repository shared by all git steps of one recite invocation.
+
+    The underlying :class:`git.Repo` is only discovered once and keeps its
+    persistent `git cat-file --batch` processes alive until the session is
+    closed. Read-only facts like the active branch are computed once and
+    cached until :meth:`invalidate` is called.
+    """
+
+    _sessions: Dict[str, "RepoSession"] = {}
+    _sessions_lock = threading.Lock()
+
+    def __init__(
+        self, project_dir: Optional[str] = None, repo: Optional["Repo"] = None
+    ):
+        self.project_dir = project_dir
+        self._repo = repo
+        self._facts: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def for_dir(cls, project_dir: Optional[str] = None) -> "RepoSession":
+        # packages of a monorepo share the session of their repository
+        key = find_worktree_root(project_dir or os.getcwd())
+        with cls._sessions_lock:
+            if key not in cls._sessions:
+                cls._sessions[key] = cls(project_dir=key)
+            return cls._sessions[key]
+
+    @classmethod
+    def close_all(cls):
+        with cls._sessions_lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
+
+    @property
+    def repo(self) -> "Repo":
+        with self._lock:
+            if self._repo is None:
+                # gitpython is slow to import, so this is deferred until needed
+                from git import Repo
+                from git.db import GitCmdObjectDB
+
+                self._repo = Repo(self.project_dir, odbt=GitCmdObjectDB)
+            return self._repo
+
+    def _fact(self, name: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if name not in self._facts:
+                self._facts[name] = compute()
+            return self._facts[name]
+
+    @property
+    def active_branch(self) -> str:
+        return self._fact("active_branch", lambda: self.repo.active_branch.name)
+
+    @property
+    def detached(self) -> bool:
+        return self._fact("detached", lambda: self.repo.head.is_detached)
+
+    def upstream_ref(self, branch: str) -> str:
+        """Ref the branch tracks on its remote, as configured in `branch.<name>.merge`.
+
+        :param branch: Name of the local branch
+        :return: The ref, e.g. `refs/heads/main`, or the ref of the same name
+        """
+
+        def compute() -> str:
+            with self.repo.config_reader() as config:
+                # gitpython converts values, that look like numbers
+                return str(
+                    config.get_value(
+                        f'branch "{branch}"', "merge", f"refs/heads/{branch}"
+                    )
+                )
+
+        return self._fact(f"upstream_ref {branch}", compute)
+
+    @property
+    def head_sha(self) -> str:
+        return self._fact("head_sha", lambda: self.repo.head.commit.hexsha)
+
+    @property
+    def tree_hash(self) -> str:
+        return self._fact("tree_hash", lambda: self.repo.git.rev_parse("HEAD^{tree}"))
+
+    def tag_index(self, prefix: str) -> "TagIndex":
+        """Version tags with `prefix`, cached in `.recite/tags` of the worktree."""
+        from .tags import TagIndex
+
+        def compute() -> TagIndex:
+            worktree = self.repo.working_tree_dir
+            return TagIndex.load(
+                os.fspath(self.repo.common_dir),
+                prefix,
+                project_dir=os.fspath(worktree) if worktree is not None else None,
+            )
+
+        return self._fact(f"tag_index {prefix}", compute)
+
+    def remote_git(self, *args: str, timeout: Optional[float] = None) -> List[str]:
+        """Run a git command that talks to a remote, e.g. `git fetch`.
+
+        Unlike the commands run by gitpython it is started via
+        :func:`recite.process.run_process`, so it is terminated together with
+        all other commands, when a runner fails fast.
+
+        :param args: Arguments of git
+        :param timeout: Seconds until git is terminated
+        :return: Lines of the combined stdout and stderr
+        :raises ProcessCancelled: If git was cancelled, because a step failed
+        :raises GitCommandError: If git fails
+        """
+        from git.exc import GitCommandError
+
+        from .process import ProcessCancelled, run_process
+
+        lines: List[str] = []
+        res = run_process(
+            ["git", *args],
+            cwd=self.project_dir,
+            echo=lines.append,
+            timeout=timeout,
+        )
+        if res.cancelled:
+            raise ProcessCancelled(f"Cancelled git {' '.join(args)}")
+        if res.returncode != 0:
+            raise GitCommandError(list(res.command), res.returncode, stderr=res.output)
+        return lines
+
+    def remote_tags(self, remote: str, timeout: Optional[float] = None) -> Set[str]:
+        """Names of all tags on `remote`, queried once via `git ls-remote`.
+
+        Unlike other facts the session is not locked while waiting on the
+        network, concurrent callers wait for the same query instead. If git
+        fails, all of them get the error of :meth:`remote_git`.
+
+        :param remote: Name or url of the remote
+        :param timeout: Seconds until git is killed
+        :return: Tag names without `refs/tags/`
+        """
+        from concurrent.futures import Future
+
+        name = f"remote_tags {remote}"
+        with self._lock:
+            future: Optional["Future[Set[str]]"] = self._facts.get(name)
+            query = future is None
+            if future is None:
+                future = self._facts[name] = Future()
+        if query:
+            try:
+                # --refs leaves out the peeled "^{}" lines of annotated tags
+                refs = self.remote_git(
+                    "ls-remote", "--tags", "--refs", remote, timeout=timeout
+                )
+                future.set_result(
+                    {
+                        line.split("\t", 1)[1][len("refs/tags/") :]
+                        for line in refs
+                        if "\t" in line
+                    }
+                )
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def invalidate(self):
+        """Forget cached facts, e.g. after committing or tagging."""
+        with self._lock:
+            self._facts.clear()
+
+    def close(self):
+        with self._lock:
+            if self._repo is not None:
+                self._repo.close()
+                self._repo = None
+            self._facts.clear()
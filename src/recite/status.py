@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+from typing import IO, TYPE_CHECKING, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:  # pragma: no cover
+    from git import Repo
+
+# lets git remember untracked files per directory and only look into
+# directories that changed, the same as `git -c core.untrackedCache=true`
+UNTRACKED_CACHE_ENV = {
+    "GIT_CONFIG_COUNT": "1",
+    "GIT_CONFIG_KEY_0": "core.untrackedCache",
+    "GIT_CONFIG_VALUE_0": "true",
+}
+# fields before the path in entries of changed, renamed, unmerged and
+# untracked files, the path is last and may contain spaces itself
+PATH_FIELD = {b"1": 8, b"2": 9, b"u": 10, b"?": 1}
+
+
+@dataclass
+class WorktreeStatus:
+    # first changed path found, None if the worktree is clean
+    first_change: Optional[str] = None
+
+    @property
+    def clean(self) -> bool:
+        return self.first_change is None
+
+
+def split_records(stream: IO[bytes], chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """Split NUL terminated records while they are read.
+
+    :param stream: Output of a git command run with `-z`
+    :param chunk_size: Number of bytes to read at once
+    :yield: Records without the terminating NUL
+    """
+    rest = b""
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        *records, rest = (rest + chunk).split(b"\0")
+        yield from records
+    if rest:
+        yield rest
+
+
+def parse_status(records: Iterable[bytes]) -> WorktreeStatus:
+    """Parse `git status --porcelain=v2 -z` up to the first change.
+
+    Nothing after the first changed file has to be read.
+
+    :param records: NUL separated records of the output
+    :return: The first changed path
+    """
+    status = WorktreeStatus()
+    for record in records:
+        if record[:1] in PATH_FIELD and record[1:2] == b" ":
+            path = record.split(b" ", PATH_FIELD[record[:1]])[-1]
+            status.first_change = path.decode(errors="replace")
+            break
+    return status
+
+
+def scan_worktree(repo: "Repo", allow_untracked_files: bool = False) -> WorktreeStatus:
+    """Find out in a single `git status`, whether the worktree is clean.
+
+    Git is stopped as soon as the first change was read, so on a dirty
+    worktree the rest of it is not walked. Untracked files are not even
+    looked for if they are allowed. If git fails, the `GitCommandError` of
+    gitpython is raised.
+
+    :param repo: Repository to check
+    :param allow_untracked_files: Whether untracked files are ignored
+    :return: Status of the worktree
+    """
+    process = repo.git.status(
+        "--porcelain=v2",
+        "-z",
+        # renames are just changes here, so do not look for them
+        "--no-renames",
+        f"--untracked-files={'no' if allow_untracked_files else 'normal'}",
+        as_process=True,
+        env=UNTRACKED_CACHE_ENV,
+    )
+    try:
+        status = parse_status(split_records(process.stdout))
+        if status.clean:
+            # raises if git failed instead of printing nothing
+            process.wait()
+    finally:
+        # stops git if it is still walking the worktree
+        process.terminate()
+    return status
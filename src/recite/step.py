@@ -1,16 +1,41 @@
 import os
-import subprocess
+import re
+import threading
 from abc import ABC, abstractmethod
 from collections import namedtuple
 from dataclasses import dataclass
-from typing import Any, Iterable, Optional
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
-import toml
 import typer
-from git import Repo
-from git.exc import GitCommandError
 
-VersionBump = namedtuple("VersionBump", ["previous_version", "new_version"])
+from .changelog import find_release_section
+from .context import CHANGELOG_PATHS, ProjectContext, ensure_recite_dir
+from .version import Version, VersionBump, bump_pyproject
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .process import ProcessResult
+    from .publish import Repository
+    from .session import RepoSession
+
+SessionResult = namedtuple("SessionResult", ["name", "returncode", "seconds", "output"])
+# guards starting the log files of steps
+_LOG_LOCK = threading.Lock()
+
+
+def _echo_labelled(echo: Callable[[str], None], label: str, line: str):
+    echo(f"{label} | {line}")
 
 
 @dataclass(kw_only=True)
@@ -18,6 +43,11 @@ class Result:
     success: bool
     messages: Optional[Iterable[str]] = None
     return_value: Any = None
+    # tells the runner to invalidate the shared ProjectContext
+    mutated_project: bool = False
+    # set by the runner, if the processes of the step were terminated
+    # because another step failed
+    cancelled: bool = False
 
 
 @dataclass(kw_only=True)
@@ -26,9 +56,102 @@ class StepMixin:
     description: str
     skip: bool = False
     project_dir: Optional[str] = None
+    # short names of steps that have to be finished before this one can start
+    depends_on: Tuple[str, ...] = ()
+    # shared by all steps of a runner, created on demand otherwise
+    context: Optional[ProjectContext] = None
+    # receives every line of subprocess output, set by the runner
+    echo: Optional[Callable[[str], None]] = None
+    # seconds after which the step is abandoned, None waits forever
+    timeout: Optional[float] = None
 
 
 class Step(ABC, StepMixin):
+    # whether a successful result can be reused if the project did not change
+    cacheable: ClassVar[bool] = False
+
+    @property
+    def project_context(self) -> ProjectContext:
+        if self.context is None:
+            self.context = ProjectContext(project_dir=self.project_dir)
+        return self.context
+
+    @property
+    def log_path(self) -> str:
+        return self.label_log_path()
+
+    def label_log_path(self, label: Optional[str] = None) -> str:
+        """Log file of the step, or of one part of it, e.g. a nox session.
+
+        :param label: Name of the part, None for the whole step
+        :return: Path in `.recite/logs`
+        """
+        name = self.short_name if label is None else f"{self.short_name}-{label}"
+        name = re.sub(r"[^\w.-]", "_", name)
+        logs = ensure_recite_dir(self.project_context.project_dir, "logs")
+        return os.path.join(logs, f"{name}.log")
+
+    def run_process(
+        self,
+        command: List[str],
+        echo: bool = True,
+        tail_lines: int = 50,
+        label: Optional[str] = None,
+    ) -> "ProcessResult":
+        """Run a command in the project directory.
+
+        The output is streamed to the console and `.recite/logs`, which is
+        started anew by the first command a step runs. The command is
+        terminated after the step's timeout.
+
+        :param command: Command and its arguments
+        :param echo: Whether to show the output on the console
+        :param tail_lines: Number of last lines kept for error messages
+        :param label: Separates the output of commands running at the same
+            time, it prefixes the echoed lines and names an own log file
+        :return: Result of the command
+        :raises ProcessCancelled: If the command was cancelled, because
+            another step failed
+        """
+        from .process import ProcessCancelled, run_process
+
+        log_path = self.label_log_path(label)
+        with _LOG_LOCK:
+            if not hasattr(self, "_logs_started"):
+                self._logs_started: Set[str] = set()
+            if log_path not in self._logs_started:
+                open(log_path, "wb").close()
+                self._logs_started.add(log_path)
+        echo_line = self.echo if echo else None
+        if echo_line is not None and label is not None:
+            echo_line = partial(_echo_labelled, echo_line, label)
+        res = run_process(
+            command,
+            cwd=self.project_context.project_dir,
+            log_path=log_path,
+            echo=echo_line,
+            tail_lines=tail_lines,
+            timeout=self.timeout,
+        )
+        if res.cancelled:
+            # the runner reports the step as cancelled instead of failed
+            raise ProcessCancelled(f"Cancelled {' '.join(command)}")
+        return res
+
+    def failure_messages(self, res: "ProcessResult") -> List[str]:
+        from rich.markup import escape
+
+        messages = [escape(line) for line in res.tail]
+        messages.append(f"Complete output in {res.log_path}")
+        return messages
+
+    def prefetch(self):
+        """Start network operations in the background, that :meth:`run` awaits.
+
+        Called by the runner before the first step runs, so waiting on the
+        network overlaps with the local steps running before this one.
+        """
+
     @abstractmethod
     def run(self) -> Result:
         raise NotImplementedError  # pragma: no cover
@@ -40,7 +163,8 @@ class GitStep(Step):
         raise NotImplementedError  # pragma: no cover
 
     def run(self):
-        self.repo = Repo(self.project_dir)  # pragma: no cover
+        self.session = self.project_context.git  # pragma: no cover
+        self.repo = self.session.repo
         return self._run()
 
 
@@ -64,9 +188,8 @@ class CheckPyProjectStep(Step):
     description: str = "Make sure you have a (non-empty) pyproject.toml"
 
     def run(self) -> Result:
-        success = (
-            os.path.isfile("pyproject.toml") and os.path.getsize("pyproject.toml") > 0
-        )
+        path = self.project_context.pyproject_path
+        success = os.path.isfile(path) and os.path.getsize(path) > 0
         return Result(success=success)
 
 
@@ -76,7 +199,7 @@ class CheckOnMainStep(GitStep):
     description: str = "Make sure you're on main/master branch"
 
     def _run(self) -> Result:
-        current_branch = self.repo.active_branch.name
+        current_branch = self.session.active_branch
         success = current_branch == "main" or current_branch == "master"
         return Result(success=success)
 
@@ -86,16 +209,88 @@ class CheckCleanGitStep(GitStep):
     short_name: str = "check_clean_git"
     description: str = "Make sure git is clean"
     allow_untracked_files: bool = False
+    remote: str = "origin"
+    # compare with the tip of the remote branch without downloading anything
+    ls_remote: bool = False
+    timeout: Optional[float] = 120
+
+    @property
+    def _prefetch_name(self) -> str:
+        mode = "ls-remote" if self.ls_remote else "fetch"
+        return f"remote tip {self.remote} {mode}"
+
+    def _remote_tip(
+        self, session: "RepoSession"
+    ) -> Tuple[Optional[str], Optional[str]]:
+        if session.detached:
+            # reported by run, there is no branch to compare with
+            return None, None
+        # the branch on the remote may be named differently
+        upstream = session.upstream_ref(session.active_branch)
+        if self.ls_remote:
+            refs = session.remote_git(
+                "ls-remote", self.remote, upstream, timeout=self.timeout
+            )
+            tips = [line.split("\t", 1)[0] for line in refs if "\t" in line]
+            return upstream, tips[0] if tips else None
+        name = (
+            upstream[len("refs/heads/") :]
+            if upstream.startswith("refs/heads/")
+            else upstream
+        )
+        tracking = f"refs/remotes/{self.remote}/{name}"
+        # only the current branch, other branches and tags can be plenty
+        session.remote_git(
+            "fetch",
+            "--no-tags",
+            self.remote,
+            f"+{upstream}:{tracking}",
+            timeout=self.timeout,
+        )
+        return upstream, session.repo.git.rev_parse(tracking)
+
+    def prefetch(self):
+        session = self.project_context.git
+        self.project_context.prefetch(
+            self._prefetch_name, lambda: self._remote_tip(session)
+        )
 
     def _run(self) -> Result:
-        if self.repo.is_dirty(untracked_files=self.allow_untracked_files):
-            return Result(success=False, messages=["You have an unclean working tree!"])
-        self.repo.git.fetch()
-        res = self.repo.git.status("--branch", "--porcelain")
-        lines = str.splitlines(res)
-        if len(lines) > 0:
-            if "[ahead " in lines[0] or "[behind " in lines[0]:
-                return Result(success=False, messages=["Local and remote not synced!"])
+        from git.exc import GitCommandError
+        from rich.markup import escape
+
+        from .status import scan_worktree
+
+        # local checks first, they do not need the network
+        try:
+            status = scan_worktree(
+                self.repo, allow_untracked_files=self.allow_untracked_files
+            )
+        except GitCommandError as e:
+            return Result(success=False, messages=[f"Reading git status failed: {e}"])
+        if status.first_change is not None:
+            return Result(
+                success=False,
+                messages=[
+                    f"You have an unclean working tree, e.g. {escape(status.first_change)}"
+                ],
+            )
+        if self.session.detached:
+            return Result(success=False, messages=["HEAD is not on a branch"])
+        try:
+            # usually fetched in the background while other checks ran
+            upstream, remote_tip = self.project_context.prefetched(
+                self._prefetch_name, lambda: self._remote_tip(self.session)
+            )
+        except GitCommandError as e:
+            return Result(success=False, messages=[f"Fetching failed: {e}"])
+        if remote_tip is None:
+            return Result(
+                success=False,
+                messages=[f"Branch {upstream} does not exist on {self.remote}"],
+            )
+        if remote_tip != self.repo.git.rev_parse("HEAD"):
+            return Result(success=False, messages=["Local and remote not synced!"])
         return Result(success=True)
 
 
@@ -103,10 +298,82 @@ class CheckCleanGitStep(GitStep):
 class RunTestsStep(Step):
     short_name: str = "run_tests"
     description: str = "Run test-suite"
+    cacheable: ClassVar[bool] = True
+
+    # number of nox sessions to run in parallel
+    workers: int = 1
+    # lines of output to show for each failed session
+    failure_lines: int = 20
+
+    def _list_sessions(self) -> List[str]:
+        # the list is short, so all of it fits into the tail
+        res = self.run_process(["nox", "--list"], echo=False, tail_lines=1000)
+        sessions = []
+        for line in res.tail:
+            # selected sessions are marked with "*", deselected ones with "-"
+            if line.startswith("* "):
+                sessions.append(line[2:].split(" -> ")[0].strip())
+        return sessions
+
+    def _run_session(self, session: str) -> SessionResult:
+        res = self.run_process(
+            ["nox", "-r", "-s", session], tail_lines=self.failure_lines, label=session
+        )
+        return SessionResult(
+            name=session,
+            returncode=res.returncode,
+            seconds=res.seconds,
+            output=res.output,
+        )
+
+    def _run_parallel(self) -> Result:
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        from rich.markup import escape
+
+        from .process import ProcessCancelled, cancelled
+
+        sessions = self._list_sessions()
+        if len(sessions) == 0:
+            return Result(success=False, messages=["Could not find any nox sessions"])
+
+        def run_session(session: str) -> Optional[SessionResult]:
+            # another step failed, so queued sessions are not started
+            return None if cancelled() else self._run_session(session)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(run_session, s) for s in sessions]
+            for _future in as_completed(futures):
+                if cancelled():
+                    for other in futures:
+                        other.cancel()
+                    break
+        if cancelled():
+            raise ProcessCancelled("Cancelled the remaining nox sessions")
+        # only cancelled sessions did not run, so all of them have a result
+        results: List[SessionResult] = [
+            res for res in (f.result() for f in futures) if res is not None
+        ]
+        messages = []
+        for res in results:
+            state = "passed" if res.returncode == 0 else "failed"
+            messages.append(f"{res.name}: {state} ({res.seconds:.1f}s)")
+        for res in results:
+            if res.returncode != 0:
+                messages.append(f"Output of {res.name}:")
+                lines = res.output.splitlines()[-self.failure_lines :]
+                messages.extend(escape(line) for line in lines)
+                messages.append(f"Complete output in {self.label_log_path(res.name)}")
+        success = all(res.returncode == 0 for res in results)
+        return Result(success=success, messages=messages)
 
     def run(self) -> Result:
-        success = subprocess.run(["nox", "-r"]).returncode == 0
-        return Result(success=success)
+        if self.workers > 1:
+            return self._run_parallel()
+        res = self.run_process(["nox", "-r"], tail_lines=self.failure_lines)
+        if res.returncode != 0:
+            return Result(success=False, messages=self.failure_messages(res))
+        return Result(success=True)
 
 
 @dataclass(kw_only=True)
@@ -116,22 +383,18 @@ class CheckChangelogStep(GitStep):
     prefix: str = "v"
 
     def _run(self) -> Result:
-        paths = [
-            "CHANGELOG",
-            "CHANGELOG.md",
-            "CHANGELOG.rst",
-        ]
-        cl_path = None
-        for p in paths:
-            if os.path.isfile(p):
-                cl_path = p
-                break
+        from git.exc import GitCommandError
+
+        cl_path = self.project_context.changelog_path
         if cl_path is None:
             return Result(
                 success=False,
-                messages=["Could not find Changelog in paths:", f"{paths}"],
+                messages=[
+                    "Could not find Changelog in paths:",
+                    f"{list(CHANGELOG_PATHS)}",
+                ],
             )
-        current_version: str = toml.load("pyproject.toml")["tool"]["poetry"]["version"]
+        current_version = self.project_context.current_version
         if current_version == "0.1.0":
             if os.path.getsize(cl_path) > 0:
                 # there is a changelog file and it contains something
@@ -140,10 +403,161 @@ class CheckChangelogStep(GitStep):
                 return Result(
                     success=False, messages=[f"Changelog file '{cl_path}' empty"]
                 )
-        # check if there is a diff
-        res = self.repo.git.diff(f"{self.prefix}{current_version}", "--", cl_path)
-        success = len(res) > 0
-        return Result(success=success)
+        # the tag of the current version or of the latest release before
+        tags = self.session.tag_index(self.prefix)
+        entry = tags.latest(upto=current_version)
+        if entry is None:
+            return Result(
+                success=False,
+                messages=[
+                    f"Could not find tag {self.prefix}{current_version} of the current version or of an earlier one"
+                ],
+            )
+        tag = entry.name
+        # comparing object ids is enough to know whether there is a diff
+        rel_path = os.path.relpath(cl_path, self.repo.working_tree_dir)
+        rel_path = rel_path.replace(os.sep, "/")
+        try:
+            tagged_blob = self.repo.git.rev_parse(f"{tag}:{rel_path}")
+        except GitCommandError:
+            # the changelog did not exist when the tag was created
+            return Result(success=True)
+        current_blob = self.repo.git.hash_object(rel_path)
+        if tagged_blob == current_blob:
+            return Result(
+                success=False,
+                messages=[
+                    f"'{rel_path}' is unchanged since tag {tag}"
+                    f" (blob {tagged_blob[:12]})"
+                ],
+            )
+        return Result(success=True)
+
+
+def target_version(current_version: str, bump_rule: Optional[str]) -> str:
+    """Version that is about to be released.
+
+    Invalid versions or rules raise the `ValueError` of :class:`Version`.
+
+    :param current_version: Version in the `pyproject.toml`
+    :param bump_rule: Rule of the bump, None or `initial` to keep the version
+    :return: The new version
+    """
+    if bump_rule is None or bump_rule == "initial":
+        return current_version
+    return str(Version.parse(current_version).bump(bump_rule))
+
+
+@dataclass(kw_only=True)
+class CheckChangelogEntryStep(Step):
+    short_name: str = "check_changelog_entry"
+    description: str = "Make sure changelog has an entry for the new version"
+    # None means the current version is released, e.g. for initial releases
+    bump_rule: Optional[str] = None
+
+    def _target_version(self) -> str:
+        return target_version(self.project_context.current_version, self.bump_rule)
+
+    def run(self) -> Result:
+        cl_path = self.project_context.changelog_path
+        if cl_path is None:
+            return Result(
+                success=False,
+                messages=[
+                    "Could not find Changelog in paths:",
+                    f"{list(CHANGELOG_PATHS)}",
+                ],
+            )
+        try:
+            version = self._target_version()
+        except ValueError as e:
+            return Result(success=False, messages=[str(e)])
+        with open(cl_path, encoding="utf-8") as f:
+            section = find_release_section(f, version)
+        if section is None:
+            return Result(
+                success=False,
+                messages=[
+                    f"Could not find an entry for {version} or a non-empty"
+                    f" 'Unreleased' section in '{os.path.basename(cl_path)}'"
+                ],
+            )
+        from rich.markup import escape
+
+        self.project_context.release_notes = section.text
+        return Result(
+            success=True,
+            messages=[
+                f"Found entry '{escape(section.title)}' in line {section.line_number}"
+            ],
+            return_value=section,
+        )
+
+
+def _same_version(tagged: str, version: str) -> bool:
+    try:
+        first, second = Version.parse(tagged), Version.parse(version)
+    except ValueError:
+        return False
+    # e.g. 1.0 and 1.0.0 are equal but not as dataclasses
+    return first <= second <= first
+
+
+@dataclass(kw_only=True)
+class CheckTagAvailableStep(GitStep):
+    short_name: str = "check_tag_available"
+    description: str = "Make sure the tag of the new version does not exist yet"
+    prefix: str = "v"
+    remote: str = "origin"
+    # None means the current version is released, e.g. for initial releases
+    bump_rule: Optional[str] = None
+    timeout: Optional[float] = 120
+
+    def prefetch(self):
+        session = self.project_context.git
+        # packages of a workspace share the query of their session
+        self.project_context.prefetch(
+            f"remote tags {self.remote}",
+            lambda: session.remote_tags(self.remote, timeout=self.timeout),
+        )
+
+    def _run(self) -> Result:
+        from git.exc import GitCommandError
+
+        try:
+            version = target_version(
+                self.project_context.current_version, self.bump_rule
+            )
+        except ValueError as e:
+            return Result(success=False, messages=[str(e)])
+        tag = f"{self.prefix}{version}"
+        # also finds e.g. v1.0 for 1.0.0, which is the same release
+        local = self.session.tag_index(self.prefix).find(version)
+        if local is not None:
+            return Result(
+                success=False,
+                messages=[f"Tag {local.name} of version {version} already exists"],
+            )
+        try:
+            remote_tags = self.project_context.prefetched(
+                f"remote tags {self.remote}",
+                lambda: self.session.remote_tags(self.remote, timeout=self.timeout),
+            )
+        except GitCommandError as e:
+            return Result(
+                success=False, messages=[f"Listing tags of {self.remote} failed: {e}"]
+            )
+        for name in remote_tags:
+            if name.startswith(self.prefix) and _same_version(
+                name[len(self.prefix) :], version
+            ):
+                return Result(
+                    success=False,
+                    messages=[
+                        f"Tag {name} of version {version} already exists on {self.remote}"
+                    ],
+                )
+        return Result(success=True, messages=[f"Tag {tag} is available"])
 
 
 @dataclass(kw_only=True)
@@ -153,25 +567,21 @@ class BumpVersionStep(Step):
     description: str = "Bump version"
 
     def run(self, dry_run: bool = False) -> Result:
-        command = ["poetry", "version", self.bump_rule]
+        path = self.project_context.pyproject_path
+        try:
+            bump = bump_pyproject(path, self.bump_rule, dry_run=dry_run)
+        except (OSError, ValueError) as e:
+            return Result(success=False, messages=[str(e)])
+        part_message = f"version from [yellow]{bump.previous_version}[/yellow] to [blue]{bump.new_version}[/blue]"
         if dry_run:
-            command.append("--dry-run")
-        res = subprocess.run(command, capture_output=True)
-        if res.returncode == 0:
-            bump_message = res.stdout.decode().strip()
-            previous_version = bump_message.split(" ")[3]
-            new_version = bump_message.split(" ")[5]
-            part_message = f"version from [yellow]{previous_version}[/yellow] to [blue]{new_version}[/blue]"
-            if dry_run:
-                return Result(
-                    success=True,
-                    messages=[f"Would bump {part_message}"],
-                    return_value=VersionBump(
-                        previous_version=previous_version, new_version=new_version
-                    ),
-                )
-            return Result(success=True, messages=[f"Bumped {part_message}"])
-        return Result(success=False, messages=str.splitlines(res.stderr.decode()))
+            return Result(
+                success=True,
+                messages=[f"Would bump {part_message}"],
+                return_value=bump,
+            )
+        return Result(
+            success=True, messages=[f"Bumped {part_message}"], mutated_project=True
+        )
 
 
 @dataclass(kw_only=True)
@@ -180,15 +590,31 @@ class CommitVersionBumpStep(GitStep):
     description: str = "Commit version bump"
     remote: str = "origin"
     commit_message: str = "Bumped version"
+    # without pushing, the commit is pushed together with the tag
+    push: bool = True
+    timeout: Optional[float] = 120
 
     def _run(self) -> Result:
+        from git.exc import GitCommandError
+
+        pyproject_path = self.project_context.pyproject_path
         try:
-            self.repo.git.add("pyproject.toml")
-            self.repo.git.commit("-m", self.commit_message)
-            self.repo.git.push(self.remote)
+            # when resuming after a failed push the bump is already committed
+            if self.repo.is_dirty(path=pyproject_path):
+                self.repo.git.add(pyproject_path)
+                self.repo.git.commit("-m", self.commit_message)
         except GitCommandError as e:
             return Result(success=False, messages=[e.stderr.strip()])
-        return Result(success=True)
+        if not self.push:
+            return Result(success=True, mutated_project=True)
+        res = self.run_process(["git", "push", self.remote])
+        if res.returncode != 0:
+            return Result(
+                success=False,
+                messages=self.failure_messages(res),
+                mutated_project=True,
+            )
+        return Result(success=True, mutated_project=True)
 
 
 @dataclass(kw_only=True)
@@ -198,6 +624,8 @@ class GitTagStep(DynamicVersionDescriptionGitStep):
     prefix: str = "v"
 
     def _run(self) -> Result:
+        from git.exc import GitCommandError
+
         if not hasattr(self, "_new_version"):
             return Result(
                 success=False, messages=["Can't tag if no new version is provided"]
@@ -206,7 +634,7 @@ class GitTagStep(DynamicVersionDescriptionGitStep):
             self.repo.git.tag(f"{self.prefix}{self.new_version}")
         except GitCommandError as e:
             return Result(success=False, messages=[e.stderr.strip()])
-        return Result(success=True)
+        return Result(success=True, mutated_project=True)
 
 
 @dataclass(kw_only=True)
@@ -215,27 +643,137 @@ class PushTagStep(DynamicVersionDescriptionGitStep):
     description: str = "Push git tag"
     remote: str = "origin"
     prefix: str = "v"
+    # push the current branch and the tag in one atomic push
+    atomic: bool = False
+    timeout: Optional[float] = 120
 
     def _run(self) -> Result:
         if self.new_version is None:
             return Result(
                 success=False, messages=["Can't tag if no new version is provided"]
             )
-        try:
-            self.repo.git.push(self.remote, f"{self.prefix}{self.new_version}")
-        except GitCommandError as e:
-            return Result(success=False, messages=[e.stderr.strip()])
+        tag = f"{self.prefix}{self.new_version}"
+        if self.atomic:
+            # branch and tag both arrive or neither does, in a single push,
+            # the branch goes to the upstream it was checked to be synced with
+            upstream = self.session.upstream_ref(self.session.active_branch)
+            args = ["--atomic", self.remote, f"HEAD:{upstream}", tag]
+        else:
+            args = [self.remote, tag]
+        res = self.run_process(["git", "push", *args])
+        if res.returncode != 0:
+            return Result(success=False, messages=self.failure_messages(res))
         return Result(success=True)
 
 
+@dataclass(kw_only=True)
+class BuildStep(GitStep):
+    short_name: str = "build"
+    description: str = "Build sdist and wheel"
+    formats: Tuple[str, ...] = ("sdist", "wheel")
+    timeout: Optional[float] = 600
+
+    @property
+    def dist_dir(self) -> str:
+        return os.path.join(self.project_context.project_dir, "dist")
+
+    def _store_key(self) -> Optional[str]:
+        from git.exc import GitCommandError
+
+        rel = os.path.relpath(
+            self.project_context.project_dir, self.repo.working_tree_dir
+        )
+        rel = "" if rel == "." else rel.replace(os.sep, "/")
+        try:
+            # uncommitted changes would end up in the build, but not the key,
+            # the same goes for untracked files, that are not ignored
+            if self.repo.is_dirty(untracked_files=True, path=rel or None):
+                return None
+            return self.repo.git.rev_parse(f"HEAD:{rel}")
+        except GitCommandError:
+            return None
+
+    def _dist_files(self) -> Dict[str, float]:
+        if not os.path.isdir(self.dist_dir):
+            return {}
+        return {
+            entry.path: entry.stat().st_mtime
+            for entry in os.scandir(self.dist_dir)
+            if entry.is_file()
+        }
+
+    def _build(self) -> Tuple[List[str], List[str]]:
+        from concurrent.futures import ThreadPoolExecutor
+
+        before = self._dist_files()
+        # the formats are built independently, so they can be built at the same time
+        with ThreadPoolExecutor(max_workers=len(self.formats)) as executor:
+            results = list(
+                executor.map(
+                    lambda build_format: self.run_process(
+                        ["poetry", "build", "--format", build_format],
+                        label=build_format,
+                    ),
+                    self.formats,
+                )
+            )
+        failures = []
+        for build_format, res in zip(self.formats, results):
+            if res.returncode != 0:
+                failures.append(f"Building {build_format} failed:")
+                failures.extend(self.failure_messages(res))
+        built = [
+            path
+            for path, mtime in self._dist_files().items()
+            if before.get(path) != mtime
+        ]
+        return sorted(built), failures
+
+    def _run(self) -> Result:
+        from .artifacts import ArtifactStore
+
+        store = ArtifactStore(project_dir=self.project_context.project_dir)
+        key = self._store_key()
+        if key is not None:
+            artifacts = store.get(key)
+            if artifacts is not None:
+                self.project_context.artifacts = artifacts
+                return Result(
+                    success=True,
+                    messages=[f"Reusing artifacts built from tree {key[:12]}"],
+                    return_value=artifacts,
+                )
+        built, failures = self._build()
+        if failures:
+            return Result(success=False, messages=failures)
+        if len(built) == 0:
+            return Result(success=False, messages=["Build did not create any files"])
+        artifacts = store.put(key, built) if key is not None else built
+        self.project_context.artifacts = artifacts
+        names = ", ".join(os.path.basename(path) for path in artifacts)
+        return Result(success=True, messages=[f"Built {names}"], return_value=artifacts)
+
+
 @dataclass(kw_only=True)
 class PoetryPublishStep(Step):
     short_name: str = "publish"
-    description: str = "Build and publish with poetry"
+    description: str = "Publish with poetry"
     pypy_token_name: str = "PYPI_TOKEN"
+    timeout: Optional[float] = 600
 
     def run(self) -> Result:
-        command = ["poetry", "publish", "--build"]
+        from .artifacts import ArtifactStore
+
+        command = ["poetry", "publish"]
+        artifacts = self.project_context.artifacts
+        if artifacts:
+            # poetry publishes from dist, which may have been cleaned since
+            store = ArtifactStore(project_dir=self.project_context.project_dir)
+            dist_dir = os.path.join(self.project_context.project_dir, "dist")
+            store.restore(artifacts, dist_dir)
+        else:
+            # e.g. if the build step was skipped
+            command.append("--build")
         if os.getenv(self.pypy_token_name):
             token = os.getenv(self.pypy_token_name)
             assert token  # for mypy
@@ -244,10 +782,78 @@ class PoetryPublishStep(Step):
             user_name = typer.prompt("Please enter your PyPI username")
             password = typer.prompt("Please enter your PyPI password", hide_input=True)
             command.extend(["--username", user_name, "--password", password])
-        res = subprocess.run(command)
+        res = self.run_process(command)
         if res.returncode != 0:
-            return Result(success=False, messages=[res.stderr.decode().strip()])
-        return Result(success=True, messages=["Build and published successfully!"])
+            return Result(success=False, messages=self.failure_messages(res))
+        return Result(success=True, messages=["Published successfully!"])
+
+
+@dataclass(kw_only=True)
+class PublishStep(Step):
+    short_name: str = "publish"
+    description: str = "Publish built artifacts"
+    # given as "name=url" or the name of a known index like "pypi"
+    repositories: Tuple[str, ...] = ("pypi",)
+    max_workers: int = 4
+    retries: int = 3
+    backoff: float = 1.0
+    # files that already exist on an index count as published
+    skip_existing: bool = False
+    # for all uploads together
+    timeout: Optional[float] = 600
+
+    def _credentials(self, repository: "Repository"):
+        # e.g. PYPI_TOKEN for pypi
+        token_name = f"{repository.name.upper().replace('-', '_')}_TOKEN"
+        token = os.getenv(token_name)
+        if token:
+            repository.username, repository.password = "__token__", token
+        else:
+            repository.username = typer.prompt(
+                f"Please enter your username for {repository.name}"
+            )
+            repository.password = typer.prompt(
+                f"Please enter your password for {repository.name}", hide_input=True
+            )
+
+    def run(self) -> Result:
+        from .publish import Publisher, parse_repository, summarize
+
+        artifacts = self.project_context.artifacts
+        if not artifacts:
+            return Result(
+                success=False, messages=["Nothing to publish, nothing was built"]
+            )
+        try:
+            repositories = [parse_repository(spec) for spec in self.repositories]
+        except ValueError as e:
+            return Result(success=False, messages=[str(e)])
+        for repository in repositories:
+            self._credentials(repository)
+        publisher = Publisher(
+            repositories=repositories,
+            max_workers=self.max_workers,
+            retries=self.retries,
+            backoff=self.backoff,
+            skip_existing=self.skip_existing,
+            deadline=self.timeout,
+        )
+        try:
+            results = publisher.publish(artifacts)
+        except (OSError, ValueError) as e:
+            return Result(success=False, messages=[str(e)])
+        messages = summarize(results)
+        for result in results:
+            if not result.success:
+                name = os.path.basename(result.path)
+                messages.append(
+                    f"Uploading {name} to {result.repository} failed after {result.attempts} attempts: {result.message}"
+                )
+        return Result(
+            success=all(result.success for result in results),
+            messages=messages,
+            return_value=results,
+        )
 
 
 @dataclass(kw_only=True)
@@ -256,6 +862,15 @@ class GithubReleaseReminderStep(Step):
     description: str = "Remind you to upload build as github release"
 
     def run(self) -> Result:
+        release_notes = self.project_context.release_notes
+        if release_notes:
+            typer.echo("Release notes from your changelog:")
+            typer.echo(release_notes)
+        artifacts = self.project_context.artifacts
+        if artifacts:
+            typer.echo("Files to attach to the release:")
+            for path in artifacts:
+                typer.echo(f"  {path}")
         gh_released = typer.confirm(
             "Please create a github release now! Did you do it?"
         )
@@ -0,0 +1,267 @@
+import bisect
+import json
+import os
+import subprocess
+import threading
+import zlib
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Tuple
+
+from .context import ensure_recite_dir
+from .version import Version
+
+TagEntry = namedtuple("TagEntry", ["name", "version", "commit"])
+
+# bump to ignore caches written by older versions of recite
+CACHE_FORMAT = 1
+# name -> (object the ref points to, peeled commit if known)
+Refs = Dict[str, Tuple[str, Optional[str]]]
+# e.g. the changelog checks of a workspace load their indexes concurrently
+_CACHE_LOCK = threading.Lock()
+
+
+def read_packed_refs(path: str) -> Refs:
+    """Read the tags of a `packed-refs` file.
+
+    :param path: Path of the file
+    :return: Tags by name, without `refs/tags/`
+    """
+    refs: Refs = {}
+    if not os.path.isfile(path):
+        return refs
+    peeled = False
+    last = None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith("#"):
+                # with "peeled", tags without a "^" line point to commits
+                peeled = " peeled" in line or "fully-peeled" in line
+            elif line.startswith("^") and last is not None:
+                refs[last] = (refs[last][0], line[1:])
+            else:
+                target, _, ref = line.partition(" ")
+                last = None
+                if ref.startswith("refs/tags/"):
+                    last = ref[len("refs/tags/") :]
+                    refs[last] = (target, target if peeled else None)
+    return refs
+
+
+def _peel_loose(objects_dir: str, target: str) -> Optional[str]:
+    # new tags usually are loose objects, packed ones would need git
+    path = os.path.join(objects_dir, target[:2], target[2:])
+    try:
+        with open(path, "rb") as f:
+            data = zlib.decompressobj().decompress(f.read(), 256)
+    except (OSError, zlib.error):
+        return None
+    if data.startswith(b"commit "):
+        return target
+    if data.startswith(b"tag "):
+        # the header is followed by "object <sha>" and "type <type>"
+        fields = data.split(b"\0", 1)[-1].split(b"\n")
+        if len(fields) > 1 and fields[1] == b"type commit":
+            return fields[0][len(b"object ") :].decode()
+    return None
+
+
+def _peel_with_git(git_dir: str, targets: List[str]) -> List[Optional[str]]:
+    # packed tag objects are resolved by one git process for all of them
+    try:
+        output = subprocess.run(
+            ["git", "--git-dir", git_dir, "cat-file", "--batch-check=%(objectname)"],
+            input="".join(f"{target}^{{commit}}\n" for target in targets),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.splitlines()
+    except (OSError, subprocess.CalledProcessError):
+        return [None] * len(targets)
+    # objects that are no commits are reported as "<input> missing"
+    return [line if " " not in line else None for line in output]
+
+
+class TagIndex:
+    """Tags with one prefix, sorted by the version following the prefix.
+
+    Tags that are no valid PEP 440 version after the prefix are left out.
+    Lookups compare versions in `O(log n)`. The commit of an entry is None,
+    if the tag does not point to a commit.
+    """
+
+    def __init__(self, prefix: str, entries: List[TagEntry]):
+        self.prefix = prefix
+        # sorted by version, the sort key is only parsed while bisecting
+        self.entries = entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _bisect_right(self, version: str) -> int:
+        return bisect.bisect_right(
+            self.entries, Version.parse(version), key=lambda e: Version.parse(e.version)
+        )
+
+    def latest(self, upto: Optional[str] = None) -> Optional[TagEntry]:
+        """Tag of the highest version, that is not higher than `upto`.
+
+        :param upto: Version to look up, None for the highest version of all
+        :return: The tag or None if there is none
+        """
+        index = len(self.entries) if upto is None else self._bisect_right(upto)
+        return self.entries[index - 1] if index > 0 else None
+
+    def find(self, version: str) -> Optional[TagEntry]:
+        """Tag of exactly `version`, e.g. `v1.0` for `1.0.0`.
+
+        :param version: Version to look up
+        :return: The tag or None if there is none
+        """
+        entry = self.latest(upto=version)
+        if entry is not None and Version.parse(version) <= Version.parse(entry.version):
+            return entry
+        return None
+
+    @classmethod
+    def load(
+        cls, git_dir: str, prefix: str, project_dir: Optional[str] = None
+    ) -> "TagIndex":
+        """Read the tags from `packed-refs` and `refs/tags` of a git directory.
+
+        Without `project_dir` everything is read and sorted. Otherwise the
+        index is kept in its `.recite/tags` and only updated by what changed:
+        the packed refs are only read again if the file changed, loose refs
+        only if their file changed, and new versions are inserted into the
+        sorted list.
+
+        :param git_dir: Common git directory of the repository
+        :param prefix: Prefix of the version tags, e.g. `v`
+        :param project_dir: Directory containing the cache
+        :return: The index
+        """
+        with _CACHE_LOCK:
+            cache = _read_cache(project_dir)
+            refs, entries, changed = _update(cache, git_dir, prefix)
+            if changed and project_dir is not None:
+                _write_cache(project_dir, cache)
+        return cls(
+            prefix=prefix,
+            entries=[
+                TagEntry(name=name, version=version, commit=refs[name][1])
+                for name, version in entries
+            ],
+        )
+
+
+def _update(
+    cache: Dict[str, Any], git_dir: str, prefix: str
+) -> Tuple[Refs, List[List[str]], bool]:
+    changed = False
+
+    packed_path = os.path.join(git_dir, "packed-refs")
+    packed_stat = None
+    if os.path.isfile(packed_path):
+        stat = os.stat(packed_path)
+        packed_stat = [stat.st_mtime_ns, stat.st_size]
+    if packed_stat != cache["packed_stat"]:
+        cache["packed_stat"] = packed_stat
+        cache["packed"] = read_packed_refs(packed_path)
+        changed = True
+
+    loose = {}
+    tags_dir = os.path.join(git_dir, "refs", "tags")
+    objects_dir = os.path.join(git_dir, "objects")
+    for root, _, files in os.walk(tags_dir):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            name = os.path.relpath(path, tags_dir).replace(os.sep, "/")
+            mtime = os.stat(path).st_mtime_ns
+            cached = cache["loose"].get(name)
+            if cached is not None and cached[0] == mtime:
+                loose[name] = cached
+                continue
+            with open(path, encoding="utf-8") as f:
+                target = f.read().strip()
+            loose[name] = [mtime, target, _peel_loose(objects_dir, target)]
+            changed = True
+    if loose.keys() != cache["loose"].keys():
+        changed = True
+    cache["loose"] = loose
+
+    refs = {name: tuple(ref) for name, ref in cache["packed"].items()}
+    # loose refs take precedence over packed ones
+    refs.update({name: (ref[1], ref[2]) for name, ref in loose.items()})
+    names = {name for name in refs if name.startswith(prefix)}
+
+    unpeeled = sorted(name for name in names if refs[name][1] is None)
+    if unpeeled:
+        commits = _peel_with_git(git_dir, [refs[name][0] for name in unpeeled])
+        for name, commit in zip(unpeeled, commits):
+            if commit is None:
+                continue
+            refs[name] = (refs[name][0], commit)
+            if name in loose:
+                loose[name][2] = commit
+            else:
+                cache["packed"][name] = [refs[name][0], commit]
+            changed = True
+
+    # "sorted" holds [name, version] pairs, "invalid" the names of other tags
+    index: Dict[str, List] = cache["prefixes"].get(
+        prefix, {"sorted": [], "invalid": []}
+    )
+    known = {entry[0] for entry in index["sorted"]} | set(index["invalid"])
+    if known != names:
+        changed = True
+        # removed tags are dropped, new ones inserted at their version
+        index["sorted"] = [e for e in index["sorted"] if e[0] in names]
+        index["invalid"] = [name for name in index["invalid"] if name in names]
+        added = []
+        for name in sorted(names - known):
+            try:
+                added.append([name, str(Version.parse(name[len(prefix) :]))])
+            except ValueError:
+                index["invalid"].append(name)
+        if len(added) > len(index["sorted"]) // 8:
+            # e.g. on the first run, sorting once is cheaper
+            index["sorted"].extend(added)
+            index["sorted"].sort(key=lambda e: Version.parse(e[1]))
+        else:
+            for entry in added:
+                bisect.insort_right(
+                    index["sorted"], entry, key=lambda e: Version.parse(e[1])
+                )
+        cache["prefixes"][prefix] = index
+    return refs, index["sorted"], changed
+
+
+def _cache_path(project_dir: str) -> str:
+    return os.path.join(project_dir, ".recite", "tags", "index.json")
+
+
+def _read_cache(project_dir: Optional[str]) -> Dict[str, Any]:
+    empty: Dict[str, Any] = {
+        "format": CACHE_FORMAT,
+        "packed_stat": None,
+        "packed": {},
+        "loose": {},
+        "prefixes": {},
+    }
+    if project_dir is None or not os.path.isfile(_cache_path(project_dir)):
+        return empty
+    try:
+        with open(_cache_path(project_dir), encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    return cache if cache.get("format") == CACHE_FORMAT else empty
+
+
+def _write_cache(project_dir: str, cache: Dict[str, Any]):
+    ensure_recite_dir(project_dir, "tags")
+    path = _cache_path(project_dir)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
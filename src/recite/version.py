@@ -0,0 +1,269 @@
+import os
+import re
+from collections import namedtuple
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
+
+VersionBump = namedtuple("VersionBump", ["previous_version", "new_version"])
+
+BUMP_RULES = (
+    "major",
+    "minor",
+    "patch",
+    "premajor",
+    "preminor",
+    "prepatch",
+    "prerelease",
+)
+
+# see https://peps.python.org/pep-0440/#appendix-b-parsing-version-strings-with-regular-expressions
+_VERSION_PATTERN = re.compile(
+    r"""
+    ^\s*v?
+    (?:(?P<epoch>[0-9]+)!)?
+    (?P<release>[0-9]+(?:\.[0-9]+)*)
+    (?P<pre>
+        [-_\.]?
+        (?P<pre_l>alpha|a|beta|b|preview|pre|c|rc)
+        [-_\.]?
+        (?P<pre_n>[0-9]+)?
+    )?
+    (?P<post>
+        (?:-(?P<post_n1>[0-9]+))
+        |
+        (?:
+            [-_\.]?
+            (?P<post_l>post|rev|r)
+            [-_\.]?
+            (?P<post_n2>[0-9]+)?
+        )
+    )?
+    (?P<dev>
+        [-_\.]?
+        (?P<dev_l>dev)
+        [-_\.]?
+        (?P<dev_n>[0-9]+)?
+    )?
+    (?:\+(?P<local>[a-z0-9]+(?:[-_\.][a-z0-9]+)*))?
+    \s*$
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+_PRE_PHASES = {
+    "a": "a",
+    "alpha": "a",
+    "b": "b",
+    "beta": "b",
+    "c": "rc",
+    "pre": "rc",
+    "preview": "rc",
+    "rc": "rc",
+}
+_PHASE_ORDER = ("a", "b", "rc")
+
+
+@dataclass(frozen=True)
+class Version:
+    """A parsed PEP 440 version, which can be bumped like poetry does."""
+
+    release: Tuple[int, ...]
+    epoch: int = 0
+    pre: Optional[Tuple[str, int]] = None
+    post: Optional[int] = None
+    dev: Optional[int] = None
+    local: Optional[str] = None
+
+    @classmethod
+    def parse(cls, version: str) -> "Version":
+        match = _VERSION_PATTERN.match(version)
+        if match is None:
+            raise ValueError(f"'{version}' is not a valid PEP 440 version")
+        pre = None
+        if match.group("pre_l"):
+            pre = (
+                _PRE_PHASES[match.group("pre_l").lower()],
+                int(match.group("pre_n") or 0),
+            )
+        post = None
+        if match.group("post"):
+            post = int(match.group("post_n1") or match.group("post_n2") or 0)
+        dev = None
+        if match.group("dev"):
+            dev = int(match.group("dev_n") or 0)
+        local = match.group("local")
+        return cls(
+            release=tuple(int(part) for part in match.group("release").split(".")),
+            epoch=int(match.group("epoch") or 0),
+            pre=pre,
+            post=post,
+            dev=dev,
+            local=re.sub(r"[-_]", ".", local.lower()) if local else None,
+        )
+
+    def __str__(self) -> str:
+        version = f"{self.epoch}!" if self.epoch else ""
+        version += ".".join(str(part) for part in self.release)
+        if self.pre is not None:
+            version += f"{self.pre[0]}{self.pre[1]}"
+        if self.post is not None:
+            version += f".post{self.post}"
+        if self.dev is not None:
+            version += f".dev{self.dev}"
+        if self.local is not None:
+            version += f"+{self.local}"
+        return version
+
+    @property
+    def is_stable(self) -> bool:
+        return self.pre is None and self.dev is None
+
+    def _key(self) -> tuple:
+        release = list(self.release)
+        while len(release) > 1 and release[-1] == 0:
+            release.pop()
+        if self.pre is None and self.post is None and self.dev is not None:
+            # 1.0.dev0 sorts before 1.0a0
+            pre: tuple = (-1,)
+        elif self.pre is None:
+            pre = (1,)
+        else:
+            pre = (0, _PHASE_ORDER.index(self.pre[0]), self.pre[1])
+        post = (-1,) if self.post is None else (0, self.post)
+        dev = (1,) if self.dev is None else (0, self.dev)
+        local: tuple = ()
+        if self.local is not None:
+            local = tuple(
+                (1, int(part), "") if part.isdigit() else (0, 0, part)
+                for part in self.local.split(".")
+            )
+        return (self.epoch, tuple(release), pre, post, dev, local)
+
+    def __lt__(self, other: "Version") -> bool:
+        return self._key() < other._key()
+
+    def __le__(self, other: "Version") -> bool:
+        return self._key() <= other._key()
+
+    def _padded(self, length: int) -> Tuple[int, ...]:
+        return self.release + (0,) * (length - len(self.release))
+
+    def _with_release(self, release: Tuple[int, ...]) -> "Version":
+        return Version(release=release, epoch=self.epoch)
+
+    def next_major(self) -> "Version":
+        release = self._padded(1)
+        # 2.0.0a1 becomes 2.0.0, but 2.1.0a1 becomes 3.0.0
+        if self.is_stable or any(release[1:]):
+            release = (release[0] + 1,) + (0,) * (len(release) - 1)
+        return self._with_release(release)
+
+    def next_minor(self) -> "Version":
+        release = self._padded(2)
+        if self.is_stable or any(release[2:]):
+            release = (release[0], release[1] + 1) + (0,) * (len(release) - 2)
+        return self._with_release(release)
+
+    def next_patch(self) -> "Version":
+        release = self._padded(3)
+        if self.is_stable:
+            release = release[:2] + (release[2] + 1,) + (0,) * (len(release) - 3)
+        return self._with_release(release)
+
+    def first_prerelease(self) -> "Version":
+        return replace(self, pre=("a", 0), post=None, dev=None, local=None)
+
+    def next_prerelease(self) -> "Version":
+        if self.pre is not None:
+            return replace(
+                self, pre=(self.pre[0], self.pre[1] + 1), post=None, dev=None
+            )
+        return self.next_patch().first_prerelease()
+
+    def bump(self, rule: str) -> "Version":
+        """Apply one of poetry's bump rules or set an explicit version.
+
+        :param rule: One of :data:`BUMP_RULES` or a valid PEP 440 version
+        :return: The bumped version
+        :raises ValueError: If the rule is unknown and not a valid version
+        """
+        if rule in ("major", "premajor"):
+            new = self.next_major()
+        elif rule in ("minor", "preminor"):
+            new = self.next_minor()
+        elif rule in ("patch", "prepatch"):
+            new = self.next_patch()
+        elif rule == "prerelease":
+            return self.next_prerelease()
+        else:
+            try:
+                return Version.parse(rule)
+            except ValueError:
+                raise ValueError(
+                    f"'{rule}' is neither a valid bump rule {BUMP_RULES}"
+                    " nor a valid version"
+                ) from None
+        if rule.startswith("pre"):
+            new = new.first_prerelease()
+        return new
+
+
+_TABLE_HEADER = re.compile(r"^\s*\[\s*([^\[\]]+?)\s*\]\s*(#.*)?$")
+_VERSION_LINE = re.compile(r"""^(\s*version\s*=\s*)(["'])([^"']*)(["'])""")
+# poetry-based projects keep the version in [tool.poetry], PEP 621 in [project]
+VERSION_TABLES = ("tool.poetry", "project")
+
+
+def _find_version_line(lines) -> Tuple[int, "re.Match[str]"]:
+    found = {}
+    table = None
+    for number, line in enumerate(lines):
+        header = _TABLE_HEADER.match(line)
+        if header is not None:
+            table = header.group(1)
+            continue
+        if table in VERSION_TABLES and table not in found:
+            match = _VERSION_LINE.match(line)
+            if match is not None:
+                found[table] = (number, match)
+    for table in VERSION_TABLES:
+        if table in found:
+            return found[table]
+    raise ValueError("Could not find a version in pyproject.toml")
+
+
+def read_pyproject_version(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    return _find_version_line(lines)[1].group(3)
+
+
+def write_pyproject_version(path: str, new_version: str):
+    """Replace the version in the given pyproject.toml, keeping everything else.
+
+    :param path: Path to the pyproject.toml
+    :param new_version: Version to write
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        lines = f.readlines()
+    number, match = _find_version_line(lines)
+    line = lines[number]
+    lines[number] = line[: match.start(3)] + new_version + line[match.end(3) :]
+    tmp_path = f"{path}.recite-tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.writelines(lines)
+    os.replace(tmp_path, path)
+
+
+def bump_pyproject(path: str, rule: str, dry_run: bool = False) -> VersionBump:
+    """Bump the version of a project without spawning poetry.
+
+    :param path: Path to the pyproject.toml
+    :param rule: One of :data:`BUMP_RULES` or a valid PEP 440 version
+    :param dry_run: If True, pyproject.toml is not changed
+    :return: Previous and new version
+    """
+    previous_version = read_pyproject_version(path)
+    new_version = str(Version.parse(previous_version).bump(rule))
+    if not dry_run:
+        write_pyproject_version(path, new_version)
+    return VersionBump(previous_version=previous_version, new_version=new_version)
@@ -0,0 +1,105 @@
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Tuple
+
+# directories that never contain packages of the workspace
+SKIPPED_DIRS = {"node_modules", "venv", "dist", "build", "site"}
+
+
+@dataclass
+class Package:
+    name: str
+    project_dir: str
+    # names of other workspace packages, that this one depends on via path
+    path_dependencies: Tuple[str, ...] = ()
+
+
+def _load_toml(path: str) -> Dict[str, Any]:
+    try:
+        import tomllib
+    except ModuleNotFoundError:  # pragma: no cover
+        import toml
+
+        return toml.load(path)
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def _iter_pyprojects(root: str) -> Iterator[str]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            d for d in dirnames if not d.startswith(".") and d not in SKIPPED_DIRS
+        )
+        if "pyproject.toml" in filenames:
+            yield os.path.join(dirpath, "pyproject.toml")
+
+
+def _path_dependencies(poetry: Dict[str, Any], project_dir: str) -> List[str]:
+    tables = [poetry.get("dependencies", {}), poetry.get("dev-dependencies", {})]
+    for group in poetry.get("group", {}).values():
+        tables.append(group.get("dependencies", {}))
+    paths = []
+    for table in tables:
+        for spec in table.values():
+            specs = spec if isinstance(spec, list) else [spec]
+            for single in specs:
+                if isinstance(single, dict) and "path" in single:
+                    path = os.path.join(project_dir, single["path"])
+                    paths.append(os.path.normpath(os.path.abspath(path)))
+    return paths
+
+
+def discover_packages(root: str) -> List[Package]:
+    """Find all poetry packages below `root`.
+
+    Hidden directories (e.g. `.venv`, `.nox`, `.git`) are not searched.
+
+    :param root: Root directory of the workspace
+    :return: Packages sorted by their directory
+    """
+    found: List[Tuple[str, str, List[str]]] = []
+    for path in _iter_pyprojects(root):
+        poetry = _load_toml(path).get("tool", {}).get("poetry", {})
+        if "name" not in poetry:
+            # e.g. a pyproject.toml only configuring tools for the workspace
+            continue
+        project_dir = os.path.dirname(os.path.abspath(path))
+        found.append(
+            (poetry["name"], project_dir, _path_dependencies(poetry, project_dir))
+        )
+    names_by_dir = {project_dir: name for name, project_dir, _ in found}
+    return [
+        Package(
+            name=name,
+            project_dir=project_dir,
+            path_dependencies=tuple(
+                names_by_dir[path] for path in paths if path in names_by_dir
+            ),
+        )
+        for name, project_dir, paths in found
+    ]
+
+
+def release_waves(packages: List[Package]) -> List[List[Package]]:
+    """Group packages, so that each only depends on packages of earlier waves.
+
+    :param packages: Packages of the workspace
+    :return: Waves of packages
+    :raises ValueError: If packages depend on each other in a cycle
+    """
+    remaining = list(packages)
+    released: set = set()
+    waves = []
+    while remaining:
+        wave = [
+            package
+            for package in remaining
+            if all(dep in released for dep in package.path_dependencies)
+        ]
+        if not wave:
+            cycle = [package.name for package in remaining]
+            raise ValueError(f"Cyclic path dependencies between packages: {cycle}")
+        waves.append(wave)
+        released.update(package.name for package in wave)
+        remaining = [package for package in remaining if package.name not in released]
+    return waves
@@ -1,30 +1,68 @@
+import io
+import os
+import subprocess
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+from unittest import mock
 
+from git.exc import GitCommandError
+
+from recite.session import RepoSession
 from recite.step import Result
 
 
+class MockStatusProcess:
+    def __init__(self, output: bytes):
+        self.stdout = io.BytesIO(output)
+        self.terminated = False
+
+    def wait(self):
+        return 0
+
+    def terminate(self):
+        self.terminated = True
+
+
 @dataclass
 class MockGit:
     unsynced: bool = False
+    dirty: bool = False
     has_diff: bool = False
+    missing_blob: bool = False
     added: List[str] = field(default_factory=list)
     commit_messages: List[str] = field(default_factory=list)
     tags: List[str] = field(default_factory=list)
     pushes: List = field(default_factory=list)
-
-    def status(self, branch: str, porcelain_str: str) -> str:
-        if self.unsynced:
-            return "## main...origin/main [ahead 1]"
-        return ""
-
-    def diff(self, *args) -> str:
+    fetches: List = field(default_factory=list)
+    remote_tags: List[str] = field(default_factory=list)
+
+    def status(self, *args, **kwargs) -> MockStatusProcess:
+        output = b""
+        if self.dirty:
+            output += b"1 .M N... 100644 100644 100644 " + b"a" * 40 + b" "
+            output += b"a" * 40 + b" some file.txt\0"
+        return MockStatusProcess(output)
+
+    def rev_parse(self, rev: str) -> str:
+        if self.missing_blob:
+            raise GitCommandError("rev-parse", 128)
+        if self.unsynced and rev.startswith("refs/remotes/"):
+            return "b" * 40
+        return "a" * 40
+
+    def ls_remote(self, *args, **kwargs) -> str:
+        if "--tags" in args:
+            return "\n".join(f"{'c' * 40}\trefs/tags/{t}" for t in self.remote_tags)
+        tip = "b" * 40 if self.unsynced else "a" * 40
+        return f"{tip}\t{args[-1]}"
+
+    def hash_object(self, path: str) -> str:
         if self.has_diff:
-            return "diff --git just a test"
-        return ""
+            return "b" * 40
+        return "a" * 40
 
-    def fetch(self):
-        pass
+    def fetch(self, *args, **kwargs):
+        self.fetches.append(args)
 
     def add(self, file_name: str):
         self.added.append(file_name)
@@ -35,8 +73,23 @@ class MockGit:
     def tag(self, tag: str):
         self.tags.append(tag)
 
-    def push(self, remote: str, tag: Optional[str] = None):
-        self.pushes.append((remote, tag))
+    def push(self, *args, **kwargs):
+        self.pushes.append(args)
+
+    def popen(self, fallback):
+        """Stand-in for `subprocess.Popen`, that handles the remote commands of git.
+
+        :param fallback: Starts all other commands
+        :return: The stand-in
+        """
+
+        def start(command, *args, **kwargs):
+            # commands talking to a remote are run via run_process, not gitpython
+            if command[:1] == ["git"] and command[1] in ("fetch", "ls-remote", "push"):
+                return MockGitProcess(self, command, cwd=kwargs.get("cwd"))
+            return fallback(command, *args, **kwargs)
+
+        return start
 
 
 @dataclass
@@ -44,31 +97,79 @@ class MockBranch:
     name: str
 
 
+@dataclass
+class MockHead:
+    is_detached: bool
+
+
+@dataclass
+class MockConfig:
+    values: Dict[Tuple[str, str], str]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def get_value(self, section: str, option: str, default: Any = None) -> Any:
+        return self.values.get((section, option), default)
+
+
 @dataclass
 class MockRepo:
 
     git: Optional[MockGit] = None
     dirty: bool = False
+    # whether there are untracked files, that are not ignored
+    untracked: bool = False
     active_branch: Optional[MockBranch] = None
-
-    def is_dirty(self, untracked_files: bool) -> bool:
-        return self.dirty
+    # git config by section and option
+    config: Dict[Tuple[str, str], str] = field(default_factory=dict)
+    working_tree_dir: str = field(default_factory=os.getcwd)
+
+    @property
+    def head(self) -> MockHead:
+        return MockHead(is_detached=self.active_branch is None)
+
+    def config_reader(self) -> MockConfig:
+        return MockConfig(values=self.config)
+
+    @property
+    def common_dir(self) -> str:
+        # a git directory with loose refs of the tags, which point to nowhere
+        assert self.git is not None
+        path = os.path.join(self.working_tree_dir, ".mockgit")
+        os.makedirs(os.path.join(path, "refs", "tags"), exist_ok=True)
+        for tag in self.git.tags:
+            with open(os.path.join(path, "refs", "tags", tag), "w") as f:
+                f.write("a" * 40)
+        return path
+
+    def is_dirty(
+        self, untracked_files: bool = False, path: Optional[str] = None
+    ) -> bool:
+        return self.dirty or (untracked_files and self.untracked)
 
 
 class MockStep:
+    cacheable = False
+
     def __init__(
         self,
         short_name: str = "mockstep",
         description: str = "mocks a step",
         skip: bool = False,
         was_run: bool = False,
+        depends_on: tuple = (),
         *args,
-        **kwargs
+        **kwargs,
     ):
         self.short_name = short_name
         self.description = description
         self.skip = skip
         self.was_run = was_run
+        self.depends_on = depends_on
         self.args = args
         self.kwargs = kwargs
 
@@ -87,13 +188,48 @@ def mock_run(self, repo: MockRepo = None, git: MockGit = None):
             self.repo.git = MockGit()
         else:
             self.repo.git = git
-    return self._run()
+    self.session = RepoSession(repo=self.repo)
+    if self.repo.git is None:
+        return self._run()
+    with mock.patch("subprocess.Popen", self.repo.git.popen(subprocess.Popen)):
+        return self._run()
 
 
-def mock_subprocess_run(command):
-    class Object(object):
-        pass
+class MockProcess:
+    """Stands in for `subprocess.Popen`, subclasses decide what a command does."""
+
+    def __init__(self, command, cwd: Optional[str] = None, **kwargs):
+        self.command = command
+        self.returncode, output = self.respond(command, cwd)
+        self.stdout = io.BytesIO(output)
+
+    def respond(self, command, cwd):
+        return 0, b""
+
+    def wait(self) -> int:
+        return self.returncode
+
+
+class MockGitProcess(MockProcess):
+    """Runs `git <command>` on the method of the same name of a `MockGit`."""
+
+    def __init__(self, git: MockGit, command, cwd: Optional[str] = None):
+        self.git = git
+        super().__init__(command, cwd)
+
+    def respond(self, command, cwd):
+        name, *args = command[1:]
+        output = getattr(self.git, name.replace("-", "_"))(*args)
+        return 0, (output or "").encode()
+
+
+class MockBuildProcess(MockProcess):
+    """Writes the artifact `poetry build --format <format>` would create."""
 
-    res = Object()
-    res.returncode = 0
-    return res
+    def respond(self, command, cwd):
+        dist_dir = os.path.join(cwd, "dist")
+        os.makedirs(dist_dir, exist_ok=True)
+        name = {"sdist": "test-0.1.0.tar.gz", "wheel": "test-0.1.0-py3-none-any.whl"}
+        with open(os.path.join(dist_dir, name[command[-1]]), "w") as f:
+            f.write(command[-1])
+        return 0, b"built\n"
@@ -0,0 +1,37 @@
+import os
+
+from recite.artifacts import ArtifactStore
+
+from .utils import create_file
+
+
+def test_artifact_store(tmp_path):
+    create_file(tmp_path, "test-0.1.0.tar.gz", "sdist")
+    create_file(tmp_path, "test-0.1.0-py3-none-any.whl", "wheel")
+    built = [
+        str(tmp_path / "test-0.1.0.tar.gz"),
+        str(tmp_path / "test-0.1.0-py3-none-any.whl"),
+    ]
+    store = ArtifactStore(project_dir=str(tmp_path))
+    assert store.get("a" * 40) is None
+    stored = store.put("a" * 40, built)
+    assert store.get("a" * 40) == stored
+    assert [os.path.basename(path) for path in stored] == sorted(
+        os.path.basename(path) for path in built
+    )
+
+    restored = store.restore(stored, str(tmp_path / "dist"))
+    assert open(restored[1]).read() == "sdist"
+
+    # corrupted entries are not used
+    with open(stored[0], "w") as f:
+        f.write("changed")
+    assert store.get("a" * 40) is None
+
+
+def test_artifact_store_eviction(tmp_path):
+    create_file(tmp_path, "test-0.1.0.tar.gz", "sdist")
+    store = ArtifactStore(project_dir=str(tmp_path), max_entries=2)
+    for key in ["a", "b", "c"]:
+        store.put(key * 40, [str(tmp_path / "test-0.1.0.tar.gz")])
+    assert sorted(os.listdir(store.store_dir)) == ["b" * 40, "c" * 40]
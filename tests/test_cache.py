@@ -0,0 +1,86 @@
+import os
+from dataclasses import dataclass
+from typing import ClassVar
+
+from git import Actor, Repo
+
+from recite.cache import ResultCache
+from recite.console import ReciteConsole
+from recite.runner import CheckStepRunner
+from recite.session import RepoSession
+from recite.step import Result, RunTestsStep, Step
+
+from .utils import create_file
+
+
+def _init_repo(path) -> Repo:
+    repo = Repo.init(path)
+    create_file(path, "pyproject.toml", "[tool.poetry]")
+    # libraries often do not track their lock file
+    create_file(path, ".gitignore", "poetry.lock")
+    repo.index.add(["pyproject.toml", ".gitignore"])
+    actor = Actor("test", "test@example.com")
+    repo.index.commit("first", author=actor, committer=actor)
+    return repo
+
+
+@dataclass(kw_only=True)
+class CountingStep(Step):
+    short_name: str = "counting"
+    description: str = "Counts how often it was run"
+    cacheable: ClassVar[bool] = True
+    run_count: ClassVar[int] = 0
+
+    def run(self) -> Result:
+        CountingStep.run_count += 1
+        return Result(success=True)
+
+
+def test_cache_key(tmp_path):
+    _init_repo(tmp_path)
+    cache = ResultCache(project_dir=str(tmp_path))
+    key = cache.key(RunTestsStep(project_dir=str(tmp_path)))
+    assert key is not None
+    assert key == cache.key(RunTestsStep(project_dir=str(tmp_path)))
+    assert key != cache.key(RunTestsStep(project_dir=str(tmp_path), short_name="other"))
+    assert not cache.contains(key)
+    cache.store(key, RunTestsStep(project_dir=str(tmp_path)))
+    assert cache.contains(key)
+    # the cache itself does not make the worktree dirty
+    assert cache.key(RunTestsStep(project_dir=str(tmp_path))) == key
+
+    # ignored inputs are hashed as well
+    create_file(tmp_path, "poetry.lock", "lock")
+    assert cache.key(RunTestsStep(project_dir=str(tmp_path))) not in (None, key)
+    # uncommitted changes can not be cached
+    create_file(tmp_path, "pyproject.toml", "[tool.poetry]\nname='x'")
+    assert cache.key(RunTestsStep(project_dir=str(tmp_path))) is None
+    RepoSession.close_all()
+
+
+def test_cache_no_repo(tmp_path):
+    step = RunTestsStep(project_dir=str(tmp_path))
+    assert ResultCache(project_dir=str(tmp_path)).key(step) is None
+    RepoSession.close_all()
+
+
+def test_cache_eviction(tmp_path):
+    cache = ResultCache(project_dir=str(tmp_path), max_entries=2)
+    for key in ["a", "b", "c"]:
+        cache.store(key, RunTestsStep())
+    assert len(os.listdir(cache.cache_dir)) == 2
+
+
+def test_runner_skips_cached(tmp_path, capsys):
+    _init_repo(tmp_path)
+    os.chdir(tmp_path)
+    for _ in range(2):
+        runner = CheckStepRunner(
+            steps=[CountingStep(project_dir=str(tmp_path))],
+            console=ReciteConsole(),
+            cache=ResultCache(project_dir=str(tmp_path)),
+        )
+        assert runner.run_steps()
+    assert CountingStep.run_count == 1
+    assert "(cached)" in capsys.readouterr().out
+    RepoSession.close_all()
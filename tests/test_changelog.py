@@ -0,0 +1,92 @@
+import io
+
+import pytest
+
+from recite.changelog import find_release_section
+
+MARKDOWN = """# Changelog
+
+Some intro.
+
+## Unreleased
+
+## [0.2.3] - 2023-04-01
+
+### Added
+
+- New feature
+
+## [0.2.2] - 2023-03-27
+
+### Fixed
+
+- Old fix
+"""
+
+RST = """Changelog
+=========
+
+Unreleased
+----------
+
+Added
+~~~~~
+
+- New feature
+
+0.2.2
+-----
+
+- Old fix
+"""
+
+
+def _lines(text):
+    return io.StringIO(text)
+
+
+def test_markdown_version_entry():
+    section = find_release_section(_lines(MARKDOWN), "0.2.3")
+    assert section is not None
+    assert section.title == "[0.2.3] - 2023-04-01"
+    assert section.line_number == 7
+    assert section.text == "### Added\n\n- New feature"
+
+
+def test_markdown_no_entry():
+    assert find_release_section(_lines(MARKDOWN), "0.3.0") is None
+
+
+def test_markdown_unreleased_entry():
+    text = MARKDOWN.replace("## [0.2.3] - 2023-04-01\n", "")
+    section = find_release_section(_lines(text), "0.3.0")
+    assert section is not None
+    assert section.title == "Unreleased"
+    assert "- New feature" in section.text
+    assert "Old fix" not in section.text
+
+
+def test_rst_unreleased_entry():
+    section = find_release_section(_lines(RST), "0.2.3")
+    assert section is not None
+    assert section.title == "Unreleased"
+    assert section.text.splitlines() == ["Added", "~~~~~", "", "- New feature"]
+
+
+@pytest.mark.parametrize("version", ["0.2.2", "v0.2.2"])
+def test_stops_at_older_release(version):
+    text = "## Unreleased\n\n## 0.2.3\n\n- entry\n"
+    # 0.2.3 is newer than the searched version, everything below is ignored
+    assert find_release_section(_lines(text), version) is None
+
+
+def test_stops_reading():
+    def lines():
+        yield "## Unreleased\n"
+        yield "- entry\n"
+        yield "## 0.1.0\n"
+        raise AssertionError("read past the release section")
+
+    section = find_release_section(lines(), "0.2.0")
+    assert section is not None
+    assert section.text == "- entry"
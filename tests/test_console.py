@@ -1,8 +1,12 @@
 # smoketests for console
+import time
+
 import pytest
 
 from recite.console import ReciteConsole
 
+from .mocks import MockStep
+
 
 @pytest.mark.parametrize(
     "message, color, glyph, number_str, number, indent_count, indent_char",
@@ -32,3 +36,23 @@ def test_console(message, color, glyph, number_str, number, indent_count, indent
     console.print_success(message=message, number=number)
     console.print_failure(message=message, number=number)
     console.print_error(message=message, indent_count=indent_count)
+
+
+def test_plain_output(capsys):
+    console = ReciteConsole(force_terminal=False)
+    console.print_multiple_messages(messages=["[bold]first[/bold]", "second"])
+    assert capsys.readouterr().out == "recite > first\nrecite > second\n"
+
+
+def test_live_status(capsys):
+    console = ReciteConsole(force_terminal=True, refresh_per_second=100)
+    step = MockStep(description="Running slowly")
+    with console.live_status():
+        console.step_started(step)
+        console.print_message(message="written while running")
+        time.sleep(0.05)
+        out = capsys.readouterr().out
+        assert "Running slowly" in out
+        assert "written while running" in out
+        console.step_finished(step)
+    assert console._running == {}
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from recite.console import ReciteConsole
+from recite.context import ProjectContext
+from recite.runner import PerformReleaseRunner
+from recite.step import BumpVersionStep
+
+from .utils import create_file, create_versioned_pyproject_toml
+
+
+def test_context(tmp_path):
+    create_versioned_pyproject_toml(tmp_path, "0.1.0")
+    context = ProjectContext(project_dir=str(tmp_path))
+    assert context.pyproject["tool"]["poetry"]["name"] == "test"
+    assert context.current_version == "0.1.0"
+    assert context.changelog_path is None
+
+    create_file(tmp_path, "CHANGELOG.md", "Changes")
+    create_versioned_pyproject_toml(tmp_path, "0.2.0")
+    # cached until invalidated
+    assert context.changelog_path is None
+    assert context.current_version == "0.1.0"
+    context.invalidate()
+    assert context.changelog_path == str(tmp_path / "CHANGELOG.md")
+    assert context.current_version == "0.2.0"
+
+
+def test_pep621_version(tmp_path):
+    create_file(tmp_path, "pyproject.toml", '[project]\nversion = "1.0.0"\n')
+    assert ProjectContext(project_dir=str(tmp_path)).current_version == "1.0.0"
+
+
+def test_runner_invalidates_context(tmp_path, mocker):
+    mocker.patch("typer.confirm", return_value=True)
+    create_versioned_pyproject_toml(tmp_path, "0.1.0")
+    context = ProjectContext(project_dir=str(tmp_path))
+    assert context.current_version == "0.1.0"
+    runner = PerformReleaseRunner(
+        steps=[BumpVersionStep(bump_rule="minor")],
+        console=ReciteConsole(),
+        context=context,
+    )
+    assert runner.run_steps()
+    assert context.current_version == "0.2.0"
+
+
+def test_prefetch(tmp_path):
+    context = ProjectContext(project_dir=str(tmp_path))
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(timeout=5)
+        return "fetched"
+
+    context.prefetch("remote", slow)
+    # started only once
+    context.prefetch("remote", lambda: "fetched again")
+    assert started.wait(timeout=5)
+    release.set()
+    assert context.prefetched("remote", lambda: "computed") == "fetched"
+    # a result is only used once
+    assert context.prefetched("remote", lambda: "computed") == "computed"
+
+    def failing():
+        raise ValueError("unreachable")
+
+    context.prefetch("failing", failing)
+    with pytest.raises(ValueError, match="unreachable"):
+        context.prefetched("failing", lambda: "computed")
@@ -0,0 +1,100 @@
+import os
+from typing import List, cast
+from unittest import mock
+
+import pytest
+from click.exceptions import Exit
+from git import Actor, Repo
+
+from recite.console import ReciteConsole
+from recite.context import ProjectContext
+from recite.journal import ReleaseJournal
+from recite.runner import PerformReleaseRunner
+from recite.session import RepoSession
+from recite.step import BumpVersionStep, Result, Step
+
+from .mocks import MockStep
+from .utils import create_versioned_pyproject_toml
+
+
+class FailingOnceMockStep(MockStep):
+    failures = 1
+
+    def run(self):
+        self.was_run = True
+        if FailingOnceMockStep.failures > 0:
+            FailingOnceMockStep.failures -= 1
+            return Result(success=False, messages=["network is down"])
+        return Result(success=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = Repo.init(tmp_path, initial_branch="main")
+    create_versioned_pyproject_toml(tmp_path, "0.1.0")
+    repo.index.add(["pyproject.toml"])
+    actor = Actor("test", "test@example.com")
+    repo.index.commit("first", author=actor, committer=actor)
+    os.chdir(tmp_path)
+    yield repo
+    RepoSession.close_all()
+
+
+def _release(project_dir, resume: bool = False):
+    context = ProjectContext(project_dir=project_dir)
+    context.release_notes = "Fixed everything"
+    journal = ReleaseJournal(project_dir=project_dir)
+    if resume:
+        assert journal.load()
+        # the checks are not run again
+        context.release_notes = None
+    # the mocks only implement what the runner uses of a step
+    steps = cast(
+        List[Step],
+        [
+            BumpVersionStep(bump_rule="patch"),
+            FailingOnceMockStep(short_name="push", depends_on=("bumpversion",)),
+            MockStep(short_name="remind", depends_on=("push",)),
+        ],
+    )
+    runner = PerformReleaseRunner(
+        steps=steps, console=ReciteConsole(), context=context, journal=journal
+    )
+    return runner, steps
+
+
+@mock.patch("typer.confirm", return_value=True)
+def test_resume(mocked, repo, capsys):
+    FailingOnceMockStep.failures = 1
+    runner, steps = _release(str(repo.working_tree_dir))
+    assert not runner.run_steps()
+    assert not steps[2].was_run
+    assert os.path.isfile(runner.journal.path)
+
+    runner, steps = _release(str(repo.working_tree_dir), resume=True)
+    assert runner.run_steps()
+    # the version is only bumped once
+    assert steps[0].project_context.current_version == "0.1.1"
+    assert "Bump version to 0.1.1 (done)" in capsys.readouterr().out
+    assert steps[1].was_run and steps[2].was_run
+    assert steps[0].project_context.release_notes == "Fixed everything"
+    # a finished release can not be resumed
+    assert not os.path.isfile(runner.journal.path)
+
+
+@mock.patch("typer.confirm", return_value=True)
+def test_resume_verifies_state(mocked, repo, capsys):
+    FailingOnceMockStep.failures = 1
+    runner, _ = _release(str(repo.working_tree_dir))
+    assert not runner.run_steps()
+    actor = Actor("test", "test@example.com")
+    repo.index.commit("unrelated", author=actor, committer=actor)
+
+    runner, steps = _release(str(repo.working_tree_dir), resume=True)
+    steps[0].bump_rule = "minor"
+    with pytest.raises(Exit):
+        runner.run_steps()
+    out = capsys.readouterr().out
+    assert "Options of bumpversion changed" in out
+    assert "HEAD moved" in out
+    assert not steps[1].was_run
@@ -1,10 +1,13 @@
 import os
+import subprocess
+import sys
 from unittest import mock
 
 import pytest
 from typer.testing import CliRunner
 
-from recite.main import app
+from recite.main import _release_steps, app
+from recite.step import PoetryPublishStep
 
 from .mocks import MockStep, mock_run
 
@@ -24,6 +27,20 @@ def test_list_checks(tmpdir):
     assert "Available Checks" in result.stdout
 
 
+def test_lazy_imports(tmpdir):
+    # commands, that do not touch a repository, should not pay for gitpython
+    statement = "; ".join(
+        [
+            "import sys",
+            "from typer.testing import CliRunner",
+            "from recite.main import app",
+            "assert CliRunner().invoke(app, ['list-checks']).exit_code == 0",
+            "assert 'git' not in sys.modules",
+        ]
+    )
+    subprocess.run([sys.executable, "-c", statement], cwd=tmpdir, check=True)
+
+
 def test_main_fail(tmpdir):
     os.chdir(tmpdir)
     result = runner.invoke(app, ["release", "patch"])
@@ -31,20 +48,74 @@ def test_main_fail(tmpdir):
     assert result.exit_code == 1
 
 
+def test_nothing_to_resume(tmpdir):
+    os.chdir(tmpdir)
+    result = runner.invoke(app, ["release", "patch", "--resume"])
+    assert "There is no failed release to resume" in result.stdout
+    assert result.exit_code == 1
+
+
+@pytest.mark.parametrize("spec", ["runtests", "runtests=soon", "=10", "runtests=0"])
+def test_invalid_timeout(tmpdir, spec):
+    os.chdir(tmpdir)
+    result = runner.invoke(app, ["release", "patch", "--timeout", spec])
+    assert result.exit_code == 2
+    assert "Expected 'name=seconds'" in result.output
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--publisher", "twine"],
+        ["--publisher", "poetry", "--repository", "testpypi"],
+        ["--publisher", "poetry", "--skip-existing"],
+    ],
+)
+def test_invalid_publisher(tmpdir, args):
+    os.chdir(tmpdir)
+    result = runner.invoke(app, ["release", "patch", *args])
+    assert result.exit_code == 2
+
+
+@pytest.mark.parametrize("release_type", ["patch", "initial"])
+def test_poetry_publisher(release_type):
+    steps = _release_steps(
+        release_type=release_type,
+        remote="origin",
+        commit_message="Bumped version",
+        git_tag_prefix="v",
+        publisher="poetry",
+    )
+    publish = [step for step in steps if step.short_name == "publish"]
+    assert len(publish) == 1
+    assert isinstance(publish[0], PoetryPublishStep)
+    assert publish[0].depends_on == ("build", "pushtag")
+
+
+def test_unknown_timeout(tmpdir):
+    os.chdir(tmpdir)
+    result = runner.invoke(app, ["release", "patch", "--timeout", "runtests=5"])
+    assert result.exit_code == 1
+    assert "Unknown step(s) to set a timeout for: ['runtests']" in result.output
+
+
 @mock.patch("typer.confirm")
 @pytest.mark.parametrize("release_type", ["patch", "initial"])
 def test_main(mock_typer, release_type, tmpdir, mocker):
     os.chdir(tmpdir)
     mock_typer.return_value = True
+    mocker.patch("recite.main.BuildStep", MockStep)
     mocker.patch("recite.main.BumpVersionStep", MockStep)
     mocker.patch("recite.main.CheckChangelogStep", MockStep)
+    mocker.patch("recite.main.CheckChangelogEntryStep", MockStep)
     mocker.patch("recite.main.CheckCleanGitStep", MockStep)
     mocker.patch("recite.main.CheckOnMainStep", MockStep)
     mocker.patch("recite.main.CheckPyProjectStep", MockStep)
+    mocker.patch("recite.main.CheckTagAvailableStep", MockStep)
     mocker.patch("recite.main.CommitVersionBumpStep", MockStep)
     mocker.patch("recite.main.GithubReleaseReminderStep", MockStep)
     mocker.patch("recite.main.GitTagStep", MockStep)
-    mocker.patch("recite.main.PoetryPublishStep", MockStep)
+    mocker.patch("recite.main.PublishStep", MockStep)
     mocker.patch("recite.main.PushTagStep", MockStep)
     mocker.patch("recite.main.RunTestsStep", MockStep)
     result = runner.invoke(app, ["release", release_type])
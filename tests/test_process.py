@@ -0,0 +1,85 @@
+import sys
+import threading
+import time
+
+from recite.process import (
+    _running,
+    cancel_all,
+    cancelled,
+    reset_cancel,
+    run_process,
+    terminate_all,
+)
+
+
+def test_run_process(tmp_path):
+    log_path = str(tmp_path / "step.log")
+    lines = []
+    res = run_process(
+        [
+            sys.executable,
+            "-c",
+            "import sys\nfor i in range(1000): print(i)\nsys.exit('failed')",
+        ],
+        log_path=log_path,
+        echo=lines.append,
+        tail_lines=3,
+    )
+    assert res.returncode == 1
+    # stderr is captured as well
+    assert res.tail == ["998", "999", "failed"]
+    assert len(lines) == 1001
+    with open(log_path) as f:
+        assert len(f.readlines()) == 1001
+
+
+def test_missing_command():
+    res = run_process(["recite-this-command-does-not-exist"])
+    assert res.returncode == 127
+    assert res.output.startswith("Command not found")
+
+
+# the child spawns a grandchild, which has to be terminated as well
+SLEEPING = (
+    "import subprocess, sys, time\n"
+    "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+    "print('started', flush=True)\n"
+    "time.sleep(60)"
+)
+
+
+def test_timeout():
+    start = time.perf_counter()
+    res = run_process([sys.executable, "-c", SLEEPING], timeout=0.5)
+    assert time.perf_counter() - start < 10
+    assert res.timed_out
+    assert res.returncode != 0
+    assert res.tail == ["started", "Terminated after 0.5s"]
+
+
+def test_terminate_all():
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(run_process([sys.executable, "-c", SLEEPING]))
+    )
+    thread.start()
+    while not _running:
+        time.sleep(0.01)
+    assert terminate_all(grace=1) == 1
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert results[0].returncode != 0
+    assert not results[0].timed_out
+
+
+def test_cancel_all(tmp_path):
+    cancel_all()
+    try:
+        assert cancelled()
+        res = run_process([sys.executable, "-c", "open('started', 'w')"], cwd=tmp_path)
+        assert res.returncode != 0
+        assert res.tail == ["Cancelled"]
+        assert not (tmp_path / "started").exists()
+    finally:
+        reset_cancel()
+    assert run_process([sys.executable, "-c", "pass"]).returncode == 0
@@ -0,0 +1,38 @@
+import json
+import subprocess
+import sys
+
+from recite.console import ReciteConsole
+from recite.profiling import StepProfiler
+from recite.runner import CheckStepRunner
+from recite.step import Result
+
+from .mocks import MockStep
+
+
+class SubprocessStep(MockStep):
+    def run(self):
+        subprocess.run([sys.executable, "-c", "x = bytearray(50 * 1024 * 1024)"])
+        return Result(success=True)
+
+
+def test_profiler(tmp_path):
+    profiler = StepProfiler(project_dir=str(tmp_path))
+    runner = CheckStepRunner(
+        steps=[MockStep(short_name="fast"), SubprocessStep(short_name="slow")],
+        console=ReciteConsole(),
+        concurrent=True,
+        hooks=[profiler],
+    )
+    assert runner.run_steps()
+    assert [p.short_name for p in profiler.profiles] == ["fast", "slow"]
+    slow = profiler.profiles[1]
+    assert slow.children_cpu > 0
+    assert slow.children_max_rss_kib is None or slow.children_max_rss_kib > 50 * 1024
+    assert profiler.summary()[0].split()[1] == "slow"
+
+    with open(profiler.write_trace()) as f:
+        trace = json.load(f)
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [span["name"] for span in spans] == ["fast", "slow"]
+    assert spans[1]["dur"] >= spans[0]["dur"]
@@ -0,0 +1,182 @@
+import base64
+import io
+import tarfile
+import threading
+import time
+import zipfile
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from recite.publish import Publisher, Repository, parse_repository, summarize
+from recite.step import PublishStep
+
+METADATA = """Metadata-Version: 2.1
+Name: test
+Version: 0.1.0
+Summary: A test
+Classifier: Programming Language :: Python :: 3
+Classifier: Topic :: Software Development
+
+Long description
+"""
+
+
+class IndexHandler(BaseHTTPRequestHandler):
+    # keep-alive needs HTTP/1.1
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.startswith("/slow"):
+            time.sleep(2)
+        message = BytesParser().parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        fields = {}
+        for part in message.get_payload():
+            name = part.get_param("name", header="content-disposition")
+            fields.setdefault(name, []).append(
+                part.get_filename() or part.get_payload(decode=True).decode()
+            )
+        server = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+            key = (self.path, fields["content"][0])
+            server.attempts[key] = server.attempts.get(key, 0) + 1
+            flaky = self.path.startswith("/flaky") and server.attempts[key] == 1
+            if not flaky:
+                server.uploads.append(
+                    (self.path, fields, self.headers["Authorization"])
+                )
+        if self.path.startswith("/existing"):
+            # what PyPI responds, if a different file with the name was uploaded
+            self.send_response(400, "File already exists. See https://pypi.org/help")
+        else:
+            self.send_response(503 if flaky else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def index_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), IndexHandler)
+    server.lock = threading.Lock()
+    server.uploads = []
+    server.attempts = {}
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    wheel = tmp_path / "test-0.1.0-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w") as whl:
+        whl.writestr("test/__init__.py", "")
+        whl.writestr("test-0.1.0.dist-info/METADATA", METADATA)
+    sdist = tmp_path / "test-0.1.0.tar.gz"
+    with tarfile.open(sdist, "w:gz") as tar:
+        info = tarfile.TarInfo("test-0.1.0/PKG-INFO")
+        info.size = len(METADATA)
+        tar.addfile(info, io.BytesIO(METADATA.encode()))
+    return [str(wheel), str(sdist)]
+
+
+def test_parse_repository():
+    assert parse_repository("pypi").url == "https://upload.pypi.org/legacy/"
+    assert parse_repository("internal=http://localhost/simple").name == "internal"
+    with pytest.raises(ValueError):
+        parse_repository("unknown")
+    with pytest.raises(ValueError):
+        parse_repository("internal=ftp://localhost")
+
+
+def test_publisher(index_server, artifacts):
+    url = f"http://127.0.0.1:{index_server.server_port}"
+    repositories = [
+        Repository(name="first", url=f"{url}/first/", password="secret"),
+        Repository(name="flaky", url=f"{url}/flaky/", password="secret"),
+    ]
+    results = Publisher(repositories=repositories, max_workers=1, backoff=0).publish(
+        artifacts
+    )
+    assert all(result.success for result in results)
+    assert sorted((r.repository, r.attempts) for r in results) == [
+        ("first", 1),
+        ("first", 1),
+        ("flaky", 2),
+        ("flaky", 2),
+    ]
+    assert len(index_server.uploads) == 4
+    path, fields, auth = index_server.uploads[0]
+    assert fields["name"] == ["test"]
+    assert fields["version"] == ["0.1.0"]
+    assert len(fields["classifiers"]) == 2
+    assert fields["description"] == ["Long description\n"]
+    assert auth == "Basic " + base64.b64encode(b"__token__:secret").decode()
+    filetypes = sorted(fields["filetype"][0] for _, fields, _ in index_server.uploads)
+    assert filetypes == ["bdist_wheel", "bdist_wheel", "sdist", "sdist"]
+    # one worker per index reuses its connection, the retry needs a new one
+    assert len(index_server.connections) <= 3
+    assert [line.split(":")[0] for line in summarize(results)] == ["first", "flaky"]
+
+
+def test_publisher_gives_up(index_server, artifacts):
+    url = f"http://127.0.0.1:{index_server.server_port}/flaky/"
+    results = Publisher(
+        repositories=[Repository(name="flaky", url=url)], retries=0, backoff=0
+    ).publish(artifacts)
+    assert not any(result.success for result in results)
+    assert results[0].message == "503 Service Unavailable"
+
+
+def test_publish_step(index_server, artifacts, monkeypatch):
+    monkeypatch.setenv("LOCAL_TOKEN", "secret")
+    url = f"http://127.0.0.1:{index_server.server_port}/local/"
+    step = PublishStep(repositories=(f"local={url}",))
+    assert not step.run().success
+    step.project_context.artifacts = artifacts
+    result = step.run()
+    assert result.success
+    assert result.messages[0].startswith("local: 2/2 files")
+
+
+@pytest.mark.parametrize("skip_existing", [False, True])
+def test_publisher_existing_file(index_server, artifacts, skip_existing):
+    url = f"http://127.0.0.1:{index_server.server_port}/existing/"
+    results = Publisher(
+        repositories=[Repository(name="existing", url=url)],
+        backoff=0,
+        skip_existing=skip_existing,
+    ).publish(artifacts)
+    assert all(result.success == skip_existing for result in results)
+    # not worth another try
+    assert all(result.attempts == 1 for result in results)
+    if skip_existing:
+        assert results[0].message == "skipped, already exists"
+    else:
+        assert results[0].message.endswith(
+            "a different file with this name already exists"
+        )
+
+
+def test_publisher_deadline(index_server, artifacts):
+    url = f"http://127.0.0.1:{index_server.server_port}/slow/"
+    start = time.perf_counter()
+    results = Publisher(
+        repositories=[Repository(name="slow", url=url)],
+        max_workers=1,
+        backoff=0,
+        deadline=0.5,
+    ).publish(artifacts)
+    assert time.perf_counter() - start < 1.5
+    assert not any(result.success for result in results)
+    assert [result.message for result in results] == ["Timed out after 0.5s"] * 2
@@ -1,4 +1,7 @@
 import os
+import sys
+import threading
+import time
 from dataclasses import dataclass
 from unittest import mock
 
@@ -6,7 +9,14 @@ import click
 import pytest
 
 from recite.console import ReciteConsole
-from recite.runner import CheckStepRunner, PerformReleaseRunner
+from recite.runner import (
+    CheckStepRunner,
+    PerformReleaseRunner,
+    StepHook,
+    critical_path,
+    topological_waves,
+    validate_order,
+)
 from recite.step import (
     BumpVersionStep,
     CommitVersionBumpStep,
@@ -14,6 +24,7 @@ from recite.step import (
     GitTagStep,
     PushTagStep,
     Result,
+    Step,
     VersionBump,
 )
 
@@ -43,12 +54,27 @@ class MockBumpVersionStep(BumpVersionStep):
 @mock.patch("typer.confirm", return_value=True)
 @pytest.mark.parametrize("successes", [([True, True]), ([False])])
 @pytest.mark.parametrize("runner_cls", [CheckStepRunner, PerformReleaseRunner])
-def test_runner(mocked, successes, runner_cls):
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_runner(mocked, successes, runner_cls, concurrent):
     steps = [MockBumpVersionStep(success=s) for s in successes]
-    runner = runner_cls(steps=steps, console=ReciteConsole())
+    runner = runner_cls(steps=steps, console=ReciteConsole(), concurrent=concurrent)
     assert all(successes) == runner.run_steps()
 
 
+def test_concurrent_runner_reports_in_order(capsys):
+    steps = [
+        MockBumpVersionStep(short_name="first", description="first", success=True),
+        MockBumpVersionStep(short_name="second", description="second", success=False),
+        MockBumpVersionStep(short_name="third", description="third", success=False),
+    ]
+    runner = CheckStepRunner(steps=steps, console=ReciteConsole(), concurrent=True)
+    assert not runner.run_steps()
+    out = capsys.readouterr().out
+    assert out.index("1: ✓ first") < out.index("2: ✘ second")
+    # reporting stops at the first failure, like in serial mode
+    assert "third" not in out
+
+
 @mock.patch("typer.confirm", return_value=False)
 def test_release_runner_no_confirm(mocked):
     runner = PerformReleaseRunner(
@@ -108,3 +134,166 @@ def test_skipped_checks(skip, expected, mock_step_list):
         assert not res
     else:
         assert expected == [step.short_name for step in runner.steps if step.was_run]
+
+
+@pytest.fixture
+def dependent_step_list():
+    return [
+        MockStep(short_name="bump"),
+        MockStep(short_name="commit", depends_on=("bump",)),
+        MockStep(short_name="tag", depends_on=("commit",)),
+        MockStep(short_name="build", depends_on=("commit",)),
+        MockStep(short_name="remind", depends_on=("tag", "build", "unknown")),
+    ]
+
+
+def test_topological_waves(dependent_step_list):
+    assert topological_waves(dependent_step_list) == [[0], [1], [2, 3], [4]]
+
+
+def test_validate_order(dependent_step_list):
+    validate_order(dependent_step_list)
+    with pytest.raises(ValueError, match="later"):
+        validate_order(dependent_step_list[::-1])
+
+
+@mock.patch("typer.confirm", return_value=True)
+def test_serial_runner_keeps_order(mocked):
+    steps = [
+        MockStep(short_name="tag"),
+        MockStep(short_name="pushtag", depends_on=("tag",)),
+        MockStep(short_name="build"),
+    ]
+    order = []
+
+    class OrderHook(StepHook):
+        def before_step(self, step):
+            order.append(step.short_name)
+
+    runner = PerformReleaseRunner(
+        steps=steps, console=ReciteConsole(), hooks=[OrderHook()]
+    )
+    assert runner.run_steps()
+    assert order == ["tag", "pushtag", "build"]
+
+
+def test_topological_waves_cycle():
+    steps = [
+        MockStep(short_name="first", depends_on=("second",)),
+        MockStep(short_name="second", depends_on=("first",)),
+    ]
+    with pytest.raises(ValueError):
+        topological_waves(steps)
+
+
+def test_critical_path(dependent_step_list):
+    durations = {0: 1.0, 1: 1.0, 2: 1.0, 3: 5.0, 4: 1.0}
+    path, total = critical_path(dependent_step_list, durations)
+    assert path == [0, 1, 3, 4]
+    assert total == 8.0
+
+
+@mock.patch("typer.confirm", return_value=True)
+def test_concurrent_dependent_runner(mocked, dependent_step_list, capsys):
+    runner = PerformReleaseRunner(
+        steps=dependent_step_list, console=ReciteConsole(), concurrent=True
+    )
+    assert runner.run_steps()
+    assert all(step.was_run for step in dependent_step_list)
+    assert "Critical path: bump → commit" in capsys.readouterr().out
+
+
+class SlowMockStep(MockStep):
+    def __init__(self, seconds: float, **kwargs):
+        super().__init__(**kwargs)
+        self.seconds = seconds
+        self.finished = threading.Event()
+
+    def run(self):
+        time.sleep(self.seconds)
+        self.finished.set()
+        return Result(success=True)
+
+
+class FailingMockStep(MockStep):
+    def run(self):
+        return Result(success=False, messages=["broken"])
+
+
+class SlowFailingMockStep(MockStep):
+    def run(self):
+        time.sleep(0.2)
+        return Result(success=False, messages=["broken"])
+
+
+@dataclass(kw_only=True)
+class SleepingStep(Step):
+    short_name: str = "sleeping"
+    description: str = "sleeping"
+
+    def run(self) -> Result:
+        self.run_process([sys.executable, "-c", "import time; time.sleep(60)"])
+        return Result(success=True)
+
+
+def test_concurrent_runner_fails_fast(tmp_path, capsys):
+    sleeping = SleepingStep(project_dir=str(tmp_path))
+    steps = [sleeping, FailingMockStep(short_name="failing", description="failing")]
+    runner = CheckStepRunner(steps=steps, console=ReciteConsole(), concurrent=True)
+    start = time.perf_counter()
+    assert not runner.run_steps()
+    assert time.perf_counter() - start < 10
+    out = capsys.readouterr().out
+    # its process was terminated, so the step did not fail on its own
+    assert out.index("Cancelled sleeping") < out.index("2: ✘ failing")
+
+
+def test_concurrent_runner_reports_first_failure(capsys):
+    # fails after the later step, but comes first in numbered order
+    slow = SlowFailingMockStep(short_name="slow", description="slow")
+    steps = [slow, FailingMockStep(short_name="failing", description="failing")]
+    runner = CheckStepRunner(steps=steps, console=ReciteConsole(), concurrent=True)
+    assert not runner.run_steps()
+    out = capsys.readouterr().out
+    assert "1: ✘ slow" in out
+    assert "failing" not in out and "Cancelled" not in out
+
+
+def test_concurrent_runner_abandons_steps(capsys):
+    slow = SlowMockStep(5, short_name="slow", description="slow")
+    steps = [slow, FailingMockStep(short_name="failing", description="failing")]
+    runner = CheckStepRunner(steps=steps, console=ReciteConsole(), concurrent=True)
+    start = time.perf_counter()
+    assert not runner.run_steps()
+    assert time.perf_counter() - start < 4
+    assert not slow.finished.is_set()
+    out = capsys.readouterr().out
+    assert out.index("Abandoned slow") < out.index("2: ✘ failing")
+
+
+def test_concurrent_runner_timeout(capsys):
+    steps = [SlowMockStep(2, short_name="slow", description="slow")]
+    runner = CheckStepRunner(
+        steps=steps, console=ReciteConsole(), concurrent=True, timeouts={"slow": 0.1}
+    )
+    start = time.perf_counter()
+    assert not runner.run_steps()
+    assert time.perf_counter() - start < 1
+    assert "Timed out after 0.1s" in capsys.readouterr().out
+
+
+def test_concurrent_runner_timeout_waiting_for_worker():
+    # the quick step only starts after the slow one freed the single worker
+    steps = [
+        SlowMockStep(0.5, short_name="slow", description="slow"),
+        MockStep(short_name="quick", description="quick"),
+    ]
+    runner = CheckStepRunner(
+        steps=steps,
+        console=ReciteConsole(),
+        concurrent=True,
+        max_workers=1,
+        timeouts={"quick": 0.3},
+    )
+    assert runner.run_steps()
+    assert steps[1].was_run
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+from git import Actor, Repo
+
+from recite.process import ProcessCancelled, cancel_all, reset_cancel
+from recite.session import RepoSession
+
+from .utils import create_file
+
+
+def _commit(repo: Repo, message: str):
+    actor = Actor("test", "test@example.com")
+    repo.index.commit(message, author=actor, committer=actor)
+
+
+def test_session_caches_facts(tmp_path):
+    repo = Repo.init(tmp_path, initial_branch="main")
+    create_file(tmp_path, "file.txt", "content")
+    repo.index.add(["file.txt"])
+    _commit(repo, "first")
+    session = RepoSession.for_dir(str(tmp_path))
+    assert session is RepoSession.for_dir(str(tmp_path))
+    assert session.active_branch == "main"
+    first_sha = session.head_sha
+    assert session.tag_index("v").find("0.1.0") is None
+
+    repo.create_tag("v0.1.0")
+    _commit(repo, "second")
+    # facts are cached until invalidated
+    assert session.head_sha == first_sha
+    assert session.tag_index("v").find("0.1.0") is None
+    session.invalidate()
+    assert session.head_sha != first_sha
+    assert session.tag_index("v").find("0.1.0").name == "v0.1.0"
+
+    RepoSession.close_all()
+    assert session is not RepoSession.for_dir(str(tmp_path))
+    RepoSession.close_all()
+
+
+def test_remote_git_cancelled(tmp_path):
+    Repo.init(tmp_path, initial_branch="main").close()
+    session = RepoSession(project_dir=str(tmp_path))
+    errors = []
+
+    def list_tags():
+        # a remote, that never answers
+        with pytest.raises(ProcessCancelled) as e:
+            session.remote_git(
+                "-c", "protocol.ext.allow=always", "ls-remote", "ext::sleep 60"
+            )
+        errors.append(e.value)
+
+    thread = threading.Thread(target=list_tags)
+    thread.start()
+    time.sleep(0.5)
+    start = time.perf_counter()
+    try:
+        cancel_all()
+        thread.join(timeout=10)
+    finally:
+        reset_cancel()
+        session.close()
+    assert time.perf_counter() - start < 5
+    assert len(errors) == 1
@@ -0,0 +1,81 @@
+import io
+import pathlib
+
+import pytest
+from git import Actor, Repo
+
+from recite.session import RepoSession
+from recite.status import parse_status, scan_worktree, split_records
+from recite.step import CheckCleanGitStep
+
+from .utils import create_file
+
+
+def test_split_records():
+    stream = io.BytesIO(b"first\0second record\0third")
+    assert list(split_records(stream, chunk_size=4)) == [
+        b"first",
+        b"second record",
+        b"third",
+    ]
+
+
+def test_parse_status_stops_at_first_change():
+    records = iter(
+        [
+            b"? untracked file.txt",
+            b"1 .M N... 100644 100644 100644 abc abc changed.txt",
+        ]
+    )
+    status = parse_status(records)
+    assert status.first_change == "untracked file.txt"
+    # the rest is not read
+    assert next(records).endswith(b"changed.txt")
+
+
+@pytest.fixture
+def clone(tmp_path):
+    origin = Repo.init(tmp_path / "origin", initial_branch="main")
+    create_file(tmp_path / "origin", "file.txt", "content")
+    origin.index.add(["file.txt"])
+    actor = Actor("test", "test@example.com")
+    origin.index.commit("first", author=actor, committer=actor)
+    clone = origin.clone(tmp_path / "clone")
+    yield clone
+    clone.close()
+    origin.close()
+
+
+def test_scan_worktree(clone):
+    assert scan_worktree(clone).clean
+
+    create_file(pathlib.Path(clone.working_tree_dir), "new file.txt", "content")
+    assert scan_worktree(clone).first_change == "new file.txt"
+    assert scan_worktree(clone, allow_untracked_files=True).clean
+
+    create_file(pathlib.Path(clone.working_tree_dir), "file.txt", "changed")
+    assert scan_worktree(clone, allow_untracked_files=True).first_change == "file.txt"
+
+    clone.index.add(["file.txt"])
+    actor = Actor("test", "test@example.com")
+    clone.index.commit("second", author=actor, committer=actor)
+    assert scan_worktree(clone, allow_untracked_files=True).clean
+
+
+@pytest.mark.parametrize("ls_remote", [False, True])
+def test_check_clean_git_prefetched(clone, ls_remote):
+    step = CheckCleanGitStep(project_dir=clone.working_tree_dir, ls_remote=ls_remote)
+    step.prefetch()
+    assert step.run().success
+    # the prefetched result was awaited
+    assert step.project_context._prefetched == {}
+
+    origin = Repo(clone.remotes.origin.url)
+    actor = Actor("test", "test@example.com")
+    origin.index.commit("remote only", author=actor, committer=actor)
+    origin.close()
+    step.prefetch()
+    result = step.run()
+    assert not result.success
+    assert result.messages == ["Local and remote not synced!"]
+    RepoSession.close_all()
@@ -1,27 +1,41 @@
 import os
-from collections import namedtuple
+import time
 from unittest import mock
 
 import pytest
 import toml
-from git import Repo
+from git import Actor, Repo
 
+from recite.process import ProcessCancelled, cancel_all, reset_cancel
+from recite.session import RepoSession
 from recite.step import (
+    BuildStep,
     BumpVersionStep,
+    CheckChangelogEntryStep,
     CheckChangelogStep,
     CheckCleanGitStep,
     CheckOnMainStep,
     CheckPyProjectStep,
+    CheckTagAvailableStep,
     CommitVersionBumpStep,
     GithubReleaseReminderStep,
     GitTagStep,
     PoetryPublishStep,
+    PushTagStep,
     Result,
     RunTestsStep,
+    SessionResult,
     VersionBump,
 )
 
-from .mocks import MockBranch, MockGit, MockRepo, mock_run, mock_subprocess_run
+from .mocks import (
+    MockBranch,
+    MockBuildProcess,
+    MockGit,
+    MockProcess,
+    MockRepo,
+    mock_run,
+)
 from .utils import create_file, create_versioned_pyproject_toml
 
 
@@ -58,24 +72,116 @@ def test_check_on_main(branch_name, e_success, tmp_path):
         (False, True, False),
     ],
 )
-def test_check_git_dirty(is_dirty, unsynced, e_success, tmp_path):
-    step = CheckCleanGitStep(project_dir=tmp_path)
-    repo = MockRepo(dirty=is_dirty)
-    git = MockGit(unsynced=unsynced)
+@pytest.mark.parametrize("ls_remote", [False, True])
+def test_check_git_dirty(is_dirty, unsynced, e_success, ls_remote, tmp_path):
+    step = CheckCleanGitStep(
+        project_dir=tmp_path, remote="upstream", ls_remote=ls_remote
+    )
+    repo = MockRepo(active_branch=MockBranch(name="main"))
+    git = MockGit(dirty=is_dirty, unsynced=unsynced)
     assert step.run(repo=repo, git=git).success == e_success
+    if is_dirty or ls_remote:
+        # nothing is downloaded
+        assert git.fetches == []
+    else:
+        # only the current branch is fetched
+        assert git.fetches == [
+            ("--no-tags", "upstream", "+refs/heads/main:refs/remotes/upstream/main")
+        ]
+
+
+@mock.patch("recite.step.GitStep.run", mock_run)
+def test_check_git_upstream(tmp_path):
+    step = CheckCleanGitStep(project_dir=tmp_path)
+    # the local branch tracks a remote branch of another name
+    repo = MockRepo(
+        active_branch=MockBranch(name="main"),
+        config={('branch "main"', "merge"): "refs/heads/trunk"},
+    )
+    git = MockGit()
+    assert step.run(repo=repo, git=git).success
+    assert git.fetches == [
+        ("--no-tags", "origin", "+refs/heads/trunk:refs/remotes/origin/trunk")
+    ]
+
+
+@mock.patch("recite.step.GitStep.run", mock_run)
+def test_check_git_detached(tmp_path):
+    step = CheckCleanGitStep(project_dir=tmp_path)
+    result = step.run(repo=MockRepo(), git=MockGit())
+    assert not result.success
+    assert result.messages == ["HEAD is not on a branch"]
+
+
+@pytest.mark.parametrize("e_success", [True, False])
+def test_run_test_suite(e_success, tmp_path, mocker):
+    class NoxProcess(MockProcess):
+        def respond(self, command, cwd):
+            return (0 if e_success else 1), b"nox output\n[tests] failed\n"
+
+    mocker.patch("subprocess.Popen", NoxProcess)
+    step = RunTestsStep(project_dir=str(tmp_path))
+    result = step.run()
+    assert result.success == e_success
+    with open(step.log_path) as f:
+        assert f.read() == "nox output\n[tests] failed\n"
+    if not e_success:
+        assert result.messages[:2] == ["nox output", "\\[tests] failed"]
+
+
+@pytest.mark.parametrize("failing", [[], ["lint"]])
+def test_run_test_suite_parallel(failing, tmp_path, mocker):
+    listing = (
+        "Sessions defined in noxfile.py:\n\n* tests-3.10 -> Run tests\n* lint\n- docs\n"
+    )
+
+    class NoxProcess(MockProcess):
+        def respond(self, command, cwd):
+            if command == ["nox", "--list"]:
+                return 0, listing.encode()
+            session = command[-1]
+            returncode = 1 if session in failing else 0
+            return returncode, f"[{session}] output".encode()
+
+    mocker.patch("subprocess.Popen", NoxProcess)
+    lines = []
+    step = RunTestsStep(workers=2, project_dir=str(tmp_path), echo=lines.append)
+    result = step.run()
+    assert result.success == (len(failing) == 0)
+    assert result.messages[0].startswith("tests-3.10: passed")
+    assert "docs" not in " ".join(result.messages)
+    # the listing of sessions is not shown
+    assert sorted(lines) == ["lint | [lint] output", "tests-3.10 | [tests-3.10] output"]
+    # every session has its own log
+    for session in ["lint", "tests-3.10"]:
+        with open(step.label_log_path(session)) as f:
+            assert f.read() == f"[{session}] output"
+    if failing:
+        assert "lint: failed" in result.messages[1]
+        assert "\\[lint] output" in result.messages
+        assert result.messages[-1].endswith("run_tests-lint.log")
 
 
-@mock.patch("recite.step.subprocess")
-@pytest.mark.parametrize("ret_code, e_success", [(True, True), (False, False)])
-def test_run_test_suite(mock_subproc, ret_code, e_success):
-    def mock_run(*args):
-        # some object that has the right returncode
-        returncode = 0 if e_success else 1
-        return namedtuple("ReturnObject", ["returncode"])(returncode)
+def test_run_test_suite_parallel_cancelled(tmp_path, mocker):
+    started = []
 
-    mock_subproc.run = mock_run
-    step = RunTestsStep()
-    assert step.run().success == e_success
+    def run_session(session):
+        started.append(session)
+        if session == "a":
+            # e.g. a concurrently running check failed
+            cancel_all()
+        time.sleep(0.1)
+        return SessionResult(name=session, returncode=0, seconds=0.1, output="")
+
+    mocker.patch.object(RunTestsStep, "_list_sessions", return_value=list("abcdef"))
+    mocker.patch.object(RunTestsStep, "_run_session", side_effect=run_session)
+    try:
+        with pytest.raises(ProcessCancelled):
+            RunTestsStep(workers=2, project_dir=str(tmp_path)).run()
+    finally:
+        reset_cancel()
+    # at most the session started at the same time ran as well
+    assert started[0] == "a" and len(started) <= 2
 
 
 @mock.patch("recite.step.GitStep.run", mock_run)
@@ -99,10 +205,133 @@ def test_check_changelog(
         create_file(tmp_path, file_name, content)
     os.chdir(tmp_path)
     step = CheckChangelogStep(project_dir=tmp_path)
-    git = MockGit(has_diff=has_diff)
+    git = MockGit(has_diff=has_diff, tags=["v0.1.0", "v0.2.0"])
     assert step.run(git=git).success == e_success
 
 
+@mock.patch("recite.step.GitStep.run", mock_run)
+@pytest.mark.parametrize(
+    "tags, e_success, e_message",
+    [
+        (["v0.2.0"], True, None),
+        # the latest release before the current version
+        (["v0.1.0", "v0.3.0"], True, None),
+        (
+            ["v0.3.0", "0.1.0"],
+            False,
+            "Could not find tag v0.2.0 of the current version or of an earlier one",
+        ),
+    ],
+)
+def test_check_changelog_missing_blob(tags, e_success, e_message, tmp_path):
+    create_versioned_pyproject_toml(tmp_path, "0.2.0")
+    create_file(tmp_path, "CHANGELOG.md", "Changes")
+    os.chdir(tmp_path)
+    step = CheckChangelogStep(project_dir=tmp_path)
+    result = step.run(git=MockGit(missing_blob=True, tags=tags))
+    assert result.success == e_success
+    if e_message is not None:
+        assert result.messages == [e_message]
+
+
+def test_check_changelog_real_repo(tmp_path):
+    create_versioned_pyproject_toml(tmp_path, "0.2.0")
+    create_file(tmp_path, "CHANGELOG.md", "Changes")
+    repo = Repo.init(tmp_path)
+    repo.index.add(["pyproject.toml", "CHANGELOG.md"])
+    actor = Actor("test", "test@example.com")
+    repo.index.commit("first", author=actor, committer=actor)
+    repo.create_tag("v0.2.0")
+    assert not CheckChangelogStep(project_dir=str(tmp_path)).run().success
+    create_file(tmp_path, "CHANGELOG.md", "More changes")
+    assert CheckChangelogStep(project_dir=str(tmp_path)).run().success
+
+
+@mock.patch("recite.step.GitStep.run", mock_run)
+def test_check_changelog_unchanged_message(tmp_path):
+    create_versioned_pyproject_toml(tmp_path, "0.2.0")
+    create_file(tmp_path, "CHANGELOG.md", "Changes")
+    os.chdir(tmp_path)
+    git = MockGit(tags=["v0.2.0"])
+    result = CheckChangelogStep(project_dir=tmp_path).run(git=git)
+    assert not result.success
+    assert result.messages == [
+        "'CHANGELOG.md' is unchanged since tag v0.2.0 (blob aaaaaaaaaaaa)"
+    ]
+
+
+@pytest.mark.parametrize(
+    "content, bump_rule, e_success",
+    [
+        ("## [0.2.1]\n\n- Fix", "patch", True),
+        ("## Unreleased\n\n- Fix\n\n## [0.2.0]\n\n- Old", "minor", True),
+        ("## Unreleased\n\n## [0.2.0]\n\n- Old", "patch", False),
+        ("## [0.2.0]\n\n- Old", None, True),
+        ("## [0.2.0]\n\n- Old", "nonexisting rule", False),
+    ],
+)
+def test_check_changelog_entry(content, bump_rule, e_success, tmp_path):
+    create_versioned_pyproject_toml(tmp_path, "0.2.0")
+    create_file(tmp_path, "CHANGELOG.md", content)
+    step = CheckChangelogEntryStep(project_dir=tmp_path, bump_rule=bump_rule)
+    result = step.run()
+    assert result.success == e_success
+    if e_success:
+        assert step.project_context.release_notes == result.return_value.text
+
+
+def test_check_changelog_entry_missing(tmp_path):
+    create_versioned_pyproject_toml(tmp_path, "0.2.0")
+    assert not CheckChangelogEntryStep(project_dir=tmp_path).run().success
+
+
+@mock.patch("recite.step.GitStep.run", mock_run)
+@pytest.mark.parametrize(
+    "bump_rule, tags, remote_tags, e_message",
+    [
+        ("patch", ["v0.2.0"], ["v0.2.0"], "Tag v0.2.1 is available"),
+        ("patch", ["v0.2.1"], [], "Tag v0.2.1 of version 0.2.1 already exists"),
+        (
+            "minor",
+            [],
+            ["v0.2.0", "v0.3"],
+            "Tag v0.3 of version 0.3.0 already exists on origin",
+        ),
+        ("initial", [], ["v0.1.0", "0.2.0"], "Tag v0.2.0 is available"),
+        ("nonexisting rule", [], [], None),
+    ],
+)
+def test_check_tag_available(bump_rule, tags, remote_tags, e_message, tmp_path):
+    create_versioned_pyproject_toml(tmp_path, "0.2.0")
+    os.chdir(tmp_path)
+    step = CheckTagAvailableStep(project_dir=tmp_path, bump_rule=bump_rule)
+    result = step.run(git=MockGit(tags=tags, remote_tags=remote_tags))
+    assert result.success == (e_message is not None and "available" in e_message)
+    if e_message is not None:
+        assert result.messages == [e_message]
+
+
+def test_check_tag_available_real_repo(tmp_path):
+    origin = Repo.init(tmp_path / "origin", initial_branch="main")
+    create_versioned_pyproject_toml(tmp_path / "origin", "0.2.0")
+    origin.index.add(["pyproject.toml"])
+    actor = Actor("test", "test@example.com")
+    origin.index.commit("first", author=actor, committer=actor)
+    clone = origin.clone(tmp_path / "clone")
+    step = CheckTagAvailableStep(project_dir=clone.working_tree_dir, bump_rule="patch")
+    step.prefetch()
+    assert step.run().success
+    # e.g. released from another clone
+    origin.create_tag("v0.2.1")
+    RepoSession.close_all()
+    result = step.run()
+    assert not result.success
+    assert result.messages == ["Tag v0.2.1 of version 0.2.1 already exists on origin"]
+    RepoSession.close_all()
+    clone.close()
+    origin.close()
+
+
 @pytest.mark.parametrize(
     "current_version, bump_rule, is_dry, expected_in_toml, expected_result",
     [
@@ -150,6 +379,39 @@ def test_git_tag_step_fails():
     assert not GitTagStep().run().success
 
 
+@mock.patch("recite.step.GitStep.run", mock_run)
+@pytest.mark.parametrize("atomic", [False, True])
+def test_atomic_push(atomic, tmp_path):
+    create_versioned_pyproject_toml(tmp_path, "0.1.1")
+    os.chdir(tmp_path)
+    git = MockGit()
+    repo = MockRepo(dirty=True, active_branch=MockBranch(name="main"))
+    assert CommitVersionBumpStep(push=not atomic).run(repo=repo, git=git).success
+    step = PushTagStep(atomic=atomic)
+    step.new_version = "0.1.1"
+    assert step.run(repo=repo, git=git).success
+    if atomic:
+        # a single push of the branch together with the tag
+        assert git.pushes == [("--atomic", "origin", "HEAD:refs/heads/main", "v0.1.1")]
+    else:
+        assert git.pushes == [("origin",), ("origin", "v0.1.1")]
+    assert git.commit_messages == ["Bumped version"]
+
+
+@mock.patch("recite.step.GitStep.run", mock_run)
+def test_atomic_push_upstream(tmp_path):
+    git = MockGit()
+    # the local branch tracks a remote branch of another name
+    repo = MockRepo(
+        active_branch=MockBranch(name="main"),
+        config={('branch "main"', "merge"): "refs/heads/trunk"},
+    )
+    step = PushTagStep(atomic=True, project_dir=str(tmp_path))
+    step.new_version = "0.1.1"
+    assert step.run(repo=repo, git=git).success
+    assert git.pushes == [("--atomic", "origin", "HEAD:refs/heads/trunk", "v0.1.1")]
+
+
 def test_failed_version_bump(tmp_path):
     os.chdir(tmp_path)
     Repo.init(tmp_path)
@@ -159,12 +421,72 @@ def test_failed_version_bump(tmp_path):
 @pytest.mark.parametrize("create_token", [True, False])
 def test_publish_poetry_step(create_token, tmp_path, monkeypatch, mocker):
     os.chdir(tmp_path)
-    mocker.patch("subprocess.run", mock_subprocess_run)
+    popen = mocker.patch("subprocess.Popen", side_effect=MockProcess)
     mocker.patch("typer.prompt", return_value="blabla")
     token_name = "MYTOKENNAME"
     if create_token:
         monkeypatch.setenv(token_name, "somevalue")
     assert PoetryPublishStep(pypy_token_name=token_name).run().success
+    assert popen.call_args[0][0][:3] == ["poetry", "publish", "--build"]
+
+
+def test_publish_poetry_step_fails(tmp_path, mocker, monkeypatch):
+    class FailingProcess(MockProcess):
+        def respond(self, command, cwd):
+            return 1, b"Uploading test-0.1.0.tar.gz\nHTTP Error 403: Forbidden\n"
+
+    mocker.patch("subprocess.Popen", FailingProcess)
+    monkeypatch.setenv("PYPI_TOKEN", "somevalue")
+    result = PoetryPublishStep(project_dir=str(tmp_path)).run()
+    assert not result.success
+    # stderr is part of the output
+    assert "HTTP Error 403: Forbidden" in result.messages
+
+
+def test_build_step(tmp_path, mocker):
+    popen = mocker.patch("subprocess.Popen", side_effect=MockBuildProcess)
+    repo = MockRepo(working_tree_dir=str(tmp_path))
+    step = BuildStep(project_dir=str(tmp_path))
+    result = mock_run(step, repo=repo)
+    assert result.success
+    assert popen.call_count == 2
+    names = [os.path.basename(path) for path in result.return_value]
+    assert names == ["test-0.1.0-py3-none-any.whl", "test-0.1.0.tar.gz"]
+    assert step.project_context.artifacts == result.return_value
+    assert all(".recite" in path for path in result.return_value)
+    # the formats are built at the same time, each into its own log
+    for build_format in ("sdist", "wheel"):
+        with open(step.label_log_path(build_format)) as f:
+            assert f.read() == "built\n"
+
+    # the same tree is not built again
+    result = mock_run(BuildStep(project_dir=str(tmp_path)), repo=repo)
+    assert result.success
+    assert "Reusing" in result.messages[0]
+    assert popen.call_count == 2
+
+    # untracked files end up in the sdist, so they are not taken from the store
+    repo.untracked = True
+    assert mock_run(BuildStep(project_dir=str(tmp_path)), repo=repo).success
+    assert popen.call_count == 4
+
+    # neither are uncommitted changes
+    repo.untracked, repo.dirty = False, True
+    assert mock_run(BuildStep(project_dir=str(tmp_path)), repo=repo).success
+    assert popen.call_count == 6
+
+
+def test_publish_restores_artifacts(tmp_path, mocker, monkeypatch):
+    popen = mocker.patch("subprocess.Popen", side_effect=MockProcess)
+    monkeypatch.setenv("PYPI_TOKEN", "somevalue")
+    artifact = tmp_path / "store" / "test-0.1.0.tar.gz"
+    artifact.parent.mkdir()
+    artifact.write_text("sdist")
+    step = PoetryPublishStep(project_dir=str(tmp_path))
+    step.project_context.artifacts = [str(artifact)]
+    assert step.run().success
+    assert (tmp_path / "dist" / "test-0.1.0.tar.gz").read_text() == "sdist"
+    assert "--build" not in popen.call_args[0][0]
 
 
 @mock.patch("typer.confirm", return_value=False)
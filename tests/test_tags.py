@@ -0,0 +1,104 @@
+import os
+
+import pytest
+from git import Actor, Repo
+
+from recite.tags import TagIndex, read_packed_refs
+
+from .utils import create_file
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = Repo.init(tmp_path, initial_branch="main")
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "test")
+        config.set_value("user", "email", "test@example.com")
+    create_file(tmp_path, "file.txt", "content")
+    repo.index.add(["file.txt"])
+    actor = Actor("test", "test@example.com")
+    repo.index.commit("first", author=actor, committer=actor)
+    yield repo
+    repo.close()
+
+
+def test_read_packed_refs(tmp_path):
+    create_file(
+        tmp_path,
+        "packed-refs",
+        "# pack-refs with: peeled fully-peeled sorted \n"
+        f"{'a' * 40} refs/heads/main\n"
+        f"{'b' * 40} refs/tags/v1.0.0\n"
+        f"{'c' * 40} refs/tags/v1.1.0\n"
+        f"^{'d' * 40}\n",
+    )
+    assert read_packed_refs(str(tmp_path / "packed-refs")) == {
+        "v1.0.0": ("b" * 40, "b" * 40),
+        "v1.1.0": ("c" * 40, "d" * 40),
+    }
+
+
+def test_tag_index(repo):
+    commit = repo.head.commit.hexsha
+    for name in ["v0.10.0", "v0.2.0", "v1.0.0rc1", "v0.9.1", "vnext", "other-1.0"]:
+        repo.create_tag(name)
+    repo.create_tag("v1.0.0", message="annotated")
+    # some packed, some loose
+    repo.git.pack_refs("--all")
+    repo.create_tag("v0.9.0")
+    repo.create_tag("v1.1.0", message="annotated")
+
+    index = TagIndex.load(repo.common_dir, "v")
+    assert [entry.name for entry in index.entries] == [
+        "v0.2.0",
+        "v0.9.0",
+        "v0.9.1",
+        "v0.10.0",
+        "v1.0.0rc1",
+        "v1.0.0",
+        "v1.1.0",
+    ]
+    # annotated tags are peeled to their commit
+    assert {entry.commit for entry in index.entries} == {commit}
+    assert index.find("0.9.1").name == "v0.9.1"
+    assert index.find("1.0").name == "v1.0.0"
+    assert index.find("0.9.2") is None
+    assert index.latest(upto="0.9.2").name == "v0.9.1"
+    assert index.latest(upto="1.0.0a1").name == "v0.10.0"
+    assert index.latest(upto="0.1.0") is None
+    assert index.latest().name == "v1.1.0"
+
+
+def test_tag_index_cache(repo, mocker):
+    project_dir = repo.working_tree_dir
+    repo.create_tag("v0.1.0")
+    repo.git.pack_refs("--all")
+    assert len(TagIndex.load(repo.common_dir, "v", project_dir=project_dir)) == 1
+    assert os.path.isfile(os.path.join(project_dir, ".recite", "tags", "index.json"))
+
+    repo.create_tag("v0.2.0")
+    # packed refs did not change, so they are not read again
+    read = mocker.patch("recite.tags.read_packed_refs", wraps=read_packed_refs)
+    index = TagIndex.load(repo.common_dir, "v", project_dir=project_dir)
+    assert [entry.name for entry in index.entries] == ["v0.1.0", "v0.2.0"]
+    read.assert_not_called()
+
+    repo.delete_tag("v0.2.0")
+    index = TagIndex.load(repo.common_dir, "v", project_dir=project_dir)
+    assert [entry.name for entry in index.entries] == ["v0.1.0"]
+
+
+def test_tag_index_packed_objects(repo, mocker):
+    commit = repo.head.commit.hexsha
+    repo.create_tag("v1.0.0", message="annotated")
+    # the tag object is only readable by git afterwards
+    repo.git.repack("-a", "-d")
+    project_dir = repo.working_tree_dir
+    index = TagIndex.load(repo.common_dir, "v", project_dir=project_dir)
+    assert index.find("1.0.0").commit == commit
+
+    # resolved commits are cached
+    peel = mocker.patch("recite.tags._peel_with_git")
+    index = TagIndex.load(repo.common_dir, "v", project_dir=project_dir)
+    assert index.find("1.0.0").commit == commit
+    peel.assert_not_called()
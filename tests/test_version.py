@@ -0,0 +1,102 @@
+import pytest
+
+from recite.version import (
+    Version,
+    bump_pyproject,
+    read_pyproject_version,
+    write_pyproject_version,
+)
+
+from .utils import create_file
+
+
+@pytest.mark.parametrize(
+    "version, rule, expected",
+    [
+        ("0.1.0", "patch", "0.1.1"),
+        ("0.1.0", "minor", "0.2.0"),
+        ("0.1.3", "major", "1.0.0"),
+        ("0.1.0", "prepatch", "0.1.1a0"),
+        ("0.1.0", "preminor", "0.2.0a0"),
+        ("0.1.0", "premajor", "1.0.0a0"),
+        ("0.1.0", "prerelease", "0.1.1a0"),
+        ("0.1.1a0", "prerelease", "0.1.1a1"),
+        ("0.1.1rc2", "prerelease", "0.1.1rc3"),
+        ("0.1.1a0", "patch", "0.1.1"),
+        ("0.2.0b1", "minor", "0.2.0"),
+        ("0.2.1b1", "minor", "0.3.0"),
+        ("1.0.0a1", "major", "1.0.0"),
+        ("1.2.0a1", "major", "2.0.0"),
+        ("1.2", "patch", "1.2.1"),
+        ("1.2", "major", "2.0"),
+        ("1.2.3.post1", "patch", "1.2.4"),
+        ("1.0.0.dev1", "patch", "1.0.0"),
+        ("0.1.0", "2.0.0", "2.0.0"),
+    ],
+)
+def test_bump(version, rule, expected):
+    assert str(Version.parse(version).bump(rule)) == expected
+
+
+def test_bump_invalid_rule():
+    with pytest.raises(ValueError):
+        Version.parse("0.1.0").bump("nonexisting command")
+
+
+@pytest.mark.parametrize(
+    "version, normalized",
+    [
+        ("v1.0", "1.0"),
+        ("1.0-alpha.1", "1.0a1"),
+        ("1.0.0-rc1", "1.0.0rc1"),
+        ("1!2.0-1", "1!2.0.post1"),
+        ("1.0.dev", "1.0.dev0"),
+        ("1.0+Local-1", "1.0+local.1"),
+    ],
+)
+def test_parse(version, normalized):
+    assert str(Version.parse(version)) == normalized
+
+
+def test_ordering():
+    versions = ["1.0", "1.0.post1", "1.0a1", "1.0.dev0", "1.0rc1", "0.9", "1.0b2"]
+    assert [str(v) for v in sorted(Version.parse(v) for v in versions)] == [
+        "0.9",
+        "1.0.dev0",
+        "1.0a1",
+        "1.0b2",
+        "1.0rc1",
+        "1.0",
+        "1.0.post1",
+    ]
+
+
+PYPROJECT = """[build-system]
+requires = ["poetry-core>=1.0.0"]
+
+[tool.poetry]
+name = "test"   # some comment
+version = '0.1.0'  # keep me
+description = "desc"
+
+[tool.poetry.dependencies]
+version = "^3.0"
+"""
+
+
+def test_pyproject_formatting_preserved(tmp_path):
+    create_file(tmp_path, "pyproject.toml", PYPROJECT)
+    path = str(tmp_path / "pyproject.toml")
+    assert read_pyproject_version(path) == "0.1.0"
+    bump = bump_pyproject(path, "minor", dry_run=True)
+    assert bump.new_version == "0.2.0"
+    assert read_pyproject_version(path) == "0.1.0"
+    write_pyproject_version(path, bump.new_version)
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == PYPROJECT.replace("'0.1.0'", "'0.2.0'")
+
+
+def test_pyproject_without_version(tmp_path):
+    create_file(tmp_path, "pyproject.toml", "[tool.poetry]\nname = 'test'\n")
+    with pytest.raises(ValueError):
+        read_pyproject_version(str(tmp_path / "pyproject.toml"))
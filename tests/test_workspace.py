@@ -0,0 +1,84 @@
+import pytest
+from typer.testing import CliRunner
+
+from recite.context import ProjectContext
+from recite.main import _workspace_release_steps, app
+from recite.runner import topological_waves
+from recite.workspace import Package, discover_packages, release_waves
+
+from .utils import create_file
+
+
+def _create_package(root, name, dependencies=""):
+    (root / name).mkdir(parents=True)
+    create_file(
+        root / name,
+        "pyproject.toml",
+        f'[tool.poetry]\nname = "{name}"\nversion = "0.1.0"\n\n'
+        f'[tool.poetry.dependencies]\npython = "^3.8"\n{dependencies}',
+    )
+
+
+def test_discover_packages(tmp_path):
+    create_file(tmp_path, "pyproject.toml", "[tool.black]\n")
+    _create_package(tmp_path, "core")
+    _create_package(tmp_path, "plugin", 'core = { path = "../core" }\n')
+    _create_package(tmp_path / ".nox", "hidden")
+    packages = discover_packages(str(tmp_path))
+    assert [(p.name, p.path_dependencies) for p in packages] == [
+        ("core", ()),
+        ("plugin", ("core",)),
+    ]
+    assert packages[0].project_dir == str(tmp_path / "core")
+
+
+def test_release_waves():
+    core = Package(name="core", project_dir="core")
+    plugin = Package(name="plugin", project_dir="plugin", path_dependencies=("core",))
+    other = Package(name="other", project_dir="other")
+    waves = release_waves([plugin, core, other])
+    assert [[p.name for p in wave] for wave in waves] == [["core", "other"], ["plugin"]]
+
+    core.path_dependencies = ("plugin",)
+    with pytest.raises(ValueError, match="Cyclic"):
+        release_waves([plugin, core])
+
+
+def test_workspace_release_steps():
+    packages = [
+        Package(name="plugin", project_dir="plugin", path_dependencies=("core",)),
+        Package(name="core", project_dir="core"),
+        Package(name="other", project_dir="other"),
+    ]
+    steps = _workspace_release_steps(
+        packages=packages,
+        contexts={p.name: ProjectContext(project_dir=p.project_dir) for p in packages},
+        release_type="patch",
+        remote="origin",
+        commit_message="Bumped version",
+        git_tag_prefix="v",
+    )
+    by_name = {step.short_name: step for step in steps}
+    assert by_name["core:gittag"].prefix == "core-v"
+    assert by_name["plugin:bumpversion"].depends_on == ("core:publish",)
+    # nothing is uploaded before the tag is pushed
+    assert by_name["core:publish"].depends_on == ("core:build", "core:pushtag")
+    # commits are serialized, even inside of one wave, and each package's tag
+    # is created before the next package commits
+    assert by_name["other:commitbump"].depends_on == (
+        "other:bumpversion",
+        "core:gittag",
+    )
+    assert by_name["core:gittag"].depends_on == ("core:commitbump",)
+    waves = [[steps[i].short_name for i in wave] for wave in topological_waves(steps)]
+    assert waves[0] == ["core:bumpversion", "other:bumpversion"]
+    assert all(step.short_name.startswith("plugin:") for step in steps[-6:])
+
+
+def test_release_cyclic_workspace(tmp_path, monkeypatch):
+    _create_package(tmp_path, "core", 'plugin = { path = "../plugin" }\n')
+    _create_package(tmp_path, "plugin", 'core = { path = "../core" }\n')
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(app, ["release", "patch", "--workspace"])
+    assert result.exit_code == 1
+    assert "Cyclic path dependencies" in result.stdout